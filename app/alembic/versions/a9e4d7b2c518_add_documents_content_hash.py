@@ -0,0 +1,33 @@
+"""add documents content hash
+
+Revision ID: a9e4d7b2c518
+Revises: f1c6a8e2b934
+Create Date: 2026-10-18 15:02:47.316240
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a9e4d7b2c518'
+down_revision: Union[str, Sequence[str], None] = 'f1c6a8e2b934'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Existing documents keep content_hash NULL, they aren't deduplicated against
+    op.add_column('documents', sa.Column('content_hash', sa.String(length=64), nullable=True))
+    with op.get_context().autocommit_block():
+        op.create_index('ix_documents_content_hash', 'documents', ['content_hash'], unique=False, postgresql_concurrently=True, if_not_exists=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_documents_content_hash', table_name='documents', postgresql_concurrently=True, if_exists=True)
+    op.drop_column('documents', 'content_hash')
@@ -0,0 +1,29 @@
+"""store document file paths as storage keys
+
+Revision ID: b6c2e8f41d07
+Revises: a9e4d7b2c518
+Create Date: 2026-10-18 16:10:03.582194
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b6c2e8f41d07'
+down_revision: Union[str, Sequence[str], None] = 'a9e4d7b2c518'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # file_path was relative to the working directory (storage/...), keys are relative to the storage root
+    op.execute("UPDATE documents SET file_path = substr(file_path, 9) WHERE file_path LIKE 'storage/%'")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("UPDATE documents SET file_path = 'storage/' || file_path WHERE file_path NOT LIKE 'storage/%'")
@@ -0,0 +1,40 @@
+"""create document chunks table
+
+Revision ID: c4a7e91d2b63
+Revises: b81c5e2f9a10
+Create Date: 2026-10-18 11:40:05.318842
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c4a7e91d2b63'
+down_revision: Union[str, Sequence[str], None] = 'b81c5e2f9a10'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('document_chunks',
+    sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('document_id', sa.Integer(), nullable=False),
+    sa.Column('vector_id', sa.String(), nullable=False),
+    sa.Column('content_hash', sa.String(), nullable=False),
+    sa.Column('page', sa.Integer(), nullable=False),
+    sa.Column('chunk_index', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['document_id'], ['documents.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('document_id', 'vector_id', name='uq_document_chunks_document_vector')
+    )
+    op.create_index('ix_document_chunks_document_id', 'document_chunks', ['document_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_document_chunks_document_id', table_name='document_chunks')
+    op.drop_table('document_chunks')
@@ -0,0 +1,49 @@
+"""store chat timestamps with time zone
+
+Revision ID: c8d1f5a7e392
+Revises: b6c2e8f41d07
+Create Date: 2026-10-18 18:05:12.417309
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c8d1f5a7e392'
+down_revision: Union[str, Sequence[str], None] = 'b6c2e8f41d07'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+COLUMNS = [
+    ('chat_sessions', 'summary_until'),
+    ('chat_sessions', 'created_at'),
+    ('chat_sessions', 'updated_at'),
+    ('chat_messages', 'created_at'),
+    ('chat_messages', 'updated_at'),
+]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Existing values were written in UTC
+    for table, column in COLUMNS:
+        op.alter_column(
+            table, column,
+            type_=sa.DateTime(timezone=True),
+            existing_type=sa.DateTime(),
+            postgresql_using=f"{column} AT TIME ZONE 'UTC'"
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for table, column in COLUMNS:
+        op.alter_column(
+            table, column,
+            type_=sa.DateTime(),
+            existing_type=sa.DateTime(timezone=True),
+            postgresql_using=f"{column} AT TIME ZONE 'UTC'"
+        )
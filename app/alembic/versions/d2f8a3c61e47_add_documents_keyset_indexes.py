@@ -0,0 +1,40 @@
+"""add documents keyset indexes
+
+Revision ID: d2f8a3c61e47
+Revises: c4a7e91d2b63
+Create Date: 2026-10-18 13:05:12.480917
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd2f8a3c61e47'
+down_revision: Union[str, Sequence[str], None] = 'c4a7e91d2b63'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+INDEXES = {
+    'ix_documents_user_created_id': ['user_id', 'created_at', 'id'],
+    'ix_documents_user_progress_created_id': ['user_id', 'ai_progress', 'created_at', 'id'],
+    'ix_documents_user_risk_created_id': ['user_id', 'risk_level', 'created_at', 'id'],
+    'ix_documents_user_type_created_id': ['user_id', 'document_type_id', 'created_at', 'id'],
+}
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # CONCURRENTLY can't run inside a transaction, but keeps the table writable while building
+    with op.get_context().autocommit_block():
+        for name, columns in INDEXES.items():
+            op.create_index(name, 'documents', columns, unique=False, postgresql_concurrently=True, if_not_exists=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        for name in INDEXES:
+            op.drop_index(name, table_name='documents', postgresql_concurrently=True, if_exists=True)
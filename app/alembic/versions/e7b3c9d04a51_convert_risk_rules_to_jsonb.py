@@ -0,0 +1,40 @@
+"""convert risk_rules to jsonb
+
+Revision ID: e7b3c9d04a51
+Revises: d2f8a3c61e47
+Create Date: 2026-10-18 13:32:47.105263
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e7b3c9d04a51'
+down_revision: Union[str, Sequence[str], None] = 'd2f8a3c61e47'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Existing rows hold serialized JSON strings, parse them in place
+    op.alter_column('document_types', 'risk_rules',
+               existing_type=sa.String(),
+               type_=postgresql.JSONB(astext_type=sa.Text()),
+               existing_nullable=True,
+               postgresql_using="NULLIF(risk_rules, '')::jsonb")
+    op.create_index('ix_document_types_risk_rules', 'document_types', ['risk_rules'], unique=False, postgresql_using='gin', postgresql_ops={'risk_rules': 'jsonb_path_ops'})
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_document_types_risk_rules', table_name='document_types', postgresql_using='gin', postgresql_ops={'risk_rules': 'jsonb_path_ops'})
+    op.alter_column('document_types', 'risk_rules',
+               existing_type=postgresql.JSONB(astext_type=sa.Text()),
+               type_=sa.String(),
+               existing_nullable=True,
+               postgresql_using='risk_rules::text')
@@ -0,0 +1,38 @@
+"""add chat session summary and history indexes
+
+Revision ID: f1c6a8e2b934
+Revises: e7b3c9d04a51
+Create Date: 2026-10-18 14:21:36.902114
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f1c6a8e2b934'
+down_revision: Union[str, Sequence[str], None] = 'e7b3c9d04a51'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('chat_sessions', sa.Column('document_id', sa.Integer(), nullable=True))
+    op.add_column('chat_sessions', sa.Column('summary', sa.Text(), nullable=True))
+    op.add_column('chat_sessions', sa.Column('summary_until', sa.DateTime(), nullable=True))
+    op.create_foreign_key('fk_chat_sessions_document_id', 'chat_sessions', 'documents', ['document_id'], ['id'], ondelete='CASCADE')
+    op.create_index('ix_chat_sessions_user_updated', 'chat_sessions', ['user_id', 'updated_at'], unique=False)
+    op.create_index('ix_chat_messages_session_created', 'chat_messages', ['session_id', 'created_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_chat_messages_session_created', table_name='chat_messages')
+    op.drop_index('ix_chat_sessions_user_updated', table_name='chat_sessions')
+    op.drop_constraint('fk_chat_sessions_document_id', 'chat_sessions', type_='foreignkey')
+    op.drop_column('chat_sessions', 'summary_until')
+    op.drop_column('chat_sessions', 'summary')
+    op.drop_column('chat_sessions', 'document_id')
@@ -1,35 +1,68 @@
-from typing import Annotated
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
+from sqlalchemy import event, select
 
-from app.core.db import get_db
+from app.core.cache import LRUCache
+from app.core.config import settings
+from app.core.db import AsyncSessionLocal
 from app.core.security import decode_access_token
-from app.models.users import User as UserModel
+from app.models.users import AuthUser
 from app.migrations.users import User as User
 
 # This tells FastAPI to look for the "Authorization: Bearer <token>" header
 reusable_oauth2 = OAuth2PasswordBearer(tokenUrl=f"/auth/login")
 
-def get_current_user(
-    db: Session = Depends(get_db),
-    token: str = Depends(reusable_oauth2)
-) -> UserModel:
+# user id -> AuthUser, only used when AUTH_MODE is "cached"
+user_cache = LRUCache(maxsize=settings.AUTH_USER_CACHE_SIZE, ttl=settings.AUTH_USER_CACHE_TTL)
+
+
+def invalidate_cached_user(user_id: int):
+    """Drop a user from the auth cache, call after deleting or changing a user"""
+    user_cache.delete(user_id)
+
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _invalidate_on_change(mapper, connection, target):
+    # Covers every ORM path that changes or deletes a user; bulk SQL statements must call invalidate_cached_user
+    invalidate_cached_user(target.id)
+
+
+async def load_user(user_id: int) -> AuthUser | None:
+    # A session of its own, so cache hits never check out a pooled connection
+    async with AsyncSessionLocal() as db:
+        user = (await db.execute(select(User.id, User.email).filter(User.id == user_id))).first()
+    if not user:
+        return None
+    return AuthUser(id=user.id, email=user.email)
+
+
+async def get_current_user(token: str = Depends(reusable_oauth2)) -> AuthUser:
     if not token: 
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Not authenticated",
         )
     payload = decode_access_token(token)
-    if not payload:
+    if not payload or not payload.get("sub"):
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Could not validate credentials",
         )
     
     user_id = int(payload.get("sub"))
-    user = db.query(User).filter(User.id == user_id).first()
-    
+    # Tokens issued before the email claim was added still go through the lookup
+    if settings.AUTH_MODE == "stateless" and payload.get("email"):
+        return AuthUser(id=user_id, email=payload["email"])
+
+    if settings.AUTH_MODE != "db":
+        user = user_cache.get(user_id)
+        if user is not None:
+            return user
+
+    user = await load_user(user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
-    return user
\ No newline at end of file
+    if settings.AUTH_MODE != "db":
+        user_cache.set(user_id, user)
+    return user
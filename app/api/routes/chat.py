@@ -1,48 +1,97 @@
-from fastapi import APIRouter, Depends
+from datetime import datetime
+from fastapi import APIRouter, Depends, Query, Request
 from fastapi.responses import StreamingResponse
-from sqlalchemy.orm import Session
-from app.models.chat import ChatRequest
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models.chat import ChatRequest, ChatSessionResponse, ChatMessageResponse
 # from app.services.chat import ChatService
 from app.api.guards import get_current_user
 from app.services.chat_service import ChatService
-from app.core.db import get_db
+from app.services.chat_session_service import ChatSessionService
+from app.core.db import get_async_db
 
 router = APIRouter()
 
-def init_chat_service(db: Session = Depends(get_db)):
+def init_chat_service(db: AsyncSession = Depends(get_async_db)):
     return ChatService(db)
 
+def init_chat_session_service(db: AsyncSession = Depends(get_async_db)):
+    return ChatSessionService(db)
+
 @router.post("/query")
-def chat_with_docs(
+async def chat_with_docs(
     request: ChatRequest,
     current_user = Depends(get_current_user),
     chat_service: ChatService = Depends(init_chat_service)
 ):
-    result = chat_service.generate_response_for_single_doc(current_user.id, request)
-    return result
+    """Chat with one document (``document_id``), a list of them (``document_ids``) or, with neither, the whole library"""
+    if request.document_id is not None:
+        return await chat_service.generate_response_for_single_doc(current_user.id, request)
+    return await chat_service.generate_response_for_documents(current_user.id, request)
 
 @router.post("/query-stream")
-def chat_with_docs_stream(
+async def chat_with_docs_stream(
     request: ChatRequest,
+    http_request: Request,
     current_user = Depends(get_current_user),
     chat_service: ChatService = Depends(init_chat_service)
 ):
-    """Streaming chat endpoint using Server-Sent Events"""
-    def generate():
-        try:
-            yield from chat_service.generate_response_for_single_doc_stream(current_user.id, request)
-        except Exception as e:
-            # Ensure error is also sent as SSE
-            import json
-            yield f"data: {json.dumps({'type': 'error', 'message': f'Streaming error: {str(e)}'})}\n\n"
-    
+    """Streaming chat endpoint using Server-Sent Events.
+
+    Events: start (with the session_id, and for multi-document queries document_ids, total_documents
+    and truncated), chunk, citation (as each evidence line completes), then
+    complete or error. Lines starting with ":" are heartbeats. Documents are selected as in /query,
+    multi-document citations carry document_id and filename.
+    """
+    # Checked before streaming so a missing document is still a plain 404
+    if request.document_id is not None:
+        version = await chat_service.verify_document(current_user.id, request.document_id)
+        documents, total_documents = None, None
+    else:
+        version = None
+        documents, total_documents = await chat_service.resolve_documents(current_user.id, request)
+    session, conversation = await chat_service.open_session(current_user.id, request)
+
     return StreamingResponse(
-        generate(),
+        chat_service.stream_response(
+            current_user.id, request, session.id, conversation, version, documents, http_request.is_disconnected,
+            total_documents=total_documents,
+            new_session=session if request.session_id is None else None
+        ),
         media_type="text/event-stream",
         headers={
             "Cache-Control": "no-cache",
             "Connection": "keep-alive",
+            "X-Accel-Buffering": "no",
             "Access-Control-Allow-Origin": "*",
             "Access-Control-Allow-Headers": "Cache-Control"
         }
-    )
\ No newline at end of file
+    )
+
+@router.get("/sessions", response_model=list[ChatSessionResponse])
+async def get_sessions(
+    current_user = Depends(get_current_user),
+    skip: int = 0,
+    limit: int = 20,
+    session_service: ChatSessionService = Depends(init_chat_session_service)
+):
+    return await session_service.list_sessions(current_user.id, skip, limit)
+
+@router.get("/sessions/{session_id}/messages", response_model=list[ChatMessageResponse])
+async def get_session_messages(
+    session_id: str,
+    current_user = Depends(get_current_user),
+    limit: int = Query(50, ge=1, le=200),
+    before: datetime | None = None,
+    session_service: ChatSessionService = Depends(init_chat_session_service)
+):
+    """Messages oldest first, pass the first message's created_at as ``before`` for older ones"""
+    return await session_service.get_messages(current_user.id, session_id, limit, before)
+
+@router.delete("/sessions/{session_id}")
+async def delete_session(
+    session_id: str,
+    current_user = Depends(get_current_user),
+    session_service: ChatSessionService = Depends(init_chat_session_service)
+):
+    await session_service.delete_session(current_user.id, session_id)
+    return {"detail": "success"}
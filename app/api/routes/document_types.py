@@ -1,51 +1,61 @@
-from typing import Annotated
+from typing import Annotated, Literal
 from fastapi import APIRouter, Depends
-from app.core.db import get_db
-from sqlalchemy.orm import Session
-from app.migrations.users import User as UserModel
+from app.core.db import get_async_db
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models.users import AuthUser
 from app.api.guards import get_current_user
 from app.services.document_type_service import DocumentTypeService
 from app.models.document_types import DocumentCreateModel, DocumentUpdateModel
 
 router = APIRouter()
 
-def init_document_type_service(db: Session = Depends(get_db)):
+def init_document_type_service(db: AsyncSession = Depends(get_async_db)):
     return DocumentTypeService(db)
 
 @router.get("/")
-def get_documents(
-    current_user: Annotated[UserModel, Depends(get_current_user)],
+async def get_documents(
+    current_user: Annotated[AuthUser, Depends(get_current_user)],
     skip: int = 0, 
     limit: int = 10, 
     document_type_service: DocumentTypeService = Depends(init_document_type_service)
 ):
-    documents = document_type_service.get_types(current_user.id, skip, limit)
+    documents = await document_type_service.get_types(current_user.id, skip, limit)
     return documents
 
+@router.get("/by-rule")
+async def find_types_by_rule(
+    current_user: Annotated[AuthUser, Depends(get_current_user)],
+    clause: str,
+    severity: Literal["low", "medium", "high"] | None = None,
+    document_type_service: DocumentTypeService = Depends(init_document_type_service)
+):
+    """Document types that define a rule for the given clause"""
+    return await document_type_service.find_types_by_rule(current_user.id, clause, severity)
+
 @router.post("/")
-def add_types(
-    current_user: Annotated[UserModel, Depends(get_current_user)],
+async def add_types(
+    current_user: Annotated[AuthUser, Depends(get_current_user)],
     body: DocumentCreateModel,
     document_type_service: DocumentTypeService = Depends(init_document_type_service),
 ):
-    document_type_service.add_types(current_user.id, body)
+    await document_type_service.add_types(current_user.id, body)
     return {"detail": "success"}
 
 @router.put("/{id}")
-def update_types(
-    current_user: Annotated[UserModel, Depends(get_current_user)],
+async def update_types(
+    current_user: Annotated[AuthUser, Depends(get_current_user)],
     id: int,
     body: DocumentUpdateModel,
     document_type_service: DocumentTypeService = Depends(init_document_type_service),
 ):
-    document_type_service.update_type(current_user.id, id, body)
+    await document_type_service.update_type(current_user.id, id, body)
     return {"detail": "success"}
 
 @router.delete("/{id}")
-def delete_types(
-    current_user: Annotated[UserModel, Depends(get_current_user)],
+async def delete_types(
+    current_user: Annotated[AuthUser, Depends(get_current_user)],
     id: int,
     document_type_service: DocumentTypeService = Depends(init_document_type_service),
 ):
-    document_type_service.delete_type(current_user.id, id)
+    await document_type_service.delete_type(current_user.id, id)
     return {"detail": "success"}
\ No newline at end of file
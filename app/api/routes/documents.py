@@ -1,36 +1,70 @@
+import json
 from typing import Annotated
-from fastapi import APIRouter, UploadFile, File, Form, Depends, HTTPException
-from fastapi.responses import FileResponse
-from app.core.db import get_db
-from sqlalchemy.orm import Session
-from app.migrations.users import User as UserModel
+from fastapi import APIRouter, UploadFile, File, Form, Depends, HTTPException, Query, Request
+from fastapi.responses import Response
+from app.core.db import get_async_db
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models.users import AuthUser
 from app.api.guards import get_current_user
 from app.services.documents_service import DocumentService
 from app.services.ai_analysis_service import AIAnalysisService
-from app.models.documents import DocumentDetailResponse
+from app.services.job_service import JobService
+from app.core.storage import storage
+from app.utils.blob_response import blob_response
+from app.models.documents import DocumentResponse, DocumentDetailResponse, DocumentPageResponse
 from app.models.ai_analysis import AIAnalysisDTO, AIListRules
 
 router = APIRouter()
 
-def init_document_service(db: Session = Depends(get_db)):
+def init_document_service(db: AsyncSession = Depends(get_async_db)):
     return DocumentService(db)
 
-def init_ai_analysis_service(db: Session = Depends(get_db)):
+def init_job_service(db: AsyncSession = Depends(get_async_db)):
+    return JobService(db)
+
+def init_ai_analysis_service(db: AsyncSession = Depends(get_async_db)):
     return AIAnalysisService(db)
 
-@router.get("/")
-def get_documents(
-    current_user: Annotated[UserModel, Depends(get_current_user)],
+def json_response(content) -> Response:
+    """Serialize plain dicts directly, skipping response_model validation.
+
+    Routes using it declare their schema through ``responses`` for the docs only,
+    the service builds the dicts in that shape.
+    """
+    return Response(content=json.dumps(content), media_type="application/json")
+
+@router.get("/", response_model=None, responses={200: {"model": list[DocumentResponse]}})
+async def get_documents(
+    current_user: Annotated[AuthUser, Depends(get_current_user)],
     skip: int = 0, 
     limit: int = 10, 
+    summary_chars: int | None = Query(None, ge=0),
+    document_service: DocumentService = Depends(init_document_service)
+):
+    """List documents, ``summary_chars`` truncates each summary to a preview"""
+    documents = await document_service.get_documents(current_user.id, skip, limit, summary_chars)
+    return json_response(documents)
+
+@router.get("/page", response_model=None, responses={200: {"model": DocumentPageResponse}})
+async def get_documents_page(
+    current_user: Annotated[AuthUser, Depends(get_current_user)],
+    limit: int = Query(10, ge=1, le=100),
+    cursor: str | None = None,
+    ai_progress: str | None = None,
+    risk_level: str | None = None,
+    document_type_id: int | None = None,
+    summary_chars: int | None = Query(None, ge=0),
     document_service: DocumentService = Depends(init_document_service)
 ):
-    documents = document_service.get_documents(current_user.id, skip, limit)
-    return documents
+    """Cursor paginated listing, pass ``next_cursor`` back as ``cursor`` for the next page"""
+    page = await document_service.get_documents_page(
+        current_user.id, limit, cursor, ai_progress, risk_level, document_type_id, summary_chars
+    )
+    return json_response(page)
 
 @router.post("/upload")
 async def upload_document(
-    current_user: Annotated[UserModel, Depends(get_current_user)],
+    current_user: Annotated[AuthUser, Depends(get_current_user)],
     file: UploadFile = File(...),
     filename: str = Form(...),
     document_type_id: int = Form(...),
@@ -39,47 +73,95 @@ async def upload_document(
     await document_service.upload_document(current_user.id, file, filename, document_type_id)
     return {"detail": "success"}
 
+@router.post("/bulk-upload")
+async def bulk_upload_documents(
+    current_user: Annotated[AuthUser, Depends(get_current_user)],
+    files: list[UploadFile] = File(...),
+    document_type_id: int = Form(...),
+    sync: bool = Form(True),
+    document_service: DocumentService = Depends(init_document_service),
+    job_service: JobService = Depends(init_job_service),
+):
+    """Upload many files of one document type, each named after its file.
+
+    Content the user already uploaded is reported as ``duplicate`` instead of
+    stored again. With ``sync`` the new documents are queued for ingestion in one go.
+    """
+    documents = await document_service.bulk_upload(current_user.id, files, document_type_id)
+    jobs = []
+    if sync:
+        new_ids = [document["document_id"] for document in documents if not document["duplicate"]]
+        jobs = await job_service.enqueue_sync_many(current_user.id, new_ids)
+    job_ids = {job.document_id: job.id for job in jobs}
+    for document in documents:
+        document["job_id"] = None if document["duplicate"] else job_ids.get(document["document_id"])
+    return {"detail": "success", "documents": documents, "queued": len(jobs)}
+
+@router.put("/{document_id}/file")
+async def replace_document_file(
+    current_user: Annotated[AuthUser, Depends(get_current_user)],
+    document_id: int,
+    file: UploadFile = File(...),
+    document_service: DocumentService = Depends(init_document_service),
+    job_service: JobService = Depends(init_job_service),
+):
+    """Upload a revised version of a document and queue its incremental re-ingestion"""
+    await document_service.replace_document_file(current_user.id, document_id, file)
+    job = await job_service.enqueue_sync(current_user.id, document_id)
+    return {"detail": "queued", "job_id": job.id, "job_status": job.status}
+
 @router.get("/{document_id}/file", response_model=DocumentDetailResponse)
-def get_document(
-    current_user: Annotated[UserModel, Depends(get_current_user)],
+async def get_document(
+    current_user: Annotated[AuthUser, Depends(get_current_user)],
     document_id: int,
     document_service: DocumentService = Depends(init_document_service)
 ):
-    doc = document_service.get_document_detail(current_user.id, document_id)
+    doc = await document_service.get_document_detail(current_user.id, document_id)
     return doc
 
 @router.get("/{document_id}/download")
-def get_document(
-    current_user: Annotated[UserModel, Depends(get_current_user)],
+async def download_document(
+    current_user: Annotated[AuthUser, Depends(get_current_user)],
     document_id: int,
+    request: Request,
     document_service: DocumentService = Depends(init_document_service)
 ):
-    doc = document_service.get_document_detail(current_user.id, document_id)
-    path = f"./{doc.file_path}"
-    return FileResponse(path=path, media_type="application/pdf", filename=doc.filename)
+    """The stored file, supports Range (206) and If-None-Match (304) requests"""
+    doc = await document_service.get_document_detail(current_user.id, document_id)
+    return await blob_response(request, storage, doc.file_path, doc.filename, "application/pdf")
 
 @router.get("/{document_id}/sync")
 async def sync_document(
-    current_user: Annotated[UserModel, Depends(get_current_user)],
+    current_user: Annotated[AuthUser, Depends(get_current_user)],
     document_id: int,
-    document_service: DocumentService = Depends(init_document_service)
+    force: bool = False,
+    document_service: DocumentService = Depends(init_document_service),
+    job_service: JobService = Depends(init_job_service),
 ):
-    await document_service.sync_document(current_user.id, document_id)
-    return {"detail": "success"}
+    """Queue the document for background processing, progress is reported through ai_progress.
+
+    With ``force`` an already processed document is re-synced; only changed chunks are re-embedded.
+    """
+    if force:
+        await document_service.reset_progress(current_user.id, document_id)
+    else:
+        await document_service.get_document_detail(current_user.id, document_id)
+    job = await job_service.enqueue_sync(current_user.id, document_id)
+    return {"detail": "queued", "job_id": job.id, "job_status": job.status}
 
 @router.delete("/{document_id}")
-def delete_document(
-    current_user: Annotated[UserModel, Depends(get_current_user)],
+async def delete_document(
+    current_user: Annotated[AuthUser, Depends(get_current_user)],
     document_id: int,
     document_service: DocumentService = Depends(init_document_service)
 ):
-    document_service.delete_document(current_user.id, document_id)
+    await document_service.delete_document(current_user.id, document_id)
     return {"detail": "success"}
 
 @router.post("/{document_id}/analyze")
 async def analyze_document(
     document_id: int,
-    current_user: Annotated[UserModel, Depends(get_current_user)],
+    current_user: Annotated[AuthUser, Depends(get_current_user)],
     analysis_dto: AIAnalysisDTO,
     document_service: DocumentService = Depends(init_document_service),
     ai_service: AIAnalysisService = Depends(init_ai_analysis_service),
@@ -87,7 +169,7 @@ async def analyze_document(
     """Analyze a document using AI"""
     try:
         # Verify document exists and belongs to user
-        document = document_service.get_document_detail(current_user.id, document_id)
+        document = await document_service.get_document_detail(current_user.id, document_id)
         if not document:
             raise HTTPException(status_code=404, detail="Document Not Found")
         
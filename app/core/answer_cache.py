@@ -0,0 +1,131 @@
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+
+import numpy as np
+
+from app.core.cache import LRUCache
+from app.core.config import settings
+from app.core.embedding_cache import normalize_query
+
+
+@dataclass
+class _CachedAnswer:
+    query: str
+    vector: np.ndarray | None
+    answer: dict
+    expires_at: float
+
+
+@dataclass
+class _DocumentAnswers:
+    version: datetime | None
+    entries: list[_CachedAnswer] = field(default_factory=list)
+
+
+class AnswerCache:
+    """Chat answers per document, matched by query embedding similarity.
+
+    Entries carry the document version (``updated_at``) they were generated
+    for, so a re-synced or replaced document never serves an old answer even
+    when another process did the update.
+    """
+
+    def __init__(self, maxsize: int = 1024, per_document: int = 64, ttl: float = 3600, threshold: float = 0.95):
+        self.documents = LRUCache(maxsize=maxsize)
+        self.per_document = per_document
+        self.ttl = ttl
+        self.threshold = threshold
+        self.hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _unit(vector: list[float] | None) -> np.ndarray | None:
+        if vector is None:
+            return None
+        array = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(array)
+        return array / norm if norm else array
+
+    def get(self, document_id: int, version: datetime | None, query: str, query_vector: list[float] | None = None) -> dict | None:
+        """Cached answer for the same normalized question, or a similar one when ``query_vector`` is given"""
+        query = normalize_query(query)
+        with self._lock:
+            answers = self.documents.get(document_id)
+            if answers is None or answers.version != version:
+                self.misses += 1
+                return None
+            now = time.monotonic()
+            answers.entries = [entry for entry in answers.entries if entry.expires_at > now]
+
+            for entry in answers.entries:
+                if entry.query == query:
+                    self.hits += 1
+                    return entry.answer
+
+            unit = self._unit(query_vector)
+            candidates = [entry for entry in answers.entries if entry.vector is not None]
+            if unit is not None and candidates:
+                similarities = np.stack([entry.vector for entry in candidates]) @ unit
+                best = int(np.argmax(similarities))
+                if similarities[best] >= self.threshold:
+                    self.hits += 1
+                    self.semantic_hits += 1
+                    return candidates[best].answer
+            self.misses += 1
+            return None
+
+    def get_exact(self, document_id: int, version: datetime | None, query: str) -> dict | None:
+        """Cached answer for the same normalized question, checked before embedding the query.
+
+        Only hits are counted; follow a miss with ``get`` so it is recorded.
+        """
+        query = normalize_query(query)
+        with self._lock:
+            answers = self.documents.get(document_id)
+            if answers is None or answers.version != version:
+                return None
+            now = time.monotonic()
+            for entry in answers.entries:
+                if entry.query == query and entry.expires_at > now:
+                    self.hits += 1
+                    return entry.answer
+            return None
+
+    def set(self, document_id: int, version: datetime | None, query: str, query_vector: list[float] | None, answer: dict):
+        with self._lock:
+            answers = self.documents.get(document_id)
+            if answers is None or answers.version != version:
+                answers = _DocumentAnswers(version=version)
+                self.documents.set(document_id, answers)
+            query = normalize_query(query)
+            answers.entries = [entry for entry in answers.entries if entry.query != query]
+            answers.entries.append(_CachedAnswer(query, self._unit(query_vector), answer, time.monotonic() + self.ttl))
+            # Oldest entries go first once a document has too many distinct questions
+            del answers.entries[:-self.per_document]
+
+    def invalidate(self, document_id: int):
+        with self._lock:
+            self.documents.delete(document_id)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "documents": self.documents.stats()["size"],
+            "hits": self.hits,
+            "semantic_hits": self.semantic_hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+# Global instance
+answer_cache = AnswerCache(
+    maxsize=settings.ANSWER_CACHE_DOCUMENTS,
+    per_document=settings.ANSWER_CACHE_PER_DOCUMENT,
+    ttl=settings.ANSWER_CACHE_TTL,
+    threshold=settings.ANSWER_CACHE_SIMILARITY,
+)
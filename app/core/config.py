@@ -28,19 +28,131 @@ class Settings(BaseSettings):
     POSTGRES_PASSWORD: str = "password"
     POSTGRES_DB: str = "contracts_db"
     POSTGRES_PORT: int = 5432
+    # Connection pool of the async engine (alembic uses its own, unpooled)
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 20
+    DB_POOL_TIMEOUT: int = 30
+    DB_POOL_PRE_PING: bool = True
+    DB_POOL_RECYCLE: int = 60 * 30
 
     # JWT_KEY
     SECRET_JWT_KEY: str
     EXPIRE_JWT_KEY: int = 60 * 60 * 24 * 7
     ALGORITHM: str = "HS256"
+    # "db" loads the user on every request, "cached" keeps users in an in-process
+    # TTL cache, "stateless" trusts the signed sub/email claims and skips the DB.
+    # ORM changes to a user invalidate this process's cache only, other processes
+    # can keep a changed or deleted user for up to AUTH_USER_CACHE_TTL seconds
+    AUTH_MODE: Literal["db", "cached", "stateless"] = "db"
+    AUTH_USER_CACHE_SIZE: int = 4096
+    AUTH_USER_CACHE_TTL: int = 300
+
+    # VECTOR STORE
+    # "pinecone" or "local" (memory-mapped NumPy arrays under LOCAL_VECTOR_STORE_PATH)
+    VECTOR_STORE_BACKEND: Literal["pinecone", "local"] = "pinecone"
+    LOCAL_VECTOR_STORE_PATH: str = "./vector_store"
+
+    # RETRIEVAL
+    # Candidates fetched per retriever, then deduped, reranked and packed into
+    # at most RETRIEVAL_TOP_K chunks / CONTEXT_TOKEN_BUDGET estimated tokens
+    RETRIEVAL_CANDIDATE_POOL: int = 20
+    RETRIEVAL_TOP_K: int = 5
+    CONTEXT_TOKEN_BUDGET: int = 1500
+    # "lexical" (IDF-weighted term overlap), "cross-encoder" (needs sentence-transformers) or "none"
+    RERANKER: Literal["lexical", "cross-encoder", "none"] = "lexical"
+    RERANKER_MODEL: str = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+    # Multi-document chat: each document contributes at most MULTI_DOC_PER_DOCUMENT_K chunks
+    # from a pool of MULTI_DOC_CANDIDATE_POOL, looked up MULTI_DOC_CONCURRENCY documents at a time
+    MULTI_DOC_MAX_DOCUMENTS: int = 50
+    MULTI_DOC_CONCURRENCY: int = 8
+    MULTI_DOC_CANDIDATE_POOL: int = 8
+    MULTI_DOC_PER_DOCUMENT_K: int = 2
+    MULTI_DOC_MAX_CHUNKS: int = 30
+    MULTI_DOC_TOKEN_BUDGET: int = 6000
+    # Chat answers reused for the same document version when the question embedding is this similar
+    ANSWER_CACHE_ENABLED: bool = True
+    ANSWER_CACHE_SIMILARITY: float = 0.95
+    ANSWER_CACHE_TTL: int = 60 * 60
+    ANSWER_CACHE_DOCUMENTS: int = 1024
+    ANSWER_CACHE_PER_DOCUMENT: int = 64
+    # Chat sessions: recent messages sent verbatim, older ones are folded into a running
+    # summary CHAT_SUMMARY_BATCH at a time; long messages are cut in the prompt
+    CHAT_HISTORY_WINDOW: int = 6
+    CHAT_SUMMARY_BATCH: int = 6
+    CHAT_HISTORY_MESSAGE_CHARS: int = 1000
+    # Seconds without an event before the chat stream sends an SSE comment to keep proxies from timing out
+    SSE_HEARTBEAT_INTERVAL: float = 15.0
+    # BM25 keyword index (SQLite FTS5, one file per user) fused with vector hits
+    LEXICAL_INDEX_ENABLED: bool = True
+    LEXICAL_INDEX_PATH: str = "./lexical_index"
+    # Reciprocal rank fusion constant
+    RRF_K: int = 60
+    # Skip the embedding call when quoted phrases / clause numbers in the query all match a chunk
+    LEXICAL_SHORTCUT_ENABLED: bool = True
+
+    # Batches buffered between ingest stages (chunk -> embed -> upsert)
+    INGEST_QUEUE_SIZE: int = 4
+    # Image-only pages are rendered at OCR_DPI and transcribed one request per page
+    OCR_DPI: int = 150
+    OCR_MAX_CONCURRENCY: int = 4
+    OCR_LOOKAHEAD_PAGES: int = 16
+    # Upserts are packed up to this payload size (Pinecone rejects requests over 2MB)
+    VECTOR_UPSERT_MAX_BYTES: int = 2 * 1024 * 1024 - 128 * 1024
+    VECTOR_UPSERT_MAX_COUNT: int = 1000
+    VECTOR_UPSERT_MAX_IN_FLIGHT: int = 4
+    VECTOR_UPSERT_MAX_RETRIES: int = 3
 
     # PINECONE
-    PINECONE_API_KEY: str
+    PINECONE_API_KEY: str | None = None
     PINECONE_API_ENV: str = "us-east-1"
-    PINECONE_API_INDEX: str
+    PINECONE_API_INDEX: str | None = None
+    # Optional index host, skips the control plane lookup when building the index handle
+    PINECONE_INDEX_HOST: str | None = None
+    # gRPC transport needs the pinecone[grpc] extra
+    PINECONE_USE_GRPC: bool = False
+    PINECONE_POOL_THREADS: int = 8
+    PINECONE_CONNECTION_POOL_MAXSIZE: int = 16
 
     # OPENAI
     GEMINI_API_KEY: str
+    # Texts sent per embed_content request and batches kept in flight at once
+    EMBEDDING_BATCH_SIZE: int = 100
+    EMBEDDING_MAX_CONCURRENCY: int = 4
+    # Chat query embeddings, set QUERY_EMBEDDING_CACHE_PATH to also keep them in a SQLite file
+    QUERY_EMBEDDING_CACHE_SIZE: int = 2048
+    QUERY_EMBEDDING_CACHE_PATH: str | None = None
+    # Upper bound on Gemini requests in flight per process (async client)
+    GEMINI_MAX_CONCURRENCY: int = 8
+    # Uploaded files are reused until shortly before the Files API expires them (48h)
+    GEMINI_FILE_CACHE_SIZE: int = 512
+    GEMINI_FILE_CACHE_TTL: int = 60 * 60 * 47
+    GEMINI_RESULT_CACHE_SIZE: int = 256
+    GEMINI_RESULT_CACHE_TTL: int = 60 * 60 * 24
+
+    # SYNC WORKERS
+    SYNC_WORKER_PROCESSES: int = 2
+    SYNC_WORKER_POLL_INTERVAL: float = 2.0
+    SYNC_JOB_MAX_ATTEMPTS: int = 3
+    # Running jobs locked longer than this are assumed dead and picked up again,
+    # a worker refreshes the lock every SYNC_JOB_HEARTBEAT_INTERVAL seconds while its job runs
+    SYNC_JOB_LOCK_TIMEOUT: int = 60 * 30
+    SYNC_JOB_HEARTBEAT_INTERVAL: float = 60.0
+
+    # UPLOADS
+    # Files are stored once per content hash under blobs/, copied in chunks of this size
+    UPLOAD_CHUNK_SIZE: int = 1024 * 1024
+    BULK_UPLOAD_MAX_FILES: int = 200
+    # "local" keeps files under UPLOAD_PATH, "s3" in S3_BUCKET (set S3_ENDPOINT_URL for MinIO, needs boto3)
+    STORAGE_BACKEND: Literal["local", "s3"] = "local"
+    UPLOAD_PATH: str = "./storage"
+    S3_BUCKET: str = "kontrakwise"
+    S3_ENDPOINT_URL: str | None = None
+    S3_ACCESS_KEY_ID: str | None = None
+    S3_SECRET_ACCESS_KEY: str | None = None
+    S3_REGION: str | None = None
+    S3_MAX_POOL_CONNECTIONS: int = 20
+    # Local copies of S3 files for ingestion and Gemini uploads
+    STORAGE_CACHE_PATH: str = "./storage_cache"
 
     @computed_field
     @property
@@ -0,0 +1,84 @@
+import hashlib
+import re
+import sqlite3
+import threading
+from array import array
+from pathlib import Path
+
+from app.core.cache import LRUCache
+from app.core.config import settings
+
+
+def normalize_query(text: str) -> str:
+    """Case-fold, collapse whitespace and drop trailing punctuation so trivially different questions share a key"""
+    text = re.sub(r"\s+", " ", text.strip().lower())
+    return text.rstrip("?!. ")
+
+
+class EmbeddingCache:
+    """Query embedding cache keyed by (embedding model, normalized text).
+
+    Entries live in an in-memory LRU and, when ``disk_path`` is set, in a
+    SQLite file so they survive restarts and are shared between workers.
+    """
+
+    def __init__(self, maxsize: int = 2048, disk_path: str | None = None):
+        self.memory = LRUCache(maxsize=maxsize)
+        self.disk_path = disk_path
+        self.disk_hits = 0
+        self._lock = threading.Lock()
+        if disk_path:
+            Path(disk_path).parent.mkdir(parents=True, exist_ok=True)
+            with self._connect() as conn:
+                conn.execute("CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB NOT NULL)")
+
+    def _connect(self):
+        return sqlite3.connect(self.disk_path, timeout=5)
+
+    @staticmethod
+    def make_key(model: str, text: str) -> str:
+        return hashlib.sha256(f"{model}\x00{normalize_query(text)}".encode("utf-8")).hexdigest()
+
+    def get(self, model: str, text: str) -> list[float] | None:
+        key = self.make_key(model, text)
+        vector = self.memory.get(key)
+        if vector is not None or not self.disk_path:
+            return vector
+
+        with self._lock, self._connect() as conn:
+            row = conn.execute("SELECT vector FROM embeddings WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        vector = array("f", row[0]).tolist()
+        self.disk_hits += 1
+        self.memory.set(key, vector)
+        return vector
+
+    def set(self, model: str, text: str, vector: list[float]):
+        key = self.make_key(model, text)
+        self.memory.set(key, vector)
+        if self.disk_path:
+            with self._lock, self._connect() as conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO embeddings (key, vector) VALUES (?, ?)",
+                    (key, array("f", vector).tobytes())
+                )
+
+    def stats(self) -> dict:
+        memory = self.memory.stats()
+        lookups = memory["hits"] + memory["misses"]
+        hits = memory["hits"] + self.disk_hits
+        return {
+            "size": memory["size"],
+            "memory_hits": memory["hits"],
+            "disk_hits": self.disk_hits,
+            "misses": memory["misses"] - self.disk_hits,
+            "hit_rate": hits / lookups if lookups else 0.0,
+        }
+
+
+# Global instance
+query_embedding_cache = EmbeddingCache(
+    maxsize=settings.QUERY_EMBEDDING_CACHE_SIZE,
+    disk_path=settings.QUERY_EMBEDDING_CACHE_PATH,
+)
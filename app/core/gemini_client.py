@@ -1,130 +1,199 @@
-import time
+import asyncio
+import json
+from datetime import datetime, timezone
 from google import genai
 from google.genai import types
 from app.core.config import settings
+from app.core.cache import LRUCache, file_sha256, text_sha256
+from app.core.embedding_cache import query_embedding_cache
 import pathlib
 
 from typing import List
 
-class GeminiAI:
-    def __init__(self):
-        self.client = genai.Client(api_key=settings.GEMINI_API_KEY)
-        # self.model = "gemini-embedding-001"
+# Remote Files API handles keyed by the SHA-256 of the uploaded bytes
+file_upload_cache = LRUCache(maxsize=settings.GEMINI_FILE_CACHE_SIZE)
+# Model responses keyed by (file hash, prompt hash, response schema hash)
+result_cache = LRUCache(maxsize=settings.GEMINI_RESULT_CACHE_SIZE, ttl=settings.GEMINI_RESULT_CACHE_TTL)
+
+
+class AsyncGeminiAI:
+    """Gemini client built on the SDK's async ``client.aio`` surface.
+
+    Every network call goes through a shared concurrency limiter so a burst of
+    syncs or analyses can't open an unbounded number of Gemini requests.
+    """
+    def __init__(self, client: genai.Client = None, max_concurrency: int = None):
+        self.client = client or genai.Client(api_key=settings.GEMINI_API_KEY)
+        self.aio = self.client.aio
         self.embedding_model = "gemini-embedding-001"
-    
-    def create_embedding(self, text: str) -> List[float]:
+        self.max_concurrency = max_concurrency or settings.GEMINI_MAX_CONCURRENCY
+        self._semaphores = {}
+
+    def _limiter(self) -> asyncio.Semaphore:
+        # Semaphores are bound to the loop they first wait on; scripts calling asyncio.run more than once get a fresh one per loop
+        loop = asyncio.get_running_loop()
+        semaphore = self._semaphores.get(loop)
+        if semaphore is None:
+            self._semaphores = {loop: asyncio.Semaphore(self.max_concurrency)}
+            semaphore = self._semaphores[loop]
+        return semaphore
+
+    async def create_embedding(self, text: str) -> List[float]:
         """Create embedding for a single text"""
         try:
-            response = self.client.models.embed_content(contents=text, model=self.embedding_model)
+            async with self._limiter():
+                response = await self.aio.models.embed_content(contents=text, model=self.embedding_model)
             return response.embeddings[0].values
         except Exception as e:
             raise Exception(f"Failed to create embedding: {str(e)}")
-    
-    def create_embeddings(self, texts: List[str]) -> List[List[float]]:
-        """Create embeddings for multiple texts (batch processing)"""
+
+    async def create_query_embedding(self, query: str) -> List[float]:
+        """Create embedding for a chat query, reusing cached vectors for repeated questions"""
+        embedding = await asyncio.to_thread(query_embedding_cache.get, self.embedding_model, query)
+        if embedding is None:
+            embedding = await self.create_embedding(query)
+            await asyncio.to_thread(query_embedding_cache.set, self.embedding_model, query, embedding)
+        return embedding
+
+    async def create_embeddings(self, texts: List[str]) -> List[List[float]]:
+        """Create embeddings for multiple texts in a single request"""
         try:
-            response = self.client.embeddings.create(
-                model=self.embedding_model,
-                input=texts
-            )
-            return [data.embedding for data in response.data]
+            async with self._limiter():
+                response = await self.aio.models.embed_content(contents=texts, model=self.embedding_model)
+            return [embedding.values for embedding in response.embeddings]
         except Exception as e:
             raise Exception(f"Failed to create embeddings: {str(e)}")
-    
-    def get_embedding_dimension(self) -> int:
-        """Get the dimension of the embedding model"""
-        return 1536  # text-embedding-3-small dimension
+
+    async def _get_or_upload_file(self, document: pathlib.Path, file_hash: str):
+        """Return the remote Gemini file for these bytes, uploading only on a cache miss"""
+        doc_gfile = file_upload_cache.get(file_hash)
+        if doc_gfile is not None:
+            print(f"Reusing uploaded file {doc_gfile.name} for {document}")
+            return doc_gfile
+
+        async with self._limiter():
+            doc_gfile = await self.aio.files.upload(file=document)
+
+        # Files API entries expire after 48h, stop reusing the handle a bit before that
+        ttl = settings.GEMINI_FILE_CACHE_TTL
+        if getattr(doc_gfile, "expiration_time", None):
+            remaining = (doc_gfile.expiration_time - datetime.now(timezone.utc)).total_seconds()
+            ttl = min(ttl, remaining - 60 * 10)
+        if ttl > 0:
+            file_upload_cache.set(file_hash, doc_gfile, ttl=ttl)
+        return doc_gfile
 
     async def generate_context_with_file(self, file_path: str, prompt: str, model=None) -> str:
-        """Generate context with file using Gemini"""
+        """Generate context with file using Gemini.
+
+        Uploads are reused per file SHA-256 and results are cached per
+        (file hash, prompt hash, response schema).
+        """
         document = pathlib.Path(file_path)
-        
-        # Upload file once outside the retry loop
-        doc_gfile = self.client.files.upload(
-            file=document,
-        )
-        
+        file_hash = await asyncio.to_thread(file_sha256, str(document))
+        schema = json.dumps(model.model_json_schema(), sort_keys=True) if model else ""
+        result_key = (file_hash, text_sha256(prompt), text_sha256(schema))
+
+        cached = result_cache.get(result_key)
+        if cached is not None:
+            print(f"Result cache hit for file: {file_path}")
+            return cached
+
+        doc_gfile = await self._get_or_upload_file(document, file_hash)
+
         max_retries = 3
-        result = None
-        
         for attempt in range(max_retries):
             try:
                 print(f"Generating context with file: {file_path} (attempt {attempt + 1}/{max_retries})")
-                # Build generation parameters
                 generation_params = {
                     "model": "gemini-2.5-flash",
                     "contents": [doc_gfile, prompt]
                 }
-                
-                # Add config only if model is provided
                 if model:
                     generation_params["config"] = {
                         "response_mime_type": "application/json",
                         "response_json_schema": model.model_json_schema()
                     }
-                
-                response = self.client.models.generate_content(**generation_params)
-                
-                # Store result and break on success
-                result = response.text
-                break
-                
+
+                async with self._limiter():
+                    response = await self.aio.models.generate_content(**generation_params)
+                if response.text:
+                    result_cache.set(result_key, response.text)
+                return response.text
+
             except Exception as e:
                 print(f"Attempt {attempt + 1} failed: {str(e)}")
                 if attempt == max_retries - 1:
                     raise Exception(f"Failed to generate context with file after {max_retries} attempts: {str(e)}")
-                time.sleep(2 ** attempt)  # Exponential backoff: 1s, 2s, 4s
-            finally:
-                # Only cleanup on the last attempt or if we got a result
-                if attempt == max_retries - 1 or result is not None:
-                    try:
-                        self.client.files.delete(name=doc_gfile.name)
-                        print(f"Cleaned up file: {doc_gfile.name}")
-                    except Exception as cleanup_error:
-                        print(f"Warning: Failed to cleanup file {doc_gfile.name}: {cleanup_error}")
-        print("result:", result)
-        return result
-
-    def generate_content(self, prompt: str) -> str:
+                if getattr(e, "code", None) in (403, 404):
+                    # The cached remote file expired or was removed, upload it again
+                    file_upload_cache.delete(file_hash)
+                    doc_gfile = await self._get_or_upload_file(document, file_hash)
+                await asyncio.sleep(2 ** attempt)  # Exponential backoff: 1s, 2s, 4s
+
+    async def generate_content_with_image(self, image_bytes: bytes, prompt: str, mime_type: str = "image/png") -> str:
+        """Generate content from a single image (e.g. a rendered PDF page) using Gemini"""
+        max_retries = 3
+        image_part = types.Part.from_bytes(data=image_bytes, mime_type=mime_type)
+
+        for attempt in range(max_retries):
+            try:
+                async with self._limiter():
+                    response = await self.aio.models.generate_content(
+                        model="gemini-2.5-flash",
+                        contents=[image_part, prompt]
+                    )
+                return response.text or ""
+
+            except Exception as e:
+                print(f"Attempt {attempt + 1} failed: {str(e)}")
+                if attempt == max_retries - 1:
+                    raise Exception(f"Failed to generate content from image after {max_retries} attempts: {str(e)}")
+                await asyncio.sleep(2 ** attempt)  # Exponential backoff: 1s, 2s, 4s
+
+    async def generate_content(self, prompt: str) -> str:
         """Generate content using Gemini"""
         max_retries = 3
         retry_delay = 1 # seconds
-        
+
         for attempt in range(max_retries):
             try:
                 print(f"Generating content for prompt")
-                response = self.client.models.generate_content(
-                    model="gemini-3-flash-preview",
-                    contents=prompt
-                )
-                
+                async with self._limiter():
+                    response = await self.aio.models.generate_content(
+                        model="gemini-3-flash-preview",
+                        contents=prompt
+                    )
                 return response.text
-                
+
             except Exception as e:
                 print(f"Error generating content: {str(e), type(e)}")
                 if attempt < max_retries - 1:
                     # Exponential backoff: 1s, 2s, 4s
-                    time.sleep(retry_delay * (2 ** attempt))
+                    await asyncio.sleep(retry_delay * (2 ** attempt))
                     continue
                 raise Exception(f"Failed to generate AI response: {str(e)}")
-    
-    def generate_content_stream(self, prompt: str):
+
+    async def generate_content_stream(self, prompt: str):
         """Generate streaming content using Gemini"""
         try:
             print(f"Starting streaming content generation")
-            response = self.client.models.generate_content_stream(
-                # model="gemini-3-flash-preview",
-                model="gemini-2.5-flash",
-                contents=prompt
-            )
-            
-            for chunk in response:
-                if chunk.text:
-                    yield chunk.text
-                    
+            async with self._limiter():
+                response = await self.aio.models.generate_content_stream(
+                    model="gemini-2.5-flash",
+                    contents=prompt
+                )
+                try:
+                    async for chunk in response:
+                        if chunk.text:
+                            yield chunk.text
+                finally:
+                    # Closes the HTTP stream when the consumer stops early (client disconnect)
+                    await response.aclose()
+
         except Exception as e:
             print(f"Error in streaming content generation: {str(e)}")
             raise Exception(f"Failed to generate streaming AI response: {str(e)}")
 
 # Global instance
-gemAI = GeminiAI()
+asyncGemAI = AsyncGeminiAI()
@@ -0,0 +1,131 @@
+import re
+import sqlite3
+import threading
+from pathlib import Path
+
+from app.core.config import settings
+from app.core.vector_store_base import QueryMatch
+
+
+def query_terms(text: str) -> list[str]:
+    return list(dict.fromkeys(re.findall(r"\w+", text.lower())))
+
+
+def exact_terms(query: str) -> list[str]:
+    """Terms the answer has to contain verbatim: quoted phrases and tokens with digits (clause 12.3, 4(b), 2024)"""
+    quoted = re.findall(r'"([^"]+)"', query)
+    unquoted = re.sub(r'"[^"]*"', " ", query)
+    numbered = re.findall(r"\w*\d[\w.()\-/]*\w|\w*\d\w*", unquoted)
+    return [term for term in dict.fromkeys(quoted + numbered) if query_terms(term)]
+
+
+def _phrase(term: str) -> str:
+    # FTS5 string syntax: tokens inside double quotes match as an adjacent phrase
+    return '"' + " ".join(query_terms(term)) + '"'
+
+
+class LexicalIndex:
+    """BM25 keyword index over chunk text, one SQLite FTS5 file per user.
+
+    Complements dense retrieval for exact terms (clause numbers, party names,
+    defined terms) that embeddings tend to blur.
+    """
+
+    def __init__(self, root: str):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._locks: dict[int, threading.Lock] = {}
+        self._locks_guard = threading.Lock()
+
+    def _lock(self, user_id: int) -> threading.Lock:
+        with self._locks_guard:
+            return self._locks.setdefault(user_id, threading.Lock())
+
+    def _connect(self, user_id: int) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.root / f"user_{user_id}.sqlite3", timeout=10)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS chunks USING fts5("
+            "text, document_id UNINDEXED, page UNINDEXED, chunk_index UNINDEXED, vector_id UNINDEXED)"
+        )
+        # FTS5 can't index UNINDEXED columns, so ids live in a lookup table keyed by the FTS rowid
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS chunk_ids ("
+            "rowid INTEGER PRIMARY KEY, vector_id TEXT NOT NULL UNIQUE, document_id INTEGER NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS ix_chunk_ids_document_id ON chunk_ids (document_id)")
+        return conn
+
+    def add_chunks(self, user_id: int, document_id: int, chunks: list[dict]):
+        """Index chunks given as dicts with vector_id, text, page and chunk_index, replacing same ids"""
+        if not chunks:
+            return
+        with self._lock(user_id), self._connect(user_id) as conn:
+            self._delete_ids(conn, [chunk["vector_id"] for chunk in chunks])
+            for chunk in chunks:
+                rowid = conn.execute(
+                    "INSERT INTO chunk_ids (vector_id, document_id) VALUES (?, ?)",
+                    (chunk["vector_id"], document_id)
+                ).lastrowid
+                conn.execute(
+                    "INSERT INTO chunks (rowid, text, document_id, page, chunk_index, vector_id) VALUES (?, ?, ?, ?, ?, ?)",
+                    (rowid, chunk["text"], document_id, chunk["page"], chunk["chunk_index"], chunk["vector_id"])
+                )
+
+    @staticmethod
+    def _delete_ids(conn: sqlite3.Connection, vector_ids: list[str]):
+        for start in range(0, len(vector_ids), 500):
+            batch = vector_ids[start:start + 500]
+            placeholders = ",".join("?" * len(batch))
+            rowids = [row[0] for row in conn.execute(f"SELECT rowid FROM chunk_ids WHERE vector_id IN ({placeholders})", batch)]
+            if rowids:
+                rowid_placeholders = ",".join("?" * len(rowids))
+                conn.execute(f"DELETE FROM chunks WHERE rowid IN ({rowid_placeholders})", rowids)
+                conn.execute(f"DELETE FROM chunk_ids WHERE rowid IN ({rowid_placeholders})", rowids)
+
+    def delete_chunks(self, user_id: int, vector_ids: list[str]):
+        with self._lock(user_id), self._connect(user_id) as conn:
+            self._delete_ids(conn, vector_ids)
+
+    def delete_document(self, user_id: int, document_id: int):
+        with self._lock(user_id), self._connect(user_id) as conn:
+            conn.execute("DELETE FROM chunks WHERE rowid IN (SELECT rowid FROM chunk_ids WHERE document_id = ?)", (document_id,))
+            conn.execute("DELETE FROM chunk_ids WHERE document_id = ?", (document_id,))
+
+    def has_document(self, user_id: int, document_id: int) -> bool:
+        with self._connect(user_id) as conn:
+            return conn.execute("SELECT 1 FROM chunk_ids WHERE document_id = ? LIMIT 1", (document_id,)).fetchone() is not None
+
+    def _search(self, user_id: int, document_id: int, match: str, top_k: int) -> list[QueryMatch]:
+        with self._connect(user_id) as conn:
+            rows = conn.execute(
+                "SELECT vector_id, bm25(chunks), text, page, chunk_index FROM chunks "
+                "WHERE chunks MATCH ? AND document_id = ? ORDER BY bm25(chunks) LIMIT ?",
+                (match, document_id, top_k)
+            ).fetchall()
+        # bm25() is lower-is-better, flip it so scores sort like similarities
+        return [
+            QueryMatch(
+                id=vector_id,
+                score=-rank,
+                metadata={"document_id": document_id, "text": text, "page": page, "chunk_index": chunk_index}
+            )
+            for vector_id, rank, text, page, chunk_index in rows
+        ]
+
+    def search(self, user_id: int, document_id: int, query: str, top_k: int = 5) -> list[QueryMatch]:
+        """Chunks of the document ranked by BM25 over any of the query terms"""
+        terms = query_terms(query)
+        if not terms:
+            return []
+        return self._search(user_id, document_id, " OR ".join(f'"{term}"' for term in terms), top_k)
+
+    def search_exact(self, user_id: int, document_id: int, terms: list[str], top_k: int = 5) -> list[QueryMatch]:
+        """Chunks containing every term as a phrase"""
+        if not terms:
+            return []
+        return self._search(user_id, document_id, " AND ".join(_phrase(term) for term in terms), top_k)
+
+
+# Global instance
+lexical_index = LexicalIndex(settings.LEXICAL_INDEX_PATH) if settings.LEXICAL_INDEX_ENABLED else None
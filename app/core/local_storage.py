@@ -0,0 +1,59 @@
+import os
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Iterator
+
+from app.core.storage_base import BlobStorage, BlobInfo, key_content_hash
+
+
+class LocalStorage(BlobStorage):
+    """Files under a root directory, which several API nodes can share over a network mount"""
+
+    def __init__(self, root: str):
+        self.root = Path(root)
+        # Staged next to the files so put_file is an atomic rename on the same filesystem
+        self.staging_dir = self.root / "tmp"
+        self.staging_dir.mkdir(parents=True, exist_ok=True)
+
+    def _path(self, key: str) -> Path:
+        path = (self.root / key).resolve()
+        if not path.is_relative_to(self.root.resolve()):
+            raise ValueError(f"Storage key outside the storage root: {key}")
+        return path
+
+    def put_file(self, key: str, source_path: str):
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        os.replace(source_path, path)
+
+    def stat(self, key: str) -> BlobInfo | None:
+        try:
+            stat = self._path(key).stat()
+        except FileNotFoundError:
+            return None
+        # Content addressed keys name their bytes, storing the same content again keeps the ETag.
+        # Older keys fall back to nginx's mtime-size scheme
+        content_hash = key_content_hash(key)
+        return BlobInfo(
+            size=stat.st_size,
+            etag=f'"{content_hash}"' if content_hash else f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"',
+            last_modified=datetime.fromtimestamp(stat.st_mtime, tz=timezone.utc)
+        )
+
+    def iter_range(self, key: str, start: int = 0, end: int | None = None, chunk_size: int = 64 * 1024) -> Iterator[bytes]:
+        with self._path(key).open("rb") as f:
+            f.seek(start)
+            remaining = None if end is None else end - start + 1
+            while remaining is None or remaining > 0:
+                chunk = f.read(chunk_size if remaining is None else min(chunk_size, remaining))
+                if not chunk:
+                    break
+                if remaining is not None:
+                    remaining -= len(chunk)
+                yield chunk
+
+    def delete(self, key: str):
+        self._path(key).unlink(missing_ok=True)
+
+    def local_path(self, key: str) -> str:
+        return str(self._path(key))
@@ -0,0 +1,231 @@
+import fcntl
+import json
+import os
+import re
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+
+import numpy as np
+
+from app.core.vector_store_base import VectorStore, QueryMatch, QueryResult, matches_filter
+
+
+class _Namespace:
+    """Vectors of one namespace stored as a memory-mapped float32 matrix.
+
+    Rows are L2-normalized on write so a query is a single matrix-vector
+    product. ``meta.json`` keeps ids, metadata and the number of used rows;
+    the matrix grows by doubling its capacity.
+
+    Several processes (API and sync workers) share the directory: every
+    operation holds an flock on ``.lock``, shared for reads and exclusive for
+    writes, and reloads the in-memory state when the ``generation`` counter
+    another process bumped no longer matches.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.vectors_path = path / "vectors.npy"
+        self.meta_path = path / "meta.json"
+        self.lock_path = path / ".lock"
+        self.generation_path = path / "generation"
+        self.generation = None
+        self._reset()
+
+    def _reset(self):
+        self.dim = None
+        self.count = 0
+        self.ids: list[str] = []
+        self.metadata: list[dict] = []
+        self.rows: dict[str, int] = {}
+        self.matrix = None
+
+    @contextmanager
+    def locked(self, exclusive: bool = False):
+        """Hold the namespace's file lock and bring the in-memory state up to date"""
+        self.path.mkdir(parents=True, exist_ok=True)
+        with open(self.lock_path, "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            try:
+                generation = self._read_generation()
+                if generation != self.generation:
+                    self._load()
+                    self.generation = generation
+                yield self
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _read_generation(self) -> int:
+        try:
+            return int(self.generation_path.read_text() or 0)
+        except FileNotFoundError:
+            return 0
+
+    def _load(self):
+        # Also reopens vectors.npy, which another process may have replaced while growing it
+        self._reset()
+        if not self.meta_path.exists():
+            return
+        with self.meta_path.open("r") as f:
+            meta = json.load(f)
+        self.dim = meta["dim"]
+        self.count = meta["count"]
+        self.ids = meta["ids"]
+        self.metadata = meta["metadata"]
+        self.rows = {vector_id: row for row, vector_id in enumerate(self.ids)}
+        self.matrix = np.load(self.vectors_path, mmap_mode="r+")
+
+    def _save_meta(self):
+        tmp_path = self.meta_path.with_suffix(".tmp")
+        with tmp_path.open("w") as f:
+            json.dump({"dim": self.dim, "count": self.count, "ids": self.ids, "metadata": self.metadata}, f)
+        os.replace(tmp_path, self.meta_path)
+        # Written under the exclusive lock, so readers never see it half-written
+        self.generation += 1
+        self.generation_path.write_text(str(self.generation))
+
+    def _ensure_capacity(self, needed: int):
+        capacity = 0 if self.matrix is None else self.matrix.shape[0]
+        if needed <= capacity:
+            return
+        new_capacity = max(needed, capacity * 2, 1024)
+        self.path.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.vectors_path.with_suffix(".tmp.npy")
+        grown = np.lib.format.open_memmap(tmp_path, mode="w+", dtype=np.float32, shape=(new_capacity, self.dim))
+        if self.count:
+            grown[:self.count] = self.matrix[:self.count]
+        grown.flush()
+        del grown
+        self.matrix = None
+        os.replace(tmp_path, self.vectors_path)
+        self.matrix = np.load(self.vectors_path, mmap_mode="r+")
+
+    def upsert(self, vectors: list[dict]) -> int:
+        if not vectors:
+            return 0
+        values = np.asarray([v["values"] for v in vectors], dtype=np.float32)
+        if self.dim is None:
+            self.dim = values.shape[1]
+        if values.shape[1] != self.dim:
+            raise ValueError(f"Vector dimension {values.shape[1]} does not match namespace dimension {self.dim}")
+        norms = np.linalg.norm(values, axis=1, keepdims=True)
+        values = values / np.where(norms == 0, 1, norms)
+
+        new_ids = [v["id"] for v in vectors if v["id"] not in self.rows]
+        self._ensure_capacity(self.count + len(set(new_ids)))
+        for vector, row_values in zip(vectors, values):
+            row = self.rows.get(vector["id"])
+            if row is None:
+                row = self.count
+                self.count += 1
+                self.rows[vector["id"]] = row
+                self.ids.append(vector["id"])
+                self.metadata.append(vector.get("metadata", {}))
+            else:
+                self.metadata[row] = vector.get("metadata", {})
+            self.matrix[row] = row_values
+        self.matrix.flush()
+        self._save_meta()
+        return len(vectors)
+
+    def query(self, query_vector: list[float], top_k: int, filter_dict: dict | None) -> list[QueryMatch]:
+        if not self.count:
+            return []
+        query = np.asarray(query_vector, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        if norm:
+            query = query / norm
+        scores = self.matrix[:self.count] @ query
+
+        if filter_dict:
+            mask = np.fromiter((matches_filter(m, filter_dict) for m in self.metadata), dtype=bool, count=self.count)
+            candidates = np.flatnonzero(mask)
+            if not len(candidates):
+                return []
+            scores = scores[candidates]
+        else:
+            candidates = np.arange(self.count)
+
+        k = min(top_k, len(candidates))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [
+            QueryMatch(id=self.ids[candidates[i]], score=float(scores[i]), metadata=self.metadata[candidates[i]])
+            for i in top
+        ]
+
+    def update_metadata(self, updates: dict[str, dict]) -> int:
+        updated = 0
+        for vector_id, metadata in updates.items():
+            row = self.rows.get(vector_id)
+            if row is not None:
+                self.metadata[row] = {**self.metadata[row], **metadata}
+                updated += 1
+        if updated:
+            self._save_meta()
+        return updated
+
+    def delete(self, filter_dict: dict | None, ids: list[str] | None = None) -> int:
+        if not self.count:
+            return 0
+        if ids:
+            ids = set(ids)
+            keep = [row for row in range(self.count) if self.ids[row] not in ids]
+        else:
+            keep = [row for row in range(self.count) if filter_dict and not matches_filter(self.metadata[row], filter_dict)]
+        deleted = self.count - len(keep)
+        if not deleted:
+            return 0
+        # Compact the surviving rows to the front of the matrix
+        if keep:
+            self.matrix[:len(keep)] = self.matrix[keep]
+            self.matrix.flush()
+        self.ids = [self.ids[row] for row in keep]
+        self.metadata = [self.metadata[row] for row in keep]
+        self.rows = {vector_id: row for row, vector_id in enumerate(self.ids)}
+        self.count = len(keep)
+        self._save_meta()
+        return deleted
+
+
+class LocalVectorStore(VectorStore):
+    """On-disk vector store for single-tenant deployments and offline testing.
+
+    Each namespace (``user_{id}``) lives in its own directory under ``root``
+    and can be shared by several processes on the same host.
+    """
+
+    def __init__(self, root: str):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._namespaces: dict[str, _Namespace] = {}
+        self._lock = threading.RLock()
+
+    def _namespace(self, namespace: str) -> _Namespace:
+        if not re.fullmatch(r"[A-Za-z0-9_\-]+", namespace):
+            raise ValueError(f"Invalid namespace: {namespace}")
+        if namespace not in self._namespaces:
+            self._namespaces[namespace] = _Namespace(self.root / namespace)
+        return self._namespaces[namespace]
+
+    def upsert_vectors(self, vectors, namespace="default"):
+        """Insert or update vectors in the index"""
+        with self._lock, self._namespace(namespace).locked(exclusive=True) as ns:
+            return {"upserted_count": ns.upsert(vectors)}
+
+    def query_vectors(self, query_vector, top_k=5, filter_dict=None, namespace="default"):
+        """Query for similar vectors"""
+        with self._lock, self._namespace(namespace).locked() as ns:
+            matches = ns.query(query_vector, top_k, filter_dict)
+        return QueryResult(matches=matches, namespace=namespace)
+
+    def delete_vectors(self, namespace, filter_dict=None, ids=None):
+        """Delete vectors by id or matching the filter, or the whole namespace without either"""
+        with self._lock, self._namespace(namespace).locked(exclusive=True) as ns:
+            return {"deleted_count": ns.delete(filter_dict, ids)}
+
+    def update_metadata(self, namespace, updates):
+        """Merge metadata fields into existing vectors"""
+        with self._lock, self._namespace(namespace).locked(exclusive=True) as ns:
+            return {"updated_count": ns.update_metadata(updates)}
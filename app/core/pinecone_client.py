@@ -1,19 +1,33 @@
-from os import name
+import threading
+import time
+from contextlib import contextmanager
 from pinecone import Pinecone, ServerlessSpec
 from app.core.config import settings
+from app.core.vector_store_base import VectorStore
 
-class PineconeClient:
+class PineconeClient(VectorStore):
     def __init__(self):
-        self.client = Pinecone(api_key=settings.PINECONE_API_KEY)
+        if settings.PINECONE_USE_GRPC:
+            try:
+                from pinecone.grpc import PineconeGRPC
+            except ImportError as e:
+                raise Exception("PINECONE_USE_GRPC requires the grpc extra: pip install 'pinecone[grpc]'") from e
+            self.client = PineconeGRPC(api_key=settings.PINECONE_API_KEY)
+        else:
+            self.client = Pinecone(api_key=settings.PINECONE_API_KEY)
         self.index_name = settings.PINECONE_API_INDEX
-        self._ensure_index_exists()
+        # The index handle owns the HTTP/gRPC connection pool, so it is built once and shared
+        self._index = None
+        self._index_lock = threading.Lock()
+        self._timings = {}
+        self._timings_lock = threading.Lock()
     
     def _ensure_index_exists(self):
         """Create index if it doesn't exist"""
         if self.index_name not in self.client.list_indexes().names():
             self.client.create_index(
                 name=self.index_name,
-                dimension=3072,  # OpenAI embedding dimension
+                dimension=3072,  # gemini-embedding-001 dimension
                 metric="cosine",
                 spec=ServerlessSpec(
                     cloud="aws",
@@ -22,29 +36,83 @@ class PineconeClient:
             )
     
     def get_index(self):
-        """Get the Pinecone index"""
-        return self.client.Index(self.index_name)
+        """Get the shared Pinecone index handle, creating it on first use"""
+        if self._index is not None:
+            return self._index
+        with self._index_lock:
+            if self._index is None:
+                index_kwargs = {"pool_threads": settings.PINECONE_POOL_THREADS}
+                if settings.PINECONE_INDEX_HOST:
+                    # A known host skips the describe_index call to the control plane
+                    index_kwargs["host"] = settings.PINECONE_INDEX_HOST
+                else:
+                    self._ensure_index_exists()
+                    index_kwargs["name"] = self.index_name
+                if not settings.PINECONE_USE_GRPC:
+                    index_kwargs["connection_pool_maxsize"] = settings.PINECONE_CONNECTION_POOL_MAXSIZE
+                self._index = self.client.Index(**index_kwargs)
+        return self._index
+
+    @contextmanager
+    def _timed(self, operation: str):
+        start = time.perf_counter()
+        failed = False
+        try:
+            yield
+        except Exception:
+            failed = True
+            raise
+        finally:
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            with self._timings_lock:
+                stats = self._timings.setdefault(operation, {"count": 0, "errors": 0, "total_ms": 0.0, "max_ms": 0.0, "last_ms": 0.0})
+                stats["count"] += 1
+                stats["errors"] += int(failed)
+                stats["total_ms"] += elapsed_ms
+                stats["max_ms"] = max(stats["max_ms"], elapsed_ms)
+                stats["last_ms"] = elapsed_ms
+
+    def get_timings(self) -> dict:
+        """Per-operation call counts and latencies (ms) since startup"""
+        with self._timings_lock:
+            return {
+                operation: {**stats, "avg_ms": stats["total_ms"] / stats["count"] if stats["count"] else 0.0}
+                for operation, stats in self._timings.items()
+            }
     
     def upsert_vectors(self, vectors, namespace="default"):
         """Insert or update vectors in the index"""
         index = self.get_index()
-        return index.upsert(vectors=vectors, namespace=namespace)
+        with self._timed("upsert"):
+            return index.upsert(vectors=vectors, namespace=namespace)
     
     def query_vectors(self, query_vector, top_k=5, filter_dict=None, namespace="default"):
         """Query for similar vectors"""
         index = self.get_index()
-        return index.query(
-            vector=query_vector,
-            namespace=namespace,
-            top_k=top_k,
-            filter=filter_dict,
-            include_metadata=True
-        )
+        with self._timed("query"):
+            return index.query(
+                vector=query_vector,
+                namespace=namespace,
+                top_k=top_k,
+                filter=filter_dict,
+                include_metadata=True
+            )
     
-    def delete_vectors(self, namespace, filter_dict=None):
+    def delete_vectors(self, namespace, filter_dict=None, ids=None):
         """Delete vectors by ID"""
         index = self.get_index()
-        return index.delete(namespace=namespace, filter=filter_dict)
+        with self._timed("delete"):
+            if ids:
+                # Pinecone accepts at most 1000 ids per delete request
+                for i in range(0, len(ids), 1000):
+                    index.delete(ids=ids[i:i + 1000], namespace=namespace)
+                return {}
+            return index.delete(namespace=namespace, filter=filter_dict)
 
-# Global instance
-pinecone_client = PineconeClient()
\ No newline at end of file
+    def update_metadata(self, namespace, updates):
+        """Merge metadata fields into existing vectors, one update request per id"""
+        index = self.get_index()
+        with self._timed("update"):
+            for vector_id, metadata in updates.items():
+                index.update(id=vector_id, set_metadata=metadata, namespace=namespace)
+            return {"updated_count": len(updates)}
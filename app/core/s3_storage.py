@@ -0,0 +1,94 @@
+import os
+import tempfile
+from pathlib import Path
+from typing import Iterator
+
+from app.core.config import settings
+from app.core.storage_base import BlobStorage, BlobInfo
+
+
+class S3Storage(BlobStorage):
+    """Files in an S3 compatible bucket (AWS S3, MinIO via S3_ENDPOINT_URL).
+
+    Readers that need a local file get a copy under STORAGE_CACHE_PATH. Blob
+    keys are content addressed, so a cached copy never goes stale.
+    """
+
+    def __init__(self):
+        try:
+            import boto3
+            from botocore.config import Config
+            from botocore.exceptions import ClientError
+        except ImportError as e:
+            raise Exception("STORAGE_BACKEND=s3 requires boto3: pip install boto3") from e
+        self._client_error = ClientError
+        # boto3 clients are thread safe, one shared client keeps one connection pool
+        self.client = boto3.client(
+            "s3",
+            endpoint_url=settings.S3_ENDPOINT_URL,
+            aws_access_key_id=settings.S3_ACCESS_KEY_ID,
+            aws_secret_access_key=settings.S3_SECRET_ACCESS_KEY,
+            region_name=settings.S3_REGION,
+            # MinIO and most self-hosted stores only do path style addressing
+            config=Config(s3={"addressing_style": "path" if settings.S3_ENDPOINT_URL else "auto"}, max_pool_connections=settings.S3_MAX_POOL_CONNECTIONS)
+        )
+        self.bucket = settings.S3_BUCKET
+        self.cache_dir = Path(settings.STORAGE_CACHE_PATH)
+        self.staging_dir = self.cache_dir / "tmp"
+        self.staging_dir.mkdir(parents=True, exist_ok=True)
+
+    def _cache_path(self, key: str) -> Path:
+        path = (self.cache_dir / key).resolve()
+        if not path.is_relative_to(self.cache_dir.resolve()):
+            raise ValueError(f"Storage key outside the storage root: {key}")
+        return path
+
+    def _is_missing(self, error) -> bool:
+        return error.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound")
+
+    def put_file(self, key: str, source_path: str):
+        # Content addressed keys that already exist hold the same bytes, skip the upload
+        if not (key.startswith("blobs/") and self.stat(key) is not None):
+            self.client.upload_file(source_path, self.bucket, key)
+        # Keep the file as the local copy, ingestion reads it right after upload
+        cache_path = self._cache_path(key)
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        os.replace(source_path, cache_path)
+
+    def stat(self, key: str) -> BlobInfo | None:
+        try:
+            head = self.client.head_object(Bucket=self.bucket, Key=key)
+        except self._client_error as e:
+            if self._is_missing(e):
+                return None
+            raise
+        return BlobInfo(size=head["ContentLength"], etag=head["ETag"], last_modified=head.get("LastModified"))
+
+    def iter_range(self, key: str, start: int = 0, end: int | None = None, chunk_size: int = 64 * 1024) -> Iterator[bytes]:
+        body = self.client.get_object(
+            Bucket=self.bucket,
+            Key=key,
+            Range=f"bytes={start}-{'' if end is None else end}"
+        )["Body"]
+        try:
+            yield from body.iter_chunks(chunk_size)
+        finally:
+            body.close()
+
+    def delete(self, key: str):
+        self.client.delete_object(Bucket=self.bucket, Key=key)
+        self._cache_path(key).unlink(missing_ok=True)
+
+    def local_path(self, key: str) -> str:
+        cache_path = self._cache_path(key)
+        if not cache_path.exists():
+            cache_path.parent.mkdir(parents=True, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=self.staging_dir)
+            os.close(fd)
+            try:
+                self.client.download_file(self.bucket, key, tmp_path)
+                os.replace(tmp_path, cache_path)
+            except BaseException:
+                Path(tmp_path).unlink(missing_ok=True)
+                raise
+        return str(cache_path)
@@ -0,0 +1,16 @@
+from app.core.config import settings
+from app.core.storage_base import BlobStorage, BlobInfo, blob_key
+
+
+def get_storage() -> BlobStorage:
+    """Build the backend selected by STORAGE_BACKEND"""
+    if settings.STORAGE_BACKEND == "s3":
+        from app.core.s3_storage import S3Storage
+        return S3Storage()
+
+    from app.core.local_storage import LocalStorage
+    return LocalStorage(settings.UPLOAD_PATH)
+
+
+# Global instance
+storage = get_storage()
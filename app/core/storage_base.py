@@ -0,0 +1,57 @@
+import re
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Iterator
+
+
+@dataclass
+class BlobInfo:
+    size: int
+    # Quoted, as sent in the ETag header
+    etag: str
+    last_modified: datetime | None = None
+
+
+def blob_key(content_hash: str, suffix: str) -> str:
+    """Content addressed key, sharded two levels deep so no directory/prefix grows past a few hundred entries"""
+    return f"blobs/{content_hash[:2]}/{content_hash[2:4]}/{content_hash}{suffix}"
+
+
+def key_content_hash(key: str) -> str | None:
+    """sha256 a blob_key was derived from, None for keys from before content addressing"""
+    match = re.fullmatch(r"blobs/[0-9a-f]{2}/[0-9a-f]{2}/([0-9a-f]{64})(\.\w+)?", key)
+    return match.group(1) if match else None
+
+
+class BlobStorage(ABC):
+    """Common surface of the file storage backends.
+
+    Keys are relative, '/' separated paths (``documents.file_path``). Files
+    are written by staging them locally first (``staging_dir``) and handing
+    the finished file to ``put_file``. All methods block, call them through
+    ``asyncio.to_thread``.
+    """
+
+    staging_dir: Path
+
+    @abstractmethod
+    def put_file(self, key: str, source_path: str):
+        """Store a finished local file under ``key``, the source file is consumed"""
+
+    @abstractmethod
+    def stat(self, key: str) -> BlobInfo | None:
+        """Size and ETag of a stored file, None when it doesn't exist"""
+
+    @abstractmethod
+    def iter_range(self, key: str, start: int = 0, end: int | None = None, chunk_size: int = 64 * 1024) -> Iterator[bytes]:
+        """Bytes ``start`` to ``end`` (inclusive, None for the end of the file) in chunks"""
+
+    @abstractmethod
+    def delete(self, key: str):
+        """Remove a stored file, missing files are ignored"""
+
+    @abstractmethod
+    def local_path(self, key: str) -> str:
+        """Path of a local file with the content, for readers that need one (PyMuPDF, Gemini uploads)"""
@@ -0,0 +1,16 @@
+from app.core.config import settings
+from app.core.vector_store_base import VectorStore, QueryMatch, QueryResult, matches_filter
+
+
+def get_vector_store() -> VectorStore:
+    """Build the backend selected by VECTOR_STORE_BACKEND"""
+    if settings.VECTOR_STORE_BACKEND == "local":
+        from app.core.local_vector_store import LocalVectorStore
+        return LocalVectorStore(settings.LOCAL_VECTOR_STORE_PATH)
+
+    from app.core.pinecone_client import PineconeClient
+    return PineconeClient()
+
+
+# Global instance
+vector_store = get_vector_store()
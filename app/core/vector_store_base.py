@@ -0,0 +1,74 @@
+from abc import ABC, abstractmethod
+from dataclasses import dataclass, field
+from typing import Any
+
+
+@dataclass
+class QueryMatch:
+    id: str
+    score: float
+    metadata: dict = field(default_factory=dict)
+
+
+@dataclass
+class QueryResult:
+    matches: list[QueryMatch] = field(default_factory=list)
+    namespace: str = "default"
+
+
+class VectorStore(ABC):
+    """Common surface of the vector backends.
+
+    ``vectors`` are dicts with ``id``, ``values`` and ``metadata`` keys and
+    ``filter_dict`` follows Pinecone's metadata filter syntax. Query results
+    expose ``.matches`` with ``.id``, ``.score`` and ``.metadata``.
+    """
+
+    @abstractmethod
+    def upsert_vectors(self, vectors: list[dict], namespace: str = "default") -> Any:
+        """Insert or update vectors in the index"""
+
+    @abstractmethod
+    def query_vectors(self, query_vector: list[float], top_k: int = 5, filter_dict: dict | None = None, namespace: str = "default") -> Any:
+        """Query for similar vectors"""
+
+    @abstractmethod
+    def delete_vectors(self, namespace: str, filter_dict: dict | None = None, ids: list[str] | None = None) -> Any:
+        """Delete vectors by id or matching the metadata filter"""
+
+    @abstractmethod
+    def update_metadata(self, namespace: str, updates: dict[str, dict]) -> Any:
+        """Merge new metadata fields (id -> fields) into existing vectors, values stay as they are"""
+
+    def get_timings(self) -> dict:
+        """Per-operation latency counters, empty for backends that don't track them"""
+        return {}
+
+
+def matches_filter(metadata: dict, filter_dict: dict | None) -> bool:
+    """Evaluate the subset of Pinecone's filter syntax used by the app ($eq, $ne, $in, $nin, $and, $or)"""
+    if not filter_dict:
+        return True
+    for key, condition in filter_dict.items():
+        if key == "$and":
+            if not all(matches_filter(metadata, sub) for sub in condition):
+                return False
+            continue
+        if key == "$or":
+            if not any(matches_filter(metadata, sub) for sub in condition):
+                return False
+            continue
+
+        value = metadata.get(key)
+        if not isinstance(condition, dict):
+            condition = {"$eq": condition}
+        for op, expected in condition.items():
+            if op == "$eq" and value != expected:
+                return False
+            if op == "$ne" and value == expected:
+                return False
+            if op == "$in" and value not in expected:
+                return False
+            if op == "$nin" and value in expected:
+                return False
+    return True
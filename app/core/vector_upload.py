@@ -0,0 +1,83 @@
+import asyncio
+import json
+
+from app.core.config import settings
+from app.core.vector_store import vector_store
+
+
+def vector_payload_size(vector: dict) -> int:
+    """Approximate serialized size of one vector in an upsert request"""
+    return len(json.dumps(vector, separators=(",", ":")).encode("utf-8")) + 1
+
+
+def pack_vector_batches(vectors: list[dict], max_bytes: int = None, max_count: int = None) -> list[list[dict]]:
+    """Greedily pack vectors into batches that stay under the request size limit"""
+    max_bytes = max_bytes or settings.VECTOR_UPSERT_MAX_BYTES
+    max_count = max_count or settings.VECTOR_UPSERT_MAX_COUNT
+    # Room for the request envelope ({"vectors": [...], "namespace": ...})
+    envelope = 256
+
+    batches = []
+    batch, batch_bytes = [], envelope
+    for vector in vectors:
+        size = vector_payload_size(vector)
+        if batch and (batch_bytes + size > max_bytes or len(batch) >= max_count):
+            batches.append(batch)
+            batch, batch_bytes = [], envelope
+        batch.append(vector)
+        batch_bytes += size
+    if batch:
+        batches.append(batch)
+    return batches
+
+
+def _is_payload_too_large(error: Exception) -> bool:
+    status = getattr(error, "status", None) or getattr(error, "code", None)
+    return status == 413 or "too large" in str(error).lower() or "exceeds" in str(error).lower()
+
+
+async def upsert_vectors_pipelined(vectors: list[dict], namespace: str, max_in_flight: int = None, max_retries: int = None) -> int:
+    """Upsert vectors with several requests in flight, retrying only the batches that fail.
+
+    Batches rejected as too large are split in half before retrying. Raises
+    once a batch has exhausted its retries, after the other batches finished.
+    """
+    max_in_flight = max_in_flight or settings.VECTOR_UPSERT_MAX_IN_FLIGHT
+    max_retries = max_retries if max_retries is not None else settings.VECTOR_UPSERT_MAX_RETRIES
+    semaphore = asyncio.Semaphore(max_in_flight)
+    batches = pack_vector_batches(vectors)
+    total_batches = len(batches)
+    failures = []
+
+    print(f"DEBUG: Uploading {len(vectors)} vectors in {total_batches} batches, {max_in_flight} in flight")
+
+    async def upload(batch: list[dict], label: str, attempt: int = 0) -> int:
+        try:
+            async with semaphore:
+                await asyncio.to_thread(vector_store.upsert_vectors, batch, namespace=namespace)
+            print(f"DEBUG: Batch {label} upserted {len(batch)} vectors")
+            return len(batch)
+        except Exception as e:
+            if _is_payload_too_large(e) and len(batch) > 1:
+                print(f"WARNING: Batch {label} too large, splitting {len(batch)} vectors")
+                middle = len(batch) // 2
+                counts = await asyncio.gather(
+                    upload(batch[:middle], f"{label}a", attempt),
+                    upload(batch[middle:], f"{label}b", attempt),
+                )
+                return sum(counts)
+            if attempt < max_retries:
+                print(f"WARNING: Batch {label} failed (attempt {attempt + 1}), retrying: {e}")
+                await asyncio.sleep(2 ** attempt)  # Exponential backoff: 1s, 2s, 4s
+                return await upload(batch, label, attempt + 1)
+            print(f"ERROR: Batch {label} failed after {attempt + 1} attempts: {e}")
+            failures.append((label, e))
+            return 0
+
+    counts = await asyncio.gather(*(
+        upload(batch, f"{batch_num}/{total_batches}") for batch_num, batch in enumerate(batches, start=1)
+    ))
+    if failures:
+        labels = ", ".join(label for label, _ in failures)
+        raise Exception(f"Failed to upload batches {labels}: {failures[0][1]}")
+    return sum(counts)
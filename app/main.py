@@ -1,6 +1,10 @@
 from fastapi import FastAPI
 from app.api.main import api_router
 from app.core.config import settings
+from app.core.vector_store import vector_store
+from app.core.embedding_cache import query_embedding_cache
+from app.api.guards import user_cache
+from app.core.answer_cache import answer_cache
 from fastapi.middleware.cors import CORSMiddleware
 
 app = FastAPI(title= settings.PROJECT_NAME, description= settings.PROJECT_DESCRIPTION, version= settings.PROJECT_VERSION)
@@ -16,4 +20,20 @@ app.include_router(api_router)
 
 @app.get("/", tags=["root"])
 def read_root():
-    return {"message": f"Welcome to {settings.PROJECT_NAME}"}
\ No newline at end of file
+    return {"message": f"Welcome to {settings.PROJECT_NAME}"}
+
+@app.get("/metrics/vector-store", tags=["root"])
+def vector_store_metrics():
+    return vector_store.get_timings()
+
+@app.get("/metrics/embedding-cache", tags=["root"])
+def embedding_cache_metrics():
+    return query_embedding_cache.stats()
+
+@app.get("/metrics/auth-cache", tags=["root"])
+def auth_cache_metrics():
+    return user_cache.stats()
+
+@app.get("/metrics/answer-cache", tags=["root"])
+def answer_cache_metrics():
+    return answer_cache.stats()
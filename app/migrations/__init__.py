@@ -2,4 +2,6 @@ from .base import Base
 from .users import User
 from .documents import Document
 from .document_type import DocumentType
-from .chat import ChatSession, ChatMessage
\ No newline at end of file
+from .chat import ChatSession, ChatMessage
+from .jobs import DocumentJob
+from .document_chunks import DocumentChunk
@@ -1,17 +1,29 @@
 import datetime
-from sqlalchemy import JSON, Column, ForeignKey, Integer, String, DateTime, Text
+from sqlalchemy import JSON, Column, ForeignKey, Index, Integer, String, DateTime, Text
 from sqlalchemy.sql import func
 from .base import Base
 
 
+def utcnow():
+    return datetime.datetime.now(datetime.timezone.utc)
+
+
 class ChatSession(Base):
     __tablename__ = "chat_sessions"
     
     id = Column(String, primary_key=True, index=True)
     user_id = Column(Integer, nullable=False)
+    document_id = Column(Integer, ForeignKey("documents.id", ondelete="CASCADE"), nullable=True)
     title = Column(String, nullable=False)
-    created_at = Column(DateTime, default=datetime.datetime.now(datetime.timezone.utc))
-    updated_at = Column(DateTime, default=datetime.datetime.now(datetime.timezone.utc), onupdate=datetime.datetime.now(datetime.timezone.utc))
+    # Running summary of the messages up to and including summary_until
+    summary = Column(Text, nullable=True)
+    summary_until = Column(DateTime(timezone=True), nullable=True)
+    created_at = Column(DateTime(timezone=True), default=utcnow)
+    updated_at = Column(DateTime(timezone=True), default=utcnow, onupdate=utcnow)
+
+    __table_args__ = (
+        Index("ix_chat_sessions_user_updated", "user_id", "updated_at"),
+    )
 
 class ChatMessage(Base):
     __tablename__ = "chat_messages"
@@ -21,7 +33,9 @@ class ChatMessage(Base):
     role = Column(String, nullable=False)
     message = Column(Text, nullable=False)
     source_citation = Column(JSON, nullable=True)
-    created_at = Column(DateTime, default=datetime.datetime.now(datetime.timezone.utc))
-    updated_at = Column(DateTime, default=datetime.datetime.now(datetime.timezone.utc), onupdate=datetime.datetime.now(datetime.timezone.utc))
-
+    created_at = Column(DateTime(timezone=True), default=utcnow)
+    updated_at = Column(DateTime(timezone=True), default=utcnow, onupdate=utcnow)
 
+    __table_args__ = (
+        Index("ix_chat_messages_session_created", "session_id", "created_at"),
+    )
@@ -0,0 +1,20 @@
+from sqlalchemy import String, Integer, ForeignKey, Index, UniqueConstraint
+from sqlalchemy.orm import Mapped, mapped_column
+from .base import Base
+
+class DocumentChunk(Base):
+    """Ingest manifest: one row per vector currently stored for a document"""
+    __tablename__ = "document_chunks"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    document_id: Mapped[int] = mapped_column(Integer, ForeignKey("documents.id", ondelete="CASCADE"), nullable=False)
+    vector_id: Mapped[str] = mapped_column(String, nullable=False)
+    # sha256 of page number and chunk text
+    content_hash: Mapped[str] = mapped_column(String, nullable=False)
+    page: Mapped[int] = mapped_column(Integer, nullable=False)
+    chunk_index: Mapped[int] = mapped_column(Integer, nullable=False)
+
+    __table_args__ = (
+        UniqueConstraint("document_id", "vector_id", name="uq_document_chunks_document_vector"),
+        Index("ix_document_chunks_document_id", "document_id"),
+    )
@@ -1,4 +1,5 @@
-from sqlalchemy import String, Integer, ForeignKey
+from sqlalchemy import String, Integer, ForeignKey, Index
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from .base import Base
 
@@ -9,6 +10,12 @@ class DocumentType(Base):
     user_id: Mapped[int] = mapped_column(Integer, ForeignKey("users.id"), nullable=True)
     name: Mapped[str] = mapped_column(String, nullable=False)
     description: Mapped[str] = mapped_column(String, nullable=True)
-    risk_rules: Mapped[str] = mapped_column(String, nullable=True)
+    # List of {clause, severity, criteria}
+    risk_rules: Mapped[list[dict]] = mapped_column(JSONB, nullable=True)
     
-    documents = relationship("Document", back_populates="document_type")
\ No newline at end of file
+    documents = relationship("Document", back_populates="document_type")
+
+    # jsonb_path_ops serves containment lookups like risk_rules @> '[{"clause": "..."}]'
+    __table_args__ = (
+        Index("ix_document_types_risk_rules", "risk_rules", postgresql_using="gin", postgresql_ops={"risk_rules": "jsonb_path_ops"}),
+    )
@@ -1,5 +1,5 @@
 from datetime import timezone, datetime
-from sqlalchemy import String, Integer, ForeignKey, DateTime
+from sqlalchemy import String, Integer, ForeignKey, DateTime, Index
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from .base import Base
 
@@ -11,12 +11,23 @@ class Document(Base):
     document_type_id: Mapped[int] = mapped_column(Integer, ForeignKey("document_types.id", ondelete="SET NULL"), nullable=True)
     filename: Mapped[str] = mapped_column(String, nullable=False)
     file_path: Mapped[str] = mapped_column(String, nullable=False)
+    # sha256 of the file, documents with the same content share one stored blob
+    content_hash: Mapped[str] = mapped_column(String(64), nullable=True)
     # Progress: extracting => analyzing => completed
     ai_progress: Mapped[str] = mapped_column(String, nullable=False, default="pending")
     summary: Mapped[str] = mapped_column(String, nullable=True)
     risk_level: Mapped[str] = mapped_column(String, nullable=True)
     risk_reasoning: Mapped[str] = mapped_column(String, nullable=True)
-    created_at: Mapped[datetime] = mapped_column(default=datetime.now(timezone.utc))
-    updated_at: Mapped[datetime] = mapped_column(default=datetime.now(timezone.utc), onupdate=datetime.now(timezone.utc))
+    created_at: Mapped[datetime] = mapped_column(default=lambda: datetime.now(timezone.utc))
+    updated_at: Mapped[datetime] = mapped_column(default=lambda: datetime.now(timezone.utc), onupdate=lambda: datetime.now(timezone.utc))
 
-    document_type = relationship("DocumentType", back_populates="documents")
\ No newline at end of file
+    document_type = relationship("DocumentType", back_populates="documents")
+
+    # Keyset pagination walks (user_id, [filter], created_at, id) backwards
+    __table_args__ = (
+        Index("ix_documents_user_created_id", "user_id", "created_at", "id"),
+        Index("ix_documents_user_progress_created_id", "user_id", "ai_progress", "created_at", "id"),
+        Index("ix_documents_user_risk_created_id", "user_id", "risk_level", "created_at", "id"),
+        Index("ix_documents_user_type_created_id", "user_id", "document_type_id", "created_at", "id"),
+        Index("ix_documents_content_hash", "content_hash"),
+    )
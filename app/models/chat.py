@@ -1,8 +1,36 @@
+from datetime import datetime
 from typing import Optional
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
 
 class ChatRequest(BaseModel):
     query: str  
+    # Without document_id the question goes across document_ids, or the whole library when that is empty too
     document_id: int | None = None
-    role: Optional[str] = 'user'
\ No newline at end of file
+    document_ids: Optional[list[int]] = None
+    # Chunks each document may contribute in multi-document mode, defaults to MULTI_DOC_PER_DOCUMENT_K
+    per_document_k: Optional[int] = Field(None, ge=1, le=10)
+    role: Optional[str] = 'user'
+    # Continue an existing session, a new one is started when omitted
+    session_id: Optional[str] = None
+
+class ChatSessionResponse(BaseModel):
+    id: str
+    title: str
+    document_id: Optional[int] = None
+    summary: Optional[str] = None
+    created_at: datetime
+    updated_at: datetime
+
+    class Config:
+        from_attributes = True
+
+class ChatMessageResponse(BaseModel):
+    id: str
+    role: str
+    message: str
+    source_citation: Optional[list[dict]] = None
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
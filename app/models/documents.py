@@ -2,7 +2,7 @@ from fastapi import UploadFile
 from pydantic import BaseModel, Field
 from datetime import datetime
 from typing import Optional
-from .document_types import DocumentTypeResponse
+from .document_types import DocumentTypeResponse, DocumentTypeRelationResponse
 
 class DocumentUpload(BaseModel):
     filename: str
@@ -12,13 +12,18 @@ class DocumentResponse(BaseModel):
     id: int
     filename: str
     created_at: datetime
-    document_type: Optional['DocumentTypeResponse'] = None
+    document_type: Optional['DocumentTypeRelationResponse'] = None
     ai_progress: Optional[str] = "Pending"
     summary: Optional[str]= None
     
     class Config:
         from_attributes = True
 
+class DocumentPageResponse(BaseModel):
+    items: list[DocumentResponse]
+    # Pass back as ``cursor`` to fetch the next page, None on the last page
+    next_cursor: Optional[str] = None
+
 class DocumentDetailResponse(BaseModel):
     id: int
     filename: str
@@ -11,6 +11,11 @@ class User(BaseModel):
     class Config:
         from_attributes = True
 
+class AuthUser(BaseModel):
+    """The authenticated principal, small enough to cache or rebuild from token claims"""
+    id: int
+    email: str
+
 class UserEmailResponse(BaseModel):
     email: EmailStr
 
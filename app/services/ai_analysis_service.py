@@ -1,15 +1,17 @@
+import asyncio
 from typing import List
 from fastapi import HTTPException
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.models.ai_analysis import AIAnalysisDTO, AIListRules, AIAnalysisResult
-from app.core.gemini_client import gemAI
+from app.core.gemini_client import asyncGemAI
+from app.core.storage import storage
 from app.services.documents_service import DocumentService
 from app.utils.prompt import get_analysis_prompt
 from app.migrations.documents import Document as DocumentDataModel
 import json
 
 class AIAnalysisService:
-    def __init__(self, db: Session):
+    def __init__(self, db: AsyncSession):
         self.db = db
         self.documents_service = DocumentService(db)
 
@@ -21,7 +23,8 @@ class AIAnalysisService:
             if not document:
                 raise ValueError(f"Document with ID {document_id} not found")
             prompt = get_analysis_prompt(analysis_dto)
-            response = await gemAI.generate_context_with_file(document.file_path, prompt, AIAnalysisResult)
+            file_path = await asyncio.to_thread(storage.local_path, document.file_path)
+            response = await asyncGemAI.generate_context_with_file(file_path, prompt, AIAnalysisResult)
             return json.loads(response)
             
         except Exception as e:
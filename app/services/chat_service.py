@@ -1,162 +1,440 @@
+import asyncio
 import json
-from app.core.gemini_client import gemAI
-from app.core.pinecone_client import pinecone_client
+import re
+from datetime import datetime, timezone
+from app.core.config import settings
+from app.core.answer_cache import answer_cache
+from app.core.gemini_client import asyncGemAI
+from app.core.lexical_index import lexical_index, exact_terms
+from app.core.vector_store import vector_store
+from app.core.vector_store_base import QueryMatch
+from app.utils.retrieval import reciprocal_rank_fusion, select_context, select_multi_document_context
+from app.core.db import AsyncSessionLocal
 from app.services.documents_service import DocumentService
+from app.services.chat_session_service import ChatSessionService
+from app.migrations.chat import ChatSession as ChatSessionModel
 from app.models.chat import ChatRequest
-from app.utils.prompt import get_document_prompt
+from app.utils.prompt import get_document_prompt, get_multi_document_prompt
+
+SSE_HEARTBEAT = ": heartbeat\n\n"
+
+# Marks the end of the producer's events on the stream queue
+_DONE = object()
+
+
+def sse_event(data: dict) -> str:
+    return f"data: {json.dumps(data)}\n\n"
+
+
+def parse_citation_line(line: str) -> dict | None:
+    """Parse one '- Page N: "quote"' or '- Document D, Page N: "quote"' evidence line"""
+    document_match = re.match(r'- Document (\d+),\s*(?=Page)', line)
+    if document_match:
+        line = "- " + line[document_match.end():]
+    if not line.startswith('- Page'):
+        return None
+    # Extract page number and quote
+    page_match = line.split('Page')[1].split(':')[0].strip()
+    quote_start = line.find('"') + 1
+    quote_end = line.rfind('"')
+    quote = line[quote_start:quote_end] if quote_start > 0 and quote_end > quote_start else ""
+    citation = {
+        "page": page_match,
+        "text": quote
+    }
+    if document_match:
+        citation["document_id"] = int(document_match.group(1))
+    return citation
+
+
+class EvidenceParser:
+    """Incrementally parses the ANSWER / --- / EVIDENCE response format.
+
+    ``feed`` returns citations as soon as their evidence line is complete, so
+    a stream can forward them without re-parsing the full response at the end.
+    With ``documents`` (id -> filename) citations naming a document get its filename.
+    """
+
+    def __init__(self, documents: dict[int, str] | None = None):
+        self.text = ""
+        self.citations = []
+        self.documents = documents
+        # Where to look for the first separator, then the start of the first unparsed evidence line
+        self._searched = 0
+        self._pos = None
+        self._ended = False
+
+    def feed(self, chunk: str) -> list[dict]:
+        self.text += chunk
+        return self._scan(final=False)
+
+    def close(self) -> list[dict]:
+        return self._scan(final=True)
+
+    def _scan(self, final: bool) -> list[dict]:
+        """Parse the evidence lines completed since the last call, only the new tail is scanned"""
+        if self._pos is None:
+            start = self.text.find("---", self._searched)
+            if start == -1:
+                # The separator may be split across chunks
+                self._searched = max(0, len(self.text) - 2)
+                return []
+            self._pos = start + 3
+        if self._ended:
+            return []
+        # Evidence runs until a second separator, if the model writes one. Everything
+        # before _pos ends in a newline, so a separator can't straddle it
+        end = self.text.find("---", self._pos)
+        if end != -1:
+            stop = next_pos = end
+            self._ended = True
+        elif final:
+            stop = next_pos = len(self.text)
+        else:
+            # The last line may still be arriving
+            stop = self.text.rfind("\n", self._pos)
+            if stop == -1:
+                return []
+            next_pos = stop + 1
+        new_citations = []
+        for line in self.text[self._pos:stop].split("\n"):
+            citation = parse_citation_line(line.strip().replace("EVIDENCE:", "").strip())
+            if citation:
+                if self.documents is not None and "document_id" in citation:
+                    citation["filename"] = self.documents.get(citation["document_id"])
+                new_citations.append(citation)
+        self._pos = next_pos
+        self.citations.extend(new_citations)
+        return new_citations
+
+    def result(self) -> dict:
+        return {
+            "answer": self.text.split("---")[0].replace("ANSWER:", "").strip(),
+            "citations": self.citations
+        }
+
 
 class ChatService():
     def __init__(self, db):
         self.db = db
-        self.gemAI = gemAI
-        self.pinecone_client = pinecone_client
+        self.asyncGemAI = asyncGemAI
+        self.vector_store = vector_store
         pass
 
-    def generate_response_for_single_doc(self, user_id: int, request: ChatRequest):
+    async def verify_document(self, user_id: int, document_id: int) -> datetime:
+        """Raise 404 unless the document exists and belongs to the user, returns the document version"""
         document_service = DocumentService(self.db)
-        document_service.get_document_detail(user_id, request.document_id)
-        
-        query_vector = self.gemAI.create_embedding(request.query)
-        
-        metadata_filter = {
-            "document_id": request.document_id,
-        }
-        namespace_pin = f"user_{user_id}"
+        return await document_service.get_document_version(user_id, document_id)
+
+    async def get_cached_answer(self, user_id: int, document_id: int, version: datetime, query: str) -> tuple[dict | None, list[float] | None, list[QueryMatch] | None]:
+        """Look up a cached answer, returns (answer, query vector, shortcut candidates) for retrieval to reuse.
+
+        The same question is matched without embedding. Otherwise the query is
+        only embedded when retrieval needs the vector anyway, i.e. when the
+        lexical shortcut doesn't apply; shortcut queries skip the similarity
+        lookup and are answered from their keyword hits.
+        """
+        if not settings.ANSWER_CACHE_ENABLED:
+            return None, None, None
+        cached = answer_cache.get_exact(document_id, version, query)
+        if cached is not None:
+            return cached, None, None
+        shortcut = await self._lexical_shortcut(user_id, document_id, query, settings.RETRIEVAL_CANDIDATE_POOL)
+        if shortcut is not None:
+            # Records the miss
+            answer_cache.get(document_id, version, query)
+            return None, None, shortcut
+        query_vector = await self.asyncGemAI.create_query_embedding(query)
+        return answer_cache.get(document_id, version, query, query_vector), query_vector, None
+
+    def cache_answer(self, document_id: int, version: datetime, query: str, query_vector: list[float] | None, result: dict):
+        if settings.ANSWER_CACHE_ENABLED:
+            answer_cache.set(document_id, version, query, query_vector, result)
+
+    async def retrieve(self, user_id: int, document_id: int, query: str, query_vector: list[float] | None = None, candidates: list[QueryMatch] | None = None) -> list[QueryMatch]:
+        """Fetch a candidate pool (unless ``candidates`` are given), then dedupe, rerank and pack it into the prompt budget"""
+        if candidates is None:
+            candidates = await self._retrieve_candidates(user_id, document_id, query, settings.RETRIEVAL_CANDIDATE_POOL, query_vector)
+        # Cross-encoder scoring is CPU bound
+        return await asyncio.to_thread(select_context, query, candidates)
+
+    async def _retrieve_candidates(self, user_id: int, document_id: int, query: str, top_k: int, query_vector: list[float] | None = None) -> list[QueryMatch]:
+        """Hybrid retrieval: BM25 keyword hits fused with vector hits by reciprocal rank.
+
+        When the lexical shortcut applies the vector index isn't queried, nor
+        embedded for.
+        """
+        if lexical_index is None:
+            return await self._dense_search(user_id, document_id, query, top_k, query_vector)
+
+        shortcut = await self._lexical_shortcut(user_id, document_id, query, top_k)
+        if shortcut is not None:
+            return shortcut
+
+        dense, keyword = await asyncio.gather(
+            self._dense_search(user_id, document_id, query, top_k, query_vector),
+            asyncio.to_thread(lexical_index.search, user_id, document_id, query, top_k)
+        )
+        return reciprocal_rank_fusion([dense, keyword], k=settings.RRF_K, top_k=top_k)
+
+    async def _lexical_shortcut(self, user_id: int, document_id: int, query: str, top_k: int) -> list[QueryMatch] | None:
+        """Keyword hits when the query pins exact terms (quoted phrases, clause numbers) that a chunk contains all of, else None"""
+        if lexical_index is None or not settings.LEXICAL_SHORTCUT_ENABLED:
+            return None
+        terms = exact_terms(query)
+        if not terms:
+            return None
+        exact = await asyncio.to_thread(lexical_index.search_exact, user_id, document_id, terms, top_k)
+        if not exact:
+            return None
+        print(f"DEBUG: Lexical shortcut for {terms}, {len(exact)} exact hits")
+        if len(exact) < top_k:
+            keyword = await asyncio.to_thread(lexical_index.search, user_id, document_id, query, top_k)
+            exact_ids = {hit.id for hit in exact}
+            exact += [match for match in keyword if match.id not in exact_ids]
+        return exact[:top_k]
+
+    async def resolve_documents(self, user_id: int, request: ChatRequest) -> tuple[dict[int, str], int]:
+        """Documents a multi-document request covers (id -> filename) and how many matched.
+
+        A library query only covers the MULTI_DOC_MAX_DOCUMENTS most recently
+        updated documents, the total tells the client when others were left out.
+        """
+        document_service = DocumentService(self.db)
+        return await document_service.get_chat_documents(user_id, request.document_ids, settings.MULTI_DOC_MAX_DOCUMENTS)
 
-        search_results = self.pinecone_client.query_vectors(
+    @staticmethod
+    def document_coverage(documents: dict[int, str], total: int) -> dict:
+        """Which documents a multi-document answer searched, for the response and the stream's start event"""
+        if total > len(documents):
+            print(f"WARNING: Library query limited to {len(documents)} of {total} documents")
+        return {"document_ids": list(documents), "total_documents": total, "truncated": total > len(documents)}
+
+    async def retrieve_documents(self, user_id: int, documents: dict[int, str], query: str, per_document_k: int | None = None) -> list[QueryMatch]:
+        """Candidates from every document looked up concurrently, merged under per-document quotas.
+
+        The query is embedded once and shared by all lookups, so a library
+        question costs one embedding plus one fan-out of index queries.
+        """
+        query_vector = await self.asyncGemAI.create_query_embedding(query)
+        semaphore = asyncio.Semaphore(settings.MULTI_DOC_CONCURRENCY)
+
+        async def lookup(document_id: int) -> list[QueryMatch]:
+            async with semaphore:
+                return await self._retrieve_candidates(user_id, document_id, query, settings.MULTI_DOC_CANDIDATE_POOL, query_vector)
+
+        results = await asyncio.gather(*(lookup(document_id) for document_id in documents))
+        candidates_by_document = dict(zip(documents, results))
+        print(f"DEBUG: Multi-document retrieval over {len(documents)} documents, {sum(map(len, results))} candidates")
+        return await asyncio.to_thread(
+            select_multi_document_context,
+            query,
+            candidates_by_document,
+            per_document_k or settings.MULTI_DOC_PER_DOCUMENT_K,
+            settings.MULTI_DOC_TOKEN_BUDGET,
+            settings.MULTI_DOC_MAX_CHUNKS
+        )
+
+    async def _dense_search(self, user_id: int, document_id: int, query: str, top_k: int, query_vector: list[float] | None = None) -> list[QueryMatch]:
+        if query_vector is None:
+            query_vector = await self.asyncGemAI.create_query_embedding(query)
+        search_results = await asyncio.to_thread(
+            self.vector_store.query_vectors,
             query_vector=query_vector,
-            filter_dict=metadata_filter,
-            namespace=namespace_pin
+            top_k=top_k,
+            filter_dict={"document_id": document_id},
+            namespace=f"user_{user_id}"
         )
-        
+        return search_results.matches
+
+    @staticmethod
+    def _build_context(matches: list[QueryMatch], documents: dict[int, str] | None = None) -> str:
         context_parts = []
-        # citations = []
-        
-        for res in search_results.matches:
+        for res in matches:
             content = res.metadata.get("text", "")
             page = res.metadata.get("page", "?")
-            context_parts.append(f"[Source: Page {page}]\n{content}")
-            # citations.append({
-            #     "page": page,
-            #     "text": content,
-            #     "relevance_score": res.score
-            # })
+            if documents is not None:
+                document_id = res.metadata.get("document_id")
+                context_parts.append(f"[Source: Document {document_id} \"{documents.get(document_id, '')}\", Page {page}]\n{content}")
+            else:
+                context_parts.append(f"[Source: Page {page}]\n{content}")
+        return "\n\n".join(context_parts)
+
+    @staticmethod
+    def _parse_response(full_response: str, documents: dict[int, str] | None = None) -> dict:
+        """Split the ANSWER / --- / EVIDENCE format into the answer and its citations"""
+        parser = EvidenceParser(documents)
+        parser.feed(full_response)
+        parser.close()
+        return parser.result()
+
+    async def open_session(self, user_id: int, request: ChatRequest):
+        """Start or continue the request's chat session, returns (session, conversation so far)"""
+        return await ChatSessionService(self.db).open_session(user_id, request.session_id, request.document_id, request.query)
+
+    @staticmethod
+    def _new_session(request: ChatRequest, session: ChatSessionModel) -> ChatSessionModel | None:
+        # open_session doesn't persist a new session, it's written with the first turn
+        return session if request.session_id is None else None
+
+    async def generate_response_for_single_doc(self, user_id: int, request: ChatRequest):
+        version = await self.verify_document(user_id, request.document_id)
+        session, conversation = await self.open_session(user_id, request)
+        asked_at = datetime.now(timezone.utc)
+
+        # Answers to follow-ups depend on the conversation, only first questions are cached
+        cached, query_vector, candidates = await self.get_cached_answer(user_id, request.document_id, version, request.query) if not conversation else (None, None, None)
+        if cached is not None:
+            print(f"DEBUG: Answer cache hit for document {request.document_id}")
+            result = cached
+        else:
+            matches = await self.retrieve(user_id, request.document_id, request.query, query_vector, candidates)
+            context_text = self._build_context(matches)
+
+            # Build the Prompt for Gemini
+            prompt = get_document_prompt(context_text, request.query, conversation)
+
+            # Generate content using Gemini
+            try:
+                response = await self.asyncGemAI.generate_content(prompt)
+            except Exception as e:
+                raise Exception(f"Failed to generate AI response: {str(e)}")
+
+            result = self._parse_response(response)
+            if not conversation:
+                self.cache_answer(request.document_id, version, request.query, query_vector, result)
 
-        context_text = "\n\n".join(context_parts)
+        await ChatSessionService.record_turn(self.db, session.id, request.query, asked_at, result, self._new_session(request, session))
+        return {**result, "session_id": session.id}
 
-        # 5. Build the Prompt for Gemini
-        prompt = get_document_prompt(context_text, request.query)
+    async def generate_response_for_documents(self, user_id: int, request: ChatRequest):
+        """Answer across several documents (``document_ids``) or the whole library"""
+        documents, total = await self.resolve_documents(user_id, request)
+        session, conversation = await self.open_session(user_id, request)
+        asked_at = datetime.now(timezone.utc)
 
-        # 6. Generate content using Gemini
+        matches = await self.retrieve_documents(user_id, documents, request.query, request.per_document_k)
+        prompt = get_multi_document_prompt(self._build_context(matches, documents), request.query, conversation)
         try:
-            response = self.gemAI.generate_content(prompt)
-            
-            # Parse the response to extract answer and evidence
-            parts = response.split("---")
-            answer_text = parts[0].replace("ANSWER:", "").strip()
-            evidence_text = parts[1].replace("EVIDENCE:", "").strip()
-            
-            # Parse evidence into individual citations
-            citation_array = []
-            if evidence_text.strip():
-                # Split by lines and parse each citation
-                evidence_lines = [line.strip() for line in evidence_text.split('\n') if line.strip()]
-                for line in evidence_lines:
-                    if line.startswith('- Page'):
-                        # Extract page number and quote
-                        page_match = line.split('Page')[1].split(':')[0].strip()
-                        quote_start = line.find('"') + 1
-                        quote_end = line.rfind('"')
-                        quote = line[quote_start:quote_end] if quote_start > 0 and quote_end > quote_start else ""
-                        
-                        citation_array.append({
-                            "page": page_match,
-                            "text": quote
-                        })
-
-            return {
-                "answer": answer_text,
-                "citations": citation_array
-            }
+            response = await self.asyncGemAI.generate_content(prompt)
         except Exception as e:
             raise Exception(f"Failed to generate AI response: {str(e)}")
-    
-    def generate_response_for_single_doc_stream(self, user_id: int, request: ChatRequest):
-        """Generate streaming response for single document query"""
-        document_service = DocumentService(self.db)
-        document_service.get_document_detail(user_id, request.document_id)
-        
-        query_vector = self.gemAI.create_embedding(request.query)
-        
-        metadata_filter = {
-            "document_id": request.document_id,
-        }
-        namespace_pin = f"user_{user_id}"
 
-        search_results = self.pinecone_client.query_vectors(
-            query_vector=query_vector,
-            filter_dict=metadata_filter,
-            namespace=namespace_pin
-        )
-        
-        context_parts = []
-        
-        for res in search_results.matches:
-            content = res.metadata.get("text", "")
-            page = res.metadata.get("page", "?")
-            context_parts.append(f"[Source: Page {page}]\n{content}")
+        result = self._parse_response(response, documents)
+        await ChatSessionService.record_turn(self.db, session.id, request.query, asked_at, result, self._new_session(request, session))
+        return {**result, "session_id": session.id, **self.document_coverage(documents, total)}
+
+    async def stream_response(
+        self,
+        user_id: int,
+        request: ChatRequest,
+        session_id: str,
+        conversation: str = "",
+        version: datetime | None = None,
+        documents: dict[int, str] | None = None,
+        is_disconnected=None,
+        total_documents: int | None = None,
+        new_session: ChatSessionModel | None = None
+    ):
+        """SSE events for a single document or a multi-document query.
 
-        context_text = "\n\n".join(context_parts)
+        ``start`` is sent before retrieval begins. The work runs in a producer
+        task so heartbeat comments keep flowing while retrieval or Gemini is
+        slow; when the client goes away the task, and with it the upstream
+        Gemini stream, is cancelled. The caller checks ownership and passes
+        either the document ``version`` from verify_document or the
+        ``documents`` and ``total_documents`` from resolve_documents, and the
+        session from open_session (as ``new_session`` too when it was just started).
+        """
+        start = {'type': 'start', 'message': 'Starting response generation', 'session_id': session_id}
+        if documents is not None:
+            start.update(self.document_coverage(documents, total_documents if total_documents is not None else len(documents)))
+        yield sse_event(start)
 
-        prompt = get_document_prompt(context_text, request.query)
-        print(prompt)
+        queue = asyncio.Queue()
+        producer = asyncio.create_task(self._produce_events(user_id, request, version, documents, session_id, conversation, queue, new_session))
         try:
-            # Send initial event to indicate streaming started
-            yield f"data: {json.dumps({'type': 'start', 'message': 'Starting response generation'})}\n\n"
-            
-            full_response = ""
-            
-            # Stream the content generation
-            for chunk in self.gemAI.generate_content_stream(prompt):
-                if chunk:
-                    full_response += chunk
-                    # Send each chunk as SSE
-                    yield f"data: {json.dumps({'type': 'chunk', 'content': chunk})}\n\n"
-            
-            # Parse the complete response to extract answer and evidence
-            parts = full_response.split("---")
-            answer_text = parts[0].replace("ANSWER:", "").strip()
-            
-            # Parse evidence if available
-            citation_array = []
-            if len(parts) > 1:
-                evidence_text = parts[1].replace("EVIDENCE:", "").strip()
-                if evidence_text.strip():
-                    evidence_lines = [line.strip() for line in evidence_text.split('\n') if line.strip()]
-                    for line in evidence_lines:
-                        if line.startswith('- Page'):
-                            page_match = line.split('Page')[1].split(':')[0].strip()
-                            quote_start = line.find('"') + 1
-                            quote_end = line.rfind('"')
-                            quote = line[quote_start:quote_end] if quote_start > 0 and quote_end > quote_start else ""
-                            
-                            citation_array.append({
-                                "page": page_match,
-                                "text": quote
-                            })
-            
-            # Send final event with complete structured response
-            final_data = {
-                'type': 'complete',
-                'answer': answer_text,
-                'citations': citation_array
-            }
-            yield f"data: {json.dumps(final_data)}\n\n"
-            
+            while True:
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=settings.SSE_HEARTBEAT_INTERVAL)
+                except asyncio.TimeoutError:
+                    if is_disconnected is not None and await is_disconnected():
+                        print("DEBUG: Client disconnected, cancelling chat stream")
+                        break
+                    yield SSE_HEARTBEAT
+                    continue
+                if event is _DONE:
+                    break
+                yield event
+        finally:
+            producer.cancel()
+
+    async def _produce_events(
+        self,
+        user_id: int,
+        request: ChatRequest,
+        version: datetime | None,
+        documents: dict[int, str] | None,
+        session_id: str,
+        conversation: str,
+        queue: asyncio.Queue,
+        new_session: ChatSessionModel | None = None
+    ):
+        asked_at = datetime.now(timezone.utc)
+        try:
+            if documents is None:
+                cached, query_vector, candidates = await self.get_cached_answer(user_id, request.document_id, version, request.query) if not conversation else (None, None, None)
+                if cached is not None:
+                    for event in self._replay_events(cached):
+                        await queue.put(event)
+                    await self._record_stream_turn(session_id, request.query, asked_at, cached, new_session)
+                    return
+
+                matches = await self.retrieve(user_id, request.document_id, request.query, query_vector, candidates)
+                prompt = get_document_prompt(self._build_context(matches), request.query, conversation)
+            else:
+                matches = await self.retrieve_documents(user_id, documents, request.query, request.per_document_k)
+                prompt = get_multi_document_prompt(self._build_context(matches, documents), request.query, conversation)
+
+            parser = EvidenceParser(documents)
+            async for chunk in self.asyncGemAI.generate_content_stream(prompt):
+                await queue.put(sse_event({'type': 'chunk', 'content': chunk}))
+                for citation in parser.feed(chunk):
+                    await queue.put(sse_event({'type': 'citation', **citation}))
+            for citation in parser.close():
+                await queue.put(sse_event({'type': 'citation', **citation}))
+
+            result = parser.result()
+            # Only single document answers are cached, keyed by that document's version
+            if documents is None and not conversation:
+                self.cache_answer(request.document_id, version, request.query, query_vector, result)
+            await self._record_stream_turn(session_id, request.query, asked_at, result, new_session)
+            await queue.put(sse_event({'type': 'complete', **result}))
         except Exception as e:
-            error_data = {
+            await queue.put(sse_event({
                 'type': 'error',
                 'message': f"Failed to generate AI response: {str(e)}"
-            }
-            yield f"data: {json.dumps(error_data)}\n\n"
-        
+            }))
+        finally:
+            queue.put_nowait(_DONE)
+
+    @staticmethod
+    async def _record_stream_turn(session_id: str, query: str, asked_at: datetime, result: dict, new_session: ChatSessionModel | None = None):
+        # The stream outlives the request's DB session, write with a session of its own
+        async with AsyncSessionLocal() as db:
+            await ChatSessionService.record_turn(db, session_id, query, asked_at, result, new_session)
+
+    @staticmethod
+    def _replay_events(result: dict, words_per_chunk: int = 12) -> list[str]:
+        """A cached answer as the same chunk / citation / complete events a generated one produces"""
+        events = []
+        words = result["answer"].split(" ")
+        for i in range(0, len(words), words_per_chunk):
+            chunk = " ".join(words[i:i + words_per_chunk])
+            if i + words_per_chunk < len(words):
+                chunk += " "
+            events.append(sse_event({'type': 'chunk', 'content': chunk}))
+        for citation in result["citations"]:
+            events.append(sse_event({'type': 'citation', **citation}))
+        events.append(sse_event({'type': 'complete', **result, 'cached': True}))
+        return events
@@ -0,0 +1,171 @@
+import asyncio
+import uuid
+from datetime import datetime, timezone
+
+from fastapi import Depends, HTTPException
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.db import get_async_db, AsyncSessionLocal
+from app.core.gemini_client import asyncGemAI
+from app.migrations.chat import ChatSession as ChatSessionModel, ChatMessage as ChatMessageModel
+from app.utils.prompt import get_chat_summary_prompt
+
+# Summary tasks run after the response, keep references so they aren't garbage collected
+_background_tasks = set()
+# Sessions this process is folding right now, a second turn doesn't start another fold
+_folding = set()
+
+
+def format_messages(messages: list[ChatMessageModel]) -> str:
+    limit = settings.CHAT_HISTORY_MESSAGE_CHARS
+    lines = []
+    for message in messages:
+        text = message.message if len(message.message) <= limit else message.message[:limit] + "..."
+        lines.append(f"{'User' if message.role == 'user' else 'Assistant'}: {text}")
+    return "\n".join(lines)
+
+
+def format_conversation(summary: str | None, messages: list[ChatMessageModel]) -> str:
+    """Running summary plus the recent turns, empty for a new session"""
+    parts = []
+    if summary:
+        parts.append(f"Summary of earlier messages: {summary}")
+    if messages:
+        parts.append(format_messages(messages))
+    return "\n".join(parts)
+
+
+class ChatSessionService:
+    """Chat sessions with a bounded history.
+
+    The prompt gets a running summary plus at most CHAT_HISTORY_WINDOW +
+    CHAT_SUMMARY_BATCH recent messages. Once more than that are unsummarized,
+    the oldest are folded into the summary in the background, so prompt size
+    stays flat however long the conversation runs.
+    """
+
+    def __init__(self, db: AsyncSession = Depends(get_async_db)):
+        self.db = db
+
+    async def get_owned_session(self, user_id: int, session_id: str) -> ChatSessionModel:
+        session = (await self.db.execute(
+            select(ChatSessionModel).filter(
+                ChatSessionModel.id == session_id,
+                ChatSessionModel.user_id == user_id
+            )
+        )).scalars().first()
+        if not session:
+            raise HTTPException(status_code=404, detail="Chat session not found")
+        return session
+
+    async def open_session(self, user_id: int, session_id: str | None, document_id: int | None, title: str) -> tuple[ChatSessionModel, str]:
+        """Load (or start) a session and return it with its conversation so far.
+
+        A new session is not added here, pass it to record_turn as ``new_session``
+        so it is written with its first turn and a failed answer leaves nothing behind.
+        """
+        if session_id is None:
+            return ChatSessionModel(id=uuid.uuid4().hex, user_id=user_id, document_id=document_id, title=title[:100]), ""
+
+        session = await self.get_owned_session(user_id, session_id)
+        if session.document_id is not None and document_id is not None and session.document_id != document_id:
+            raise HTTPException(status_code=400, detail="Chat session belongs to another document")
+        messages = await self._unsummarized_messages(self.db, session)
+        return session, format_conversation(session.summary, messages)
+
+    @staticmethod
+    async def _unsummarized_messages(db: AsyncSession, session: ChatSessionModel) -> list[ChatMessageModel]:
+        # Range scan on (session_id, created_at), bounded by the fold threshold
+        stmt = select(ChatMessageModel).filter(ChatMessageModel.session_id == session.id)
+        if session.summary_until is not None:
+            stmt = stmt.filter(ChatMessageModel.created_at > session.summary_until)
+        stmt = stmt.order_by(ChatMessageModel.created_at.desc()).limit(settings.CHAT_HISTORY_WINDOW + settings.CHAT_SUMMARY_BATCH)
+        return list(reversed((await db.execute(stmt)).scalars().all()))
+
+    @staticmethod
+    async def record_turn(db: AsyncSession, session_id: str, query: str, asked_at: datetime, result: dict, new_session: ChatSessionModel | None = None):
+        """Write the question and the answer of one turn in a single commit, then maybe fold history"""
+        answered_at = datetime.now(timezone.utc)
+        if new_session is not None:
+            db.add(new_session)
+            await db.flush()
+        db.add_all([
+            ChatMessageModel(id=uuid.uuid4().hex, session_id=session_id, role="user", message=query, created_at=asked_at),
+            ChatMessageModel(
+                id=uuid.uuid4().hex,
+                session_id=session_id,
+                role="assistant",
+                message=result["answer"],
+                source_citation=result.get("citations") or None,
+                created_at=answered_at
+            ),
+        ])
+        session = await db.get(ChatSessionModel, session_id)
+        if session is not None:
+            session.updated_at = answered_at
+        await db.commit()
+
+        task = asyncio.create_task(ChatSessionService.fold_history(session_id))
+        _background_tasks.add(task)
+        task.add_done_callback(_background_tasks.discard)
+
+    @staticmethod
+    async def fold_history(session_id: str):
+        """Fold the oldest unsummarized messages into the running summary once there are too many.
+
+        The summary is only written if summary_until is still what the fold
+        started from, so a fold running elsewhere (another worker process)
+        is never overwritten with a summary built on stale history.
+        """
+        if session_id in _folding:
+            return
+        _folding.add(session_id)
+        try:
+            async with AsyncSessionLocal() as db:
+                session = await db.get(ChatSessionModel, session_id)
+                if session is None:
+                    return
+                messages = await ChatSessionService._unsummarized_messages(db, session)
+                if len(messages) < settings.CHAT_HISTORY_WINDOW + settings.CHAT_SUMMARY_BATCH:
+                    return
+                folded = messages[:len(messages) - settings.CHAT_HISTORY_WINDOW]
+                prompt = get_chat_summary_prompt(session.summary, format_messages(folded))
+                summary = (await asyncGemAI.generate_content(prompt)).strip()
+                result = await db.execute(
+                    update(ChatSessionModel).where(
+                        ChatSessionModel.id == session_id,
+                        ChatSessionModel.summary_until.is_not_distinct_from(session.summary_until)
+                    ).values(summary=summary, summary_until=folded[-1].created_at)
+                )
+                await db.commit()
+                if result.rowcount == 0:
+                    print(f"DEBUG: Chat session {session_id} was summarized concurrently, dropping this fold")
+                    return
+                print(f"DEBUG: Folded {len(folded)} messages into the summary of chat session {session_id}")
+        except Exception as e:
+            # The next turn retries, history just stays a little longer meanwhile
+            print(f"WARNING: Failed to summarize chat session {session_id}: {e}")
+        finally:
+            _folding.discard(session_id)
+
+    async def list_sessions(self, user_id: int, skip: int = 0, limit: int = 20) -> list[ChatSessionModel]:
+        return (await self.db.execute(
+            select(ChatSessionModel).filter(ChatSessionModel.user_id == user_id)
+            .order_by(ChatSessionModel.updated_at.desc()).offset(skip).limit(limit)
+        )).scalars().all()
+
+    async def get_messages(self, user_id: int, session_id: str, limit: int = 50, before: datetime | None = None) -> list[ChatMessageModel]:
+        """Newest ``limit`` messages older than ``before``, returned oldest first"""
+        await self.get_owned_session(user_id, session_id)
+        stmt = select(ChatMessageModel).filter(ChatMessageModel.session_id == session_id)
+        if before is not None:
+            stmt = stmt.filter(ChatMessageModel.created_at < before)
+        stmt = stmt.order_by(ChatMessageModel.created_at.desc()).limit(limit)
+        return list(reversed((await self.db.execute(stmt)).scalars().all()))
+
+    async def delete_session(self, user_id: int, session_id: str):
+        session = await self.get_owned_session(user_id, session_id)
+        await self.db.delete(session)
+        await self.db.commit()
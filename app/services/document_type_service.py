@@ -1,59 +1,82 @@
-import json
 from sqlalchemy import or_, select
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi import Depends, HTTPException
 from app.migrations.document_type import DocumentType as DocumentTypeModel
-from app.core.db import get_db
+from app.core.db import get_async_db
 from app.models.document_types import DocumentCreateModel, DocumentTypeResponse, DocumentUpdateModel
+from app.utils.prompt import invalidate_rules_block
 
 class DocumentTypeService:
-    def __init__(self, db: Session = Depends(get_db)):
+    def __init__(self, db: AsyncSession = Depends(get_async_db)):
         self.db = db
 
-    def get_types(self, user_id: int, skip: int = 0, limit: int = 100):
-        statement = select('*').filter(or_(DocumentTypeModel.user_id == user_id, DocumentTypeModel.user_id == None)).offset(skip).limit(limit)
-        result = self.db.execute(statement).all()
+    async def get_types(self, user_id: int, skip: int = 0, limit: int = 100):
+        statement = select(
+            DocumentTypeModel.id,
+            DocumentTypeModel.name,
+            DocumentTypeModel.description,
+            DocumentTypeModel.risk_rules
+        ).filter(or_(DocumentTypeModel.user_id == user_id, DocumentTypeModel.user_id == None)).offset(skip).limit(limit)
+        result = (await self.db.execute(statement)).all()
+        # risk_rules is JSONB, the driver already returns it as a list
         return [DocumentTypeResponse(
             id=row.id,
             name=row.name,
             description=row.description,
-            risk_rules=json.loads(row.risk_rules) if row.risk_rules else None
+            risk_rules=row.risk_rules or None
+        ) for row in result]
+
+    async def find_types_by_rule(self, user_id: int, clause: str, severity: str | None = None):
+        """Types visible to the user that contain a rule for ``clause``, served by the GIN index"""
+        rule = {"clause": clause}
+        if severity:
+            rule["severity"] = severity
+        statement = select(
+            DocumentTypeModel.id,
+            DocumentTypeModel.name,
+            DocumentTypeModel.description,
+            DocumentTypeModel.risk_rules
+        ).filter(
+            or_(DocumentTypeModel.user_id == user_id, DocumentTypeModel.user_id == None),
+            DocumentTypeModel.risk_rules.contains([rule])
+        )
+        result = (await self.db.execute(statement)).all()
+        return [DocumentTypeResponse(
+            id=row.id,
+            name=row.name,
+            description=row.description,
+            risk_rules=row.risk_rules
         ) for row in result]
         
-    def add_types(self, user_id: int, doc_type_dto: DocumentCreateModel):
-        if not doc_type_dto.risk_rules:
-            stringify = None
-        else:
-            # Convert to JSON string for storage
-            stringify = json.dumps([rule.model_dump() for rule in doc_type_dto.risk_rules])
-        type = DocumentTypeModel(user_id=user_id, name=doc_type_dto.name, description=doc_type_dto.description, risk_rules=stringify)
+    async def add_types(self, user_id: int, doc_type_dto: DocumentCreateModel):
+        risk_rules = [rule.model_dump() for rule in doc_type_dto.risk_rules] if doc_type_dto.risk_rules else None
+        type = DocumentTypeModel(user_id=user_id, name=doc_type_dto.name, description=doc_type_dto.description, risk_rules=risk_rules)
         self.db.add(type)
-        self.db.commit()
+        await self.db.commit()
         return type
 
-    def update_type(self, user_id: int, doc_type_id: int, doc_type_dto: DocumentUpdateModel):
-        type = self.db.query(DocumentTypeModel).filter(DocumentTypeModel.id == doc_type_id, DocumentTypeModel.user_id == user_id).first()
+    async def _get_owned_type(self, user_id: int, doc_type_id: int) -> DocumentTypeModel:
+        type = (await self.db.execute(
+            select(DocumentTypeModel).filter(DocumentTypeModel.id == doc_type_id, DocumentTypeModel.user_id == user_id)
+        )).scalars().first()
         if not type:
             raise HTTPException(status_code=404, detail="Document type not found")
+        return type
+
+    async def update_type(self, user_id: int, doc_type_id: int, doc_type_dto: DocumentUpdateModel):
+        type = await self._get_owned_type(user_id, doc_type_id)
         type.name = doc_type_dto.name
         type.description = doc_type_dto.description
-        if not doc_type_dto.risk_rules:
-            type.risk_rules = None
-        else:
-            # Convert to JSON string for storage
-            type.risk_rules = json.dumps([rule.model_dump() for rule in doc_type_dto.risk_rules])
-        self.db.commit()
+        type.risk_rules = [rule.model_dump() for rule in doc_type_dto.risk_rules] if doc_type_dto.risk_rules else None
+        await self.db.commit()
+        invalidate_rules_block(type.id)
         return type
 
-    def get_single_type(self, user_id: int, doc_type_id: int):
-        type = self.db.query(DocumentTypeModel).filter(DocumentTypeModel.id == doc_type_id, DocumentTypeModel.user_id == user_id).first()
-        if not type:
-            raise HTTPException(status_code=404, detail="Document type not found")
-        return type
+    async def get_single_type(self, user_id: int, doc_type_id: int):
+        return await self._get_owned_type(user_id, doc_type_id)
 
-    def delete_type(self, user_id: int, doc_type_id: int):
-        type = self.db.query(DocumentTypeModel).filter(DocumentTypeModel.id == doc_type_id, DocumentTypeModel.user_id == user_id).first()
-        if not type:
-            raise HTTPException(status_code=404, detail="Document type not found")
-        self.db.delete(type)
-        self.db.commit()
\ No newline at end of file
+    async def delete_type(self, user_id: int, doc_type_id: int):
+        type = await self._get_owned_type(user_id, doc_type_id)
+        await self.db.delete(type)
+        await self.db.commit()
+        invalidate_rules_block(doc_type_id)
@@ -1,55 +1,134 @@
-import shutil
-from sqlalchemy.orm import Session
+import asyncio
+import base64
+import binascii
+import hashlib
+import os
+import tempfile
+from datetime import datetime
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload, contains_eager
 from fastapi import Depends, UploadFile
 from app.migrations.documents import Document as DocumentModel
 from app.migrations.document_type import DocumentType as DocumentTypeModel
 from pathlib import Path
-from app.utils.prompt import get_summarization_prompt
-import pymupdf
+from app.utils.prompt import get_document_type_summarization_prompt
 import json
 
-from app.core.db import get_db
-from app.core.gemini_client import gemAI
-from app.core.pinecone_client import pinecone_client
-from app.models.documents import DocumentResponse, DocumentDetailResponse, DocumentSummarizationModel
-from app.models.document_types import DocumentTypeRelationResponse
-from sqlalchemy import select
+from app.core.config import settings
+from app.core.db import get_async_db
+from app.core.gemini_client import asyncGemAI
+from app.core.vector_store import vector_store
+from app.core.lexical_index import lexical_index
+from app.core.answer_cache import answer_cache
+from app.core.storage import storage, blob_key
+from app.models.documents import DocumentDetailResponse, DocumentSummarizationModel
+from sqlalchemy import select, tuple_, func
 from fastapi import HTTPException
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_core.documents import Document as LCDocument
 from app.services.document_type_service import DocumentTypeService
+from app.services.ingest_service import IngestService
 
 
 class DocumentService:
-    def __init__(self, db: Session = Depends(get_db)):
+    def __init__(self, db: AsyncSession = Depends(get_async_db)):
         self.db = db
-        self.upload_path = Path("./storage")
-
-    def get_documents(self, user_id: int, skip: int = 0, limit: int = 100):
-        from sqlalchemy.orm import joinedload
-        stmt = select(DocumentModel).options(
-            joinedload(DocumentModel.document_type)
-        ).filter(
-            DocumentModel.user_id == user_id
+        self.storage = storage
+
+    def _list_query(self, user_id: int, summary_chars: int | None = None):
+        """Select only the columns a listing needs, as plain rows instead of ORM entities"""
+        summary = DocumentModel.summary
+        if summary_chars is not None:
+            # Truncate in the database so long summaries never leave it
+            summary = func.substr(DocumentModel.summary, 1, summary_chars)
+        return select(
+            DocumentModel.id,
+            DocumentModel.filename,
+            DocumentModel.created_at,
+            DocumentModel.ai_progress,
+            summary.label("summary"),
+            DocumentTypeModel.id.label("type_id"),
+            DocumentTypeModel.name.label("type_name"),
+        ).outerjoin(DocumentModel.document_type).filter(DocumentModel.user_id == user_id)
+
+    @staticmethod
+    def _row_to_dict(row) -> dict:
+        """A listing row shaped like DocumentResponse, risk_rules are left to the type endpoints"""
+        return {
+            "id": row.id,
+            "filename": row.filename,
+            "created_at": row.created_at.isoformat(),
+            "document_type": {
+                "id": row.type_id,
+                "name": row.type_name,
+                "risk_rules": None,
+            } if row.type_id is not None else None,
+            "ai_progress": row.ai_progress,
+            "summary": row.summary,
+        }
+
+    async def get_documents(self, user_id: int, skip: int = 0, limit: int = 100, summary_chars: int | None = None) -> list[dict]:
+        stmt = self._list_query(user_id, summary_chars).order_by(
+            DocumentModel.created_at.desc(), DocumentModel.id.desc()
         ).limit(limit).offset(skip)
-        result = self.db.execute(stmt).scalars().all()
-        return [DocumentResponse(
-            id=doc.id, 
-            filename=doc.filename, 
-            created_at=doc.created_at,
-            ai_progress= doc.ai_progress,
-            summary=doc.summary,
-            document_type=DocumentTypeRelationResponse(
-                id=doc.document_type.id,
-                name=doc.document_type.name,
-            ) if doc.document_type else None
-        ) for doc in result]
+        rows = (await self.db.execute(stmt)).all()
+        return [self._row_to_dict(row) for row in rows]
+
+    async def get_documents_page(
+        self,
+        user_id: int,
+        limit: int = 10,
+        cursor: str | None = None,
+        ai_progress: str | None = None,
+        risk_level: str | None = None,
+        document_type_id: int | None = None,
+        summary_chars: int | None = None,
+    ) -> dict:
+        """Newest-first page of documents using keyset pagination on (created_at, id).
+
+        Each page is an index range scan starting right after the cursor, so
+        its cost doesn't grow with how deep the client has paged.
+        """
+        stmt = self._list_query(user_id, summary_chars)
+        if ai_progress is not None:
+            stmt = stmt.filter(DocumentModel.ai_progress == ai_progress)
+        if risk_level is not None:
+            stmt = stmt.filter(DocumentModel.risk_level == risk_level.lower())
+        if document_type_id is not None:
+            stmt = stmt.filter(DocumentModel.document_type_id == document_type_id)
+        if cursor:
+            created_at, last_id = self._decode_cursor(cursor)
+            stmt = stmt.filter(tuple_(DocumentModel.created_at, DocumentModel.id) < tuple_(created_at, last_id))
+        # Fetch one extra row to know whether there is a next page
+        stmt = stmt.order_by(DocumentModel.created_at.desc(), DocumentModel.id.desc()).limit(limit + 1)
+
+        rows = (await self.db.execute(stmt)).all()
+        next_cursor = self._encode_cursor(rows[limit - 1]) if len(rows) > limit else None
+        return {
+            "items": [self._row_to_dict(row) for row in rows[:limit]],
+            "next_cursor": next_cursor,
+        }
+
+    @staticmethod
+    def _encode_cursor(row) -> str:
+        raw = f"{row.created_at.isoformat()}|{row.id}"
+        return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+
+    @staticmethod
+    def _decode_cursor(cursor: str) -> tuple[datetime, int]:
+        try:
+            created_at, last_id = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8").split("|")
+            return datetime.fromisoformat(created_at), int(last_id)
+        except (ValueError, UnicodeError, binascii.Error):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
 
     async def sync_document(self, user_id: int, document_id: int):
-        doc = self.db.query(DocumentModel).join(DocumentModel.document_type).filter(
-            DocumentModel.user_id == user_id,
-            DocumentModel.id == document_id
-        ).first()
+        doc = (await self.db.execute(
+            select(DocumentModel).join(DocumentModel.document_type).options(
+                contains_eager(DocumentModel.document_type)
+            ).filter(
+                DocumentModel.user_id == user_id,
+                DocumentModel.id == document_id
+            )
+        )).scalars().first()
         if not doc:
             raise HTTPException(status_code=404, detail="Document not found")
         # end status is completed
@@ -61,15 +140,18 @@ class DocumentService:
             match doc.ai_progress:
                 case "pending":
                     try:
-                        await self.upload_to_pinecone(path=doc.file_path, document_id=doc.id, user_id=user_id)
+                        path = await asyncio.to_thread(self.storage.local_path, doc.file_path)
+                        await self.upload_to_pinecone(path=path, document_id=doc.id, user_id=user_id)
                         # Change status to extracted
                         doc.ai_progress = "extracted"
-                        self.db.commit()
+                        await self.db.commit()
+                        answer_cache.invalidate(doc.id)
                     except Exception as e:
                         raise HTTPException(status_code=500, detail=str(e))
                 case "extracted":
                     try:
-                        summary_result = await self.summarize_document(document_type= doc.document_type, doc_path=doc.file_path)
+                        path = await asyncio.to_thread(self.storage.local_path, doc.file_path)
+                        summary_result = await self.summarize_document(document_type= doc.document_type, doc_path=path)
                         # Parse JSON response
                         try:
                             # Strip markdown code block wrapper if present
@@ -102,7 +184,7 @@ class DocumentService:
                             doc.risk_reasoning = ''
                         # Change status to summarized
                         doc.ai_progress = "summarized"
-                        self.db.commit()
+                        await self.db.commit()
                     except Exception as e:
                         raise HTTPException(status_code=500, detail=str(e))
                 case "summarized":
@@ -111,27 +193,74 @@ class DocumentService:
         return
 
     async def summarize_document(self, document_type: DocumentTypeModel, doc_path: str):
+        # Rule block is parsed and rendered once per document type
+        prompt = get_document_type_summarization_prompt(document_type)
         
-        # Parse risk rules from JSON
-        risk_rules = json.loads(document_type.risk_rules) if document_type.risk_rules else []
-        
-        # Generate the proper prompt using the template
-        prompt = get_summarization_prompt(
-            document_type_name=document_type.name,
-            document_type_description=document_type.description or "",
-            list_of_rules=risk_rules
-        )
-        
-        gem_ai_response = await gemAI.generate_context_with_file(doc_path, prompt, DocumentSummarizationModel)
+        gem_ai_response = await asyncGemAI.generate_context_with_file(doc_path, prompt, DocumentSummarizationModel)
         return gem_ai_response
 
-    def get_document_detail(self, user_id: int, document_id: int):
-        doc = self.db.query(DocumentModel).filter(
-            DocumentModel.user_id == user_id,
-            DocumentModel.id == document_id
-        ).first()
+    async def _get_owned_document(self, user_id: int, document_id: int) -> DocumentModel:
+        doc = (await self.db.execute(
+            select(DocumentModel).filter(
+                DocumentModel.user_id == user_id,
+                DocumentModel.id == document_id
+            )
+        )).scalars().first()
         if not doc:
             raise HTTPException(status_code=404, detail="Document not found")
+        return doc
+
+    async def get_document_version(self, user_id: int, document_id: int) -> datetime:
+        """updated_at of an owned document, changes whenever the document is re-synced or replaced"""
+        version = (await self.db.execute(
+            select(DocumentModel.updated_at).filter(
+                DocumentModel.user_id == user_id,
+                DocumentModel.id == document_id
+            )
+        )).scalar_one_or_none()
+        if version is None:
+            raise HTTPException(status_code=404, detail="Document not found")
+        return version
+
+    async def get_chat_documents(self, user_id: int, document_ids: list[int] | None = None, limit: int = 50) -> tuple[dict[int, str], int]:
+        """id -> filename of the user's ingested documents, all of them (newest first, up to ``limit``) when no ids are given.
+
+        Also returns how many documents matched, which is more than were
+        returned when the library is over ``limit``. Requested ids that don't
+        exist or belong to someone else are a 404, ones that aren't ingested
+        yet are a 400.
+        """
+        stmt = select(DocumentModel.id, DocumentModel.filename, DocumentModel.ai_progress).filter(DocumentModel.user_id == user_id)
+        if document_ids:
+            document_ids = list(dict.fromkeys(document_ids))
+            if len(document_ids) > limit:
+                raise HTTPException(status_code=400, detail=f"At most {limit} documents can be queried at once")
+            stmt = stmt.filter(DocumentModel.id.in_(document_ids))
+        else:
+            stmt = stmt.filter(DocumentModel.ai_progress != "pending").order_by(DocumentModel.updated_at.desc()).limit(limit)
+        rows = (await self.db.execute(stmt)).all()
+
+        if document_ids:
+            missing = set(document_ids) - {row.id for row in rows}
+            if missing:
+                raise HTTPException(status_code=404, detail=f"Documents not found: {sorted(missing)}")
+            pending = [row.id for row in rows if row.ai_progress == "pending"]
+            if pending:
+                raise HTTPException(status_code=400, detail=f"Documents not synced yet: {sorted(pending)}")
+        elif not rows:
+            raise HTTPException(status_code=404, detail="No synced documents to search")
+
+        total = len(rows)
+        if not document_ids and total == limit:
+            total = (await self.db.execute(
+                select(func.count()).select_from(DocumentModel).filter(
+                    DocumentModel.user_id == user_id, DocumentModel.ai_progress != "pending"
+                )
+            )).scalar_one()
+        return {row.id: row.filename for row in rows}, total
+
+    async def get_document_detail(self, user_id: int, document_id: int):
+        doc = await self._get_owned_document(user_id, document_id)
         resp = DocumentDetailResponse(
             id=doc.id,
             filename=doc.filename,
@@ -146,233 +275,217 @@ class DocumentService:
 
     async def upload_document(self, user_id: int, file: UploadFile, filename: str, document_type_id: int):
         document_type_service = DocumentTypeService(self.db)
-        document_type = document_type_service.get_single_type(user_id, document_type_id)
+        document_type = await document_type_service.get_single_type(user_id, document_type_id)
         if not document_type:
             raise HTTPException(status_code=404, detail="Document type not found")
 
+        content_hash, key, staged_path = await self._stage_upload(file)
+        await self._store_staged({key: staged_path})
         db_document = DocumentModel(
             user_id=user_id, 
             filename=filename, 
-            file_path="temp", # Placeholder,
+            file_path=key,
+            content_hash=content_hash,
             document_type_id=document_type_id
         )
         self.db.add(db_document)
-        self.db.flush()
-        new_id = db_document.id
-        doc_path = self.upload_path / str(user_id)
-        doc_path.mkdir(parents=True, exist_ok=True)
-        path = doc_path / f"{new_id}_{filename}.{file.filename.split('.')[-1]}"
+        await self.db.commit()
+        await self.db.refresh(db_document)
+        # will upload it manually
+        # await self.upload_to_pinecone(str(path), db_document.id, user_id)
+        return db_document
+
+    async def bulk_upload(self, user_id: int, files: list[UploadFile], document_type_id: int) -> list[dict]:
+        """Store a batch of uploads as documents of one type, one result per file in upload order.
+
+        Files are streamed to the blob store one after another. A file whose
+        content the user already has, in an earlier document or earlier in
+        the batch, doesn't become a new document: its result points at the
+        existing one with ``duplicate`` set.
+        """
+        if len(files) > settings.BULK_UPLOAD_MAX_FILES:
+            raise HTTPException(status_code=400, detail=f"At most {settings.BULK_UPLOAD_MAX_FILES} files per upload")
+        document_type_service = DocumentTypeService(self.db)
+        document_type = await document_type_service.get_single_type(user_id, document_type_id)
+        if not document_type:
+            raise HTTPException(status_code=404, detail="Document type not found")
+
+        stored = []
+        staged = {}
         try:
-            with path.open("wb") as buffer:
-                shutil.copyfileobj(file.file, buffer)
+            for file in files:
+                content_hash, key, staged_path = await self._stage_upload(file)
+                stored.append((Path(file.filename or "document").stem, content_hash, key))
+                if key in staged:
+                    Path(staged_path).unlink(missing_ok=True)
+                else:
+                    staged[key] = staged_path
+        except BaseException:
+            for staged_path in staged.values():
+                Path(staged_path).unlink(missing_ok=True)
+            raise
+        await self._store_staged(staged)
+
+        existing = dict((await self.db.execute(
+            select(DocumentModel.content_hash, DocumentModel.id).filter(
+                DocumentModel.user_id == user_id,
+                DocumentModel.content_hash.in_({content_hash for _, content_hash, _ in stored})
+            )
+        )).all())
+        created: dict[str, DocumentModel] = {}
+        for filename, content_hash, key in stored:
+            if content_hash not in existing and content_hash not in created:
+                created[content_hash] = DocumentModel(
+                    user_id=user_id,
+                    filename=filename,
+                    file_path=key,
+                    content_hash=content_hash,
+                    document_type_id=document_type_id
+                )
+        self.db.add_all(created.values())
+        await self.db.commit()
+
+        results = []
+        seen = set()
+        for filename, content_hash, _ in stored:
+            duplicate = content_hash in existing or content_hash in seen
+            seen.add(content_hash)
+            results.append({
+                "filename": filename,
+                "document_id": existing[content_hash] if content_hash in existing else created[content_hash].id,
+                "content_hash": content_hash,
+                "duplicate": duplicate,
+            })
+        print(f"DEBUG: Bulk upload of {len(files)} files, {len(created)} new documents")
+        return results
+
+    async def _stage_upload(self, file: UploadFile) -> tuple[str, str, str]:
+        """Stream an upload to the staging directory, returns its sha256, storage key and staged path.
+
+        One worker thread copies the file in UPLOAD_CHUNK_SIZE chunks, hashing
+        as it writes. Identical content always maps to the same single key;
+        _store_staged moves the file there.
+        """
+        suffix = Path(file.filename or "").suffix.lower() or ".pdf"
+
+        def copy():
+            fd, tmp_path = tempfile.mkstemp(dir=self.storage.staging_dir)
+            try:
+                hasher = hashlib.sha256()
+                with os.fdopen(fd, "wb") as buffer:
+                    while chunk := file.file.read(settings.UPLOAD_CHUNK_SIZE):
+                        hasher.update(chunk)
+                        buffer.write(chunk)
+                content_hash = hasher.hexdigest()
+                return content_hash, blob_key(content_hash, suffix), tmp_path
+            except BaseException:
+                Path(tmp_path).unlink(missing_ok=True)
+                raise
+        try:
+            return await asyncio.to_thread(copy)
         except Exception as e:
             raise HTTPException(status_code=500, detail=str(e))
         finally:
             file.file.close()
-        db_document.file_path = str(path)
-        self.db.commit()
-        self.db.refresh(db_document)
-        # will upload it manually
-        # await self.upload_to_pinecone(str(path), db_document.id, user_id)
-        return db_document
-    
+
+    async def _lock_files(self, keys):
+        """Serialize storing and releasing the same files across workers until the transaction ends.
+
+        Uses transaction-level advisory locks, taken in key order so two
+        uploads sharing files can't deadlock. Only Postgres has them.
+        """
+        if self.db.get_bind().dialect.name != "postgresql":
+            return
+        for key in sorted(keys):
+            await self.db.execute(select(func.pg_advisory_xact_lock(func.hashtext(key))))
+
+    async def _store_staged(self, staged: dict[str, str]):
+        """Move staged uploads (key -> staged path) into storage.
+
+        The files' locks are held until the caller commits the rows that
+        reference them, so a concurrent _release_file of the same blob either
+        finishes first (and the blob is stored again here) or sees the rows.
+        """
+        try:
+            await self._lock_files(staged)
+
+            def put():
+                for key, staged_path in staged.items():
+                    # Same key means same bytes, so replacing an existing blob is harmless
+                    self.storage.put_file(key, staged_path)
+            await asyncio.to_thread(put)
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=str(e))
+        finally:
+            for staged_path in staged.values():
+                Path(staged_path).unlink(missing_ok=True)
+
+    async def _release_file(self, user_id: int, file_path: str, content_hash: str | None):
+        """Delete a stored file once no document points at it any more"""
+        await self._lock_files([file_path])
+        stmt = select(DocumentModel.id).filter(DocumentModel.file_path == file_path)
+        if content_hash:
+            # Blob paths derive from the hash, which is indexed
+            stmt = stmt.filter(DocumentModel.content_hash == content_hash)
+        else:
+            # Files from before deduplication live in the owner's folder only
+            stmt = stmt.filter(DocumentModel.user_id == user_id)
+        if (await self.db.execute(stmt.limit(1))).first() is None:
+            await asyncio.to_thread(self.storage.delete, file_path)
+        # Ends the transaction, releasing the lock
+        await self.db.commit()
+
+    async def reset_progress(self, user_id: int, document_id: int):
+        """Send a document back through the sync state machine"""
+        doc = await self._get_owned_document(user_id, document_id)
+        doc.ai_progress = "pending"
+        await self.db.commit()
+        answer_cache.invalidate(doc.id)
+        return doc
+
+    async def replace_document_file(self, user_id: int, document_id: int, file: UploadFile):
+        """Store a revised version of a document and reset it for re-ingestion.
+
+        The chunk manifest is kept, so the next sync only embeds changed chunks.
+        """
+        doc = await self._get_owned_document(user_id, document_id)
+
+        old_path, old_hash = doc.file_path, doc.content_hash
+        content_hash, key, staged_path = await self._stage_upload(file)
+        await self._store_staged({key: staged_path})
+
+        doc.file_path = key
+        doc.content_hash = content_hash
+        doc.ai_progress = "pending"
+        doc.summary = None
+        doc.risk_level = None
+        doc.risk_reasoning = None
+        await self.db.commit()
+        answer_cache.invalidate(doc.id)
+        if old_path != doc.file_path:
+            await self._release_file(user_id, old_path, old_hash)
+        return doc
+
     async def upload_to_pinecone(self, path: str, document_id: int, user_id: int):
         try:
-            doc = pymupdf.open(path)
-            namespace = f"user_{user_id}"
-            
-            raw_documents = []
-            need_llm = False
-            for page in doc:
-                # Create a tiny object for each page that knows its page number
-                page_text = page.get_text()
-                if len(page_text.strip()) == 0:
-                    need_llm = True
-                    break
-                
-                if page_text.strip():
-                    raw_documents.append(
-                        LCDocument(
-                            page_content=page_text,
-                            metadata={"page": page.number + 1}
-                        )
-                    )
-            
-            if need_llm:
-                prompt = """
-                    Transcribe this legal document page by page.
-                    Return a JSON array where each item represents one page in order.
-                    Format: ["Page 1 content here", "Page 2 content here", "Page 3 content here"]
-                    Only return the page content, no additional text or explanations.
-                """
-                try:
-                    response = await gemAI.generate_context_with_file(path, prompt)
-                    print("LLM Response:", response)
-                    
-                    # Parse the LLM response and create documents
-                    if response and response.strip():
-                        try:
-                            # Clean response and try to parse as JSON array
-                            import json
-                            cleaned_response = response.strip()
-                            
-                            # Remove markdown code blocks if present
-                            if cleaned_response.startswith('```json'):
-                                cleaned_response = cleaned_response[7:]  # Remove ```json
-                            if cleaned_response.startswith('```'):
-                                cleaned_response = cleaned_response[3:]   # Remove ```
-                            if cleaned_response.endswith('```'):
-                                cleaned_response = cleaned_response[:-3]  # Remove ```
-                            
-                            cleaned_response = cleaned_response.strip()
-                            print(f"Cleaned response: {cleaned_response[:100]}...")
-                            pages = json.loads(cleaned_response)
-                            print(f"Parsed {len(pages)} pages from LLM response")
-                            
-                            for i, page_content in enumerate(pages):
-                                if page_content and page_content.strip():
-                                    raw_documents.append(
-                                        LCDocument(
-                                            page_content=page_content.strip(),
-                                            metadata={"page": i + 1}
-                                        )
-                                    )
-                        except json.JSONDecodeError as e:
-                            # Fallback: treat as plain text split by pages
-                            print(f"JSON parsing failed: {e}")
-                            print("LLM response is not JSON, treating as plain text")
-                            pages = response.split('\n\n')  # Split by double newlines
-                            for i, page_content in enumerate(pages):
-                                if page_content.strip():
-                                    raw_documents.append(
-                                        LCDocument(
-                                            page_content=page_content.strip(),
-                                            metadata={"page": i + 1}
-                                        )
-                                    )
-                        print(f"Created {len(raw_documents)} documents from LLM response")
-                    else:
-                        print("LLM returned empty response")
-                except Exception as e:
-                    print(f"ERROR: LLM transcription failed: {e}")
-                    print("Falling back to basic text extraction...")
-                    
-                    # Fallback: Try to extract any text at all
-                    try:
-                        all_text = "\n".join([page.get_text() for page in doc])
-                        if all_text.strip():
-                            raw_documents.append(
-                                LCDocument(
-                                    page_content=all_text.strip(),
-                                    metadata={"page": 1}
-                                )
-                            )
-                    except Exception as fallback_e:
-                        print(f"Fallback extraction also failed: {fallback_e}")
-                        return
-                
-                if not raw_documents:
-                    print("ERROR: Could not extract any content from PDF")
-                    return
-            
-            # 2. Smart Chunking (this will now preserve metadata!)
-            text_splitter = RecursiveCharacterTextSplitter(
-                chunk_size=500,  # Reduced chunk size
-                chunk_overlap=100,  # Reduced overlap
-                separators=["\n\n", "\n", ". ", " "]  # More flexible separators
-            )
-            
-            # .split_documents is smarter than .split_text
-            # If a chunk comes from Page 1, it keeps {"page": 1} in its metadata
-            chunks = text_splitter.split_documents(raw_documents)
-            
-            print(f"DEBUG: Generated {len(chunks)} chunks from {len(raw_documents)} documents")
-            
-            if not chunks:
-                print("ERROR: No chunks generated from document!")
-                # Try fallback: simple text splitting
-                all_text = "\n".join([doc.page_content for doc in raw_documents])
-                if all_text.strip():
-                    print("DEBUG: Using fallback text splitting method")
-                    chunks = text_splitter.split_text(all_text)
-                else:
-                    print("ERROR: Document has no extractable text content!")
-                    return
-            
-            # 2. Prepare Vectors in a List (Batching)
-            vectors_to_upsert = []
-            
-            for i, chunk in enumerate(chunks):
-                try:
-                    # Ensure chunk has content
-                    if not chunk.page_content or not chunk.page_content.strip():
-                        print(f"WARNING: Skipping empty chunk {i}")
-                        continue
-                    
-                    embedding = gemAI.create_embedding(chunk.page_content)
-                    vectors_to_upsert.append({
-                        "id": f"doc_{document_id}_chunk_{i}",
-                        "values": embedding,
-                        "metadata": {
-                            "document_id": document_id,
-                            "user_id": user_id,
-                            "text": chunk.page_content, # The actual text
-                            "page": chunk.metadata.get("page", 0), # Safe access with fallback
-                            "chunk_index": i
-                        }
-                    })
-                except Exception as e:
-                    print(f"ERROR: Failed to create embedding for chunk {i}: {e}")
-                    continue
-            
-            print(f"DEBUG: Prepared {len(vectors_to_upsert)} vectors for upsert")
-            
-            if not vectors_to_upsert:
-                print("ERROR: No vectors prepared for upsert!")
-                return
-            
-            # 3. Batch Upload to Handle 2MB Size Limit
-            # Pinecone max request size is 2MB, so we need to batch
-            batch_size = 50  # Conservative batch size to stay under 2MB
-            total_batches = (len(vectors_to_upsert) + batch_size - 1) // batch_size
-            
-            print(f"DEBUG: Uploading {len(vectors_to_upsert)} vectors in {total_batches} batches of {batch_size}")
-            
-            for i in range(0, len(vectors_to_upsert), batch_size):
-                batch = vectors_to_upsert[i:i + batch_size]
-                batch_num = (i // batch_size) + 1
-                
-                print(f"DEBUG: Uploading batch {batch_num}/{total_batches} with {len(batch)} vectors")
-                
-                try:
-                    result = pinecone_client.upsert_vectors(batch, namespace=namespace)
-                    print(f"DEBUG: Batch {batch_num} upsert result: {result}")
-                except Exception as batch_error:
-                    print(f"ERROR: Batch {batch_num} failed: {batch_error}")
-                    raise Exception(f"Failed to upload batch {batch_num}: {str(batch_error)}")
-            
-            print(f"DEBUG: All {total_batches} batches uploaded successfully")
-            
+            await IngestService(self.db).ingest(path, document_id, user_id)
         except Exception as e:
             print(f"ERROR in upload_to_pinecone: {e}")
             raise
     
-    def delete_document(self, user_id: int, document_id: int):
-        doc = self.db.query(DocumentModel).filter(
-            DocumentModel.user_id == user_id,
-            DocumentModel.id == document_id
-        ).first()
-        doc_path = doc.file_path
-        if not doc:
-            raise HTTPException(status_code=404, detail="Document not found")
-        self.db.delete(doc)
-        self.db.commit()
+    async def delete_document(self, user_id: int, document_id: int):
+        doc = await self._get_owned_document(user_id, document_id)
+        doc_path, content_hash = doc.file_path, doc.content_hash
+        await self.db.delete(doc)
+        await self.db.commit()
+        answer_cache.invalidate(document_id)
         
         # Delete from Pinecone
-        pinecone_client.delete_vectors(f"user_{user_id}", {"document_id": document_id})
+        await asyncio.to_thread(vector_store.delete_vectors, f"user_{user_id}", {"document_id": document_id})
+        if lexical_index is not None:
+            await asyncio.to_thread(lexical_index.delete_document, user_id, document_id)
 
-        # Delete file
-        import os
-        os.remove(doc_path)
+        # Delete file, unless another document shares the blob
+        await self._release_file(user_id, doc_path, content_hash)
         
         return {"detail": "success"}
\ No newline at end of file
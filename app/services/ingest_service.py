@@ -0,0 +1,284 @@
+import asyncio
+import hashlib
+import itertools
+from collections import deque
+from typing import AsyncIterator
+
+import pymupdf
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+from sqlalchemy import select, delete
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.gemini_client import asyncGemAI
+from app.core.lexical_index import lexical_index
+from app.core.vector_store import vector_store
+from app.core.vector_upload import upsert_vectors_pipelined
+from app.migrations.document_chunks import DocumentChunk as DocumentChunkModel
+
+# Marks the end of a stage's output on its queue
+_DONE = object()
+
+OCR_PAGE_PROMPT = """
+    Transcribe the text of this legal document page exactly as written.
+    Keep the reading order and paragraph breaks.
+    Only return the page content, no additional text or explanations.
+"""
+
+
+class IngestService:
+    """Streams a PDF into the vector store: page -> chunk -> embedding batch -> upsert batch.
+
+    Stages are connected by bounded queues, so memory stays flat regardless of
+    page count and embedding starts while later pages are still being parsed.
+    """
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+        self.text_splitter = RecursiveCharacterTextSplitter(
+            chunk_size=500,
+            chunk_overlap=100,
+            separators=["\n\n", "\n", ". ", " "]
+        )
+
+    async def ingest(self, path: str, document_id: int, user_id: int) -> int:
+        """Ingest a PDF and return the number of vectors upserted.
+
+        Chunks already listed in the document's manifest with the same content
+        hash are not embedded again, and vectors for chunks that disappeared
+        are deleted, so a re-sync only costs the size of the diff. The hash
+        covers the chunk text only; unchanged chunks that moved to another
+        page or position just get their page and chunk_index metadata updated.
+        """
+        namespace = f"user_{user_id}"
+        manifest = {
+            chunk.vector_id: chunk
+            for chunk in (await self.db.execute(
+                select(DocumentChunkModel).filter(DocumentChunkModel.document_id == document_id)
+            )).scalars()
+        }
+        if not manifest:
+            # Vectors from before the manifest existed use positional ids, clear them first
+            try:
+                await asyncio.to_thread(vector_store.delete_vectors, namespace, {"document_id": document_id})
+            except Exception as e:
+                print(f"WARNING: Failed to clear previous vectors for document {document_id}: {e}")
+            if lexical_index is not None:
+                await asyncio.to_thread(lexical_index.delete_document, user_id, document_id)
+
+        # Documents ingested before the keyword index existed get their unchanged chunks indexed too
+        lexical_backfill = None
+        if lexical_index is not None and manifest and not await asyncio.to_thread(lexical_index.has_document, user_id, document_id):
+            lexical_backfill = []
+
+        seen = set()
+        moved = []
+        doc = await asyncio.to_thread(pymupdf.open, path)
+        try:
+            upserted = await self._run_pipeline(self._iter_pages(doc), document_id, user_id, namespace, manifest, seen, lexical_backfill, moved)
+        finally:
+            doc.close()
+
+        if moved:
+            # Citations and neighbour dedupe (dedupe_overlapping) read page and chunk_index from the indexes
+            await asyncio.to_thread(vector_store.update_metadata, namespace, {
+                chunk["vector_id"]: {"page": chunk["page"], "chunk_index": chunk["chunk_index"]} for chunk in moved
+            })
+            if lexical_index is not None and lexical_backfill is None:
+                await asyncio.to_thread(lexical_index.add_chunks, user_id, document_id, moved)
+        if lexical_backfill:
+            await asyncio.to_thread(lexical_index.add_chunks, user_id, document_id, lexical_backfill)
+
+        stale_ids = [vector_id for vector_id in manifest if vector_id not in seen]
+        if stale_ids:
+            await asyncio.to_thread(vector_store.delete_vectors, namespace, ids=stale_ids)
+            if lexical_index is not None:
+                await asyncio.to_thread(lexical_index.delete_chunks, user_id, stale_ids)
+            await self.db.execute(delete(DocumentChunkModel).filter(
+                DocumentChunkModel.document_id == document_id,
+                DocumentChunkModel.vector_id.in_(stale_ids)
+            ))
+        await self.db.commit()
+
+        if not seen:
+            print("ERROR: Could not extract any content from PDF")
+        print(f"DEBUG: Document {document_id}: {upserted} vectors upserted, {len(seen) - upserted} unchanged ({len(moved)} moved), {len(stale_ids)} deleted")
+        return upserted
+
+    async def _iter_pages(self, doc) -> AsyncIterator[tuple[int, str]]:
+        """Yield (page number, text) in page order.
+
+        Pages with a text layer use ``page.get_text()``. Image-only pages are
+        rendered and transcribed concurrently while reading continues up to
+        OCR_LOOKAHEAD_PAGES ahead; results are released in page order. A failed
+        transcription fails the sync (the job is retried) rather than dropping
+        the page, which would delete its already ingested chunks as stale.
+        """
+        semaphore = asyncio.Semaphore(settings.OCR_MAX_CONCURRENCY)
+        pending = deque()
+
+        async def ocr_page(page_number: int, image_bytes: bytes) -> str:
+            async with semaphore:
+                try:
+                    print(f"DEBUG: Transcribing image-only page {page_number}")
+                    return await asyncGemAI.generate_content_with_image(image_bytes, OCR_PAGE_PROMPT)
+                except Exception as e:
+                    print(f"ERROR: OCR failed for page {page_number}: {e}")
+                    raise
+
+        def is_ready(item) -> bool:
+            return not isinstance(item[1], asyncio.Future) or item[1].done()
+
+        async def resolve(item) -> tuple[int, str]:
+            page_number, content = item
+            if isinstance(content, asyncio.Future):
+                content = await content
+            return page_number, content
+
+        try:
+            for page_number in range(1, doc.page_count + 1):
+                page_text = await asyncio.to_thread(self._page_text, doc, page_number)
+                if page_text.strip():
+                    pending.append((page_number, page_text))
+                else:
+                    image_bytes = await asyncio.to_thread(self._render_page, doc, page_number)
+                    pending.append((page_number, asyncio.ensure_future(ocr_page(page_number, image_bytes))))
+
+                while pending and (is_ready(pending[0]) or len(pending) >= settings.OCR_LOOKAHEAD_PAGES):
+                    page_number, content = await resolve(pending.popleft())
+                    if content.strip():
+                        yield page_number, content
+
+            while pending:
+                page_number, content = await resolve(pending.popleft())
+                if content.strip():
+                    yield page_number, content
+        finally:
+            for _, content in pending:
+                if isinstance(content, asyncio.Future):
+                    content.cancel()
+
+    async def _record_chunks(self, document_id: int, vectors: list[dict]):
+        self.db.add_all([
+            DocumentChunkModel(
+                document_id=document_id,
+                vector_id=vector["id"],
+                content_hash=vector["metadata"]["content_hash"],
+                page=vector["metadata"]["page"],
+                chunk_index=vector["metadata"]["chunk_index"]
+            )
+            for vector in vectors
+        ])
+        await self.db.commit()
+
+    @staticmethod
+    def _page_text(doc, page_number: int) -> str:
+        return doc[page_number - 1].get_text()
+
+    @staticmethod
+    def _render_page(doc, page_number: int) -> bytes:
+        return doc[page_number - 1].get_pixmap(dpi=settings.OCR_DPI).tobytes("png")
+
+    async def _index_lexical(self, user_id: int, document_id: int, vectors: list[dict]):
+        if lexical_index is None:
+            return
+        await asyncio.to_thread(lexical_index.add_chunks, user_id, document_id, [
+            {
+                "vector_id": vector["id"],
+                "text": vector["metadata"]["text"],
+                "page": vector["metadata"]["page"],
+                "chunk_index": vector["metadata"]["chunk_index"]
+            }
+            for vector in vectors
+        ])
+
+    async def _run_pipeline(self, pages: AsyncIterator[tuple[int, str]], document_id: int, user_id: int, namespace: str, manifest: dict, seen: set, lexical_backfill: list | None = None, moved: list | None = None) -> int:
+        embed_queue = asyncio.Queue(maxsize=settings.INGEST_QUEUE_SIZE)
+        upsert_queue = asyncio.Queue(maxsize=settings.INGEST_QUEUE_SIZE)
+        embed_workers = settings.EMBEDDING_MAX_CONCURRENCY
+        upsert_workers = settings.VECTOR_UPSERT_MAX_IN_FLIGHT
+        # The upsert workers share self.db, an AsyncSession must not run two commits at once
+        record_lock = asyncio.Lock()
+
+        async def chunk_stage():
+            batch = []
+            chunk_counter = itertools.count()
+            occurrences = {}
+            async for page_number, page_text in pages:
+                for text in self.text_splitter.split_text(page_text):
+                    if not text.strip():
+                        continue
+                    chunk_index = next(chunk_counter)
+                    # No page number in the hash, inserting a page mustn't re-embed everything after it
+                    content_hash = hashlib.sha256(text.encode("utf-8")).hexdigest()
+                    # Identical chunks (repeated boilerplate) still need distinct ids
+                    occurrence = occurrences.get(content_hash, 0)
+                    occurrences[content_hash] = occurrence + 1
+                    vector_id = f"doc_{document_id}_{content_hash[:32]}_{occurrence}"
+                    seen.add(vector_id)
+                    if vector_id in manifest:
+                        chunk = {"vector_id": vector_id, "text": text, "page": page_number, "chunk_index": chunk_index}
+                        entry = manifest[vector_id]
+                        if (entry.page, entry.chunk_index) != (page_number, chunk_index):
+                            entry.page, entry.chunk_index = page_number, chunk_index
+                            if moved is not None:
+                                moved.append(chunk)
+                        if lexical_backfill is not None:
+                            lexical_backfill.append(chunk)
+                        continue
+                    batch.append((vector_id, content_hash, chunk_index, page_number, text))
+                    if len(batch) >= settings.EMBEDDING_BATCH_SIZE:
+                        await embed_queue.put(batch)
+                        batch = []
+            if batch:
+                await embed_queue.put(batch)
+            for _ in range(embed_workers):
+                await embed_queue.put(_DONE)
+
+        async def embed_stage():
+            while (batch := await embed_queue.get()) is not _DONE:
+                embeddings = await asyncGemAI.create_embeddings([text for *_, text in batch])
+                await upsert_queue.put([
+                    {
+                        "id": vector_id,
+                        "values": embedding,
+                        "metadata": {
+                            "document_id": document_id,
+                            "user_id": user_id,
+                            "text": text, # The actual text
+                            "page": page_number,
+                            "chunk_index": chunk_index,
+                            "content_hash": content_hash
+                        }
+                    }
+                    for (vector_id, content_hash, chunk_index, page_number, text), embedding in zip(batch, embeddings)
+                ])
+
+        async def upsert_stage() -> int:
+            upserted = 0
+            while (vectors := await upsert_queue.get()) is not _DONE:
+                upserted += await upsert_vectors_pipelined(vectors, namespace=namespace, max_in_flight=1)
+                # Record each batch as soon as it is stored so a retried sync skips it
+                async with record_lock:
+                    await self._record_chunks(document_id, vectors)
+                    await self._index_lexical(user_id, document_id, vectors)
+            return upserted
+
+        chunk_task = asyncio.ensure_future(chunk_stage())
+        embed_tasks = [asyncio.ensure_future(embed_stage()) for _ in range(embed_workers)]
+        upsert_tasks = [asyncio.ensure_future(upsert_stage()) for _ in range(upsert_workers)]
+
+        async def close_upsert_queue():
+            await asyncio.gather(chunk_task, *embed_tasks)
+            for _ in range(upsert_workers):
+                await upsert_queue.put(_DONE)
+
+        tasks = [chunk_task, *embed_tasks, asyncio.ensure_future(close_upsert_queue()), *upsert_tasks]
+        try:
+            await asyncio.gather(*tasks)
+        except BaseException:
+            # One failing stage would leave the others blocked on their queues
+            for task in tasks:
+                task.cancel()
+            raise
+        return sum(task.result() for task in upsert_tasks)
@@ -0,0 +1,134 @@
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import select, update, or_, and_, exists
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased
+from fastapi import Depends
+from app.core.db import get_async_db
+from app.core.config import settings
+from app.migrations.jobs import DocumentJob as DocumentJobModel
+
+
+class JobService:
+    def __init__(self, db: AsyncSession = Depends(get_async_db)):
+        self.db = db
+
+    async def enqueue_sync(self, user_id: int, document_id: int) -> DocumentJobModel:
+        """Queue a sync job for a document, reusing the queued one if there is one.
+
+        A running job is not reused: the document may have changed after it
+        started, so a follow-up job is queued and runs once it finishes.
+        """
+        job = (await self.db.execute(
+            select(DocumentJobModel).filter(
+                DocumentJobModel.document_id == document_id,
+                DocumentJobModel.status == "queued"
+            )
+        )).scalars().first()
+        if job:
+            return job
+
+        job = DocumentJobModel(user_id=user_id, document_id=document_id, status="queued", attempts=0)
+        self.db.add(job)
+        await self.db.commit()
+        await self.db.refresh(job)
+        return job
+
+    async def enqueue_sync_many(self, user_id: int, document_ids: list[int]) -> list[DocumentJobModel]:
+        """enqueue_sync for a batch of documents with one lookup and one commit, jobs in ``document_ids`` order"""
+        if not document_ids:
+            return []
+        queued = {
+            job.document_id: job
+            for job in (await self.db.execute(
+                select(DocumentJobModel).filter(
+                    DocumentJobModel.document_id.in_(document_ids),
+                    DocumentJobModel.status == "queued"
+                )
+            )).scalars()
+        }
+        new_jobs = {
+            document_id: DocumentJobModel(user_id=user_id, document_id=document_id, status="queued", attempts=0)
+            for document_id in dict.fromkeys(document_ids) if document_id not in queued
+        }
+        self.db.add_all(new_jobs.values())
+        await self.db.commit()
+        return [queued.get(document_id) or new_jobs[document_id] for document_id in document_ids]
+
+    async def claim_next(self) -> DocumentJobModel | None:
+        """Lock the oldest runnable job and mark it as running.
+
+        Uses SELECT ... FOR UPDATE SKIP LOCKED so several workers can poll the
+        same table without picking up the same job. A document is never synced
+        by two workers at once.
+        """
+        now = datetime.now(timezone.utc)
+        stale_before = now - timedelta(seconds=settings.SYNC_JOB_LOCK_TIMEOUT)
+        running = aliased(DocumentJobModel)
+        document_busy = exists().where(
+            running.document_id == DocumentJobModel.document_id,
+            running.id != DocumentJobModel.id,
+            running.status == "running",
+            running.locked_at >= stale_before,
+        )
+        stmt = select(DocumentJobModel).filter(
+            or_(
+                and_(DocumentJobModel.status == "queued", DocumentJobModel.run_after <= now, ~document_busy),
+                and_(DocumentJobModel.status == "running", DocumentJobModel.locked_at < stale_before),
+            )
+        ).order_by(DocumentJobModel.run_after, DocumentJobModel.id).limit(1).with_for_update(skip_locked=True, of=DocumentJobModel)
+
+        job = (await self.db.execute(stmt)).scalars().first()
+        if not job:
+            await self.db.rollback()
+            return None
+        job.status = "running"
+        job.attempts += 1
+        job.locked_at = now
+        await self.db.commit()
+        await self.db.refresh(job)
+        return job
+
+    @staticmethod
+    def _owned(job_id: int, attempts: int):
+        # A reclaimed job is claimed again with attempts + 1, so (id, attempts) identifies one claim
+        return and_(DocumentJobModel.id == job_id, DocumentJobModel.status == "running", DocumentJobModel.attempts == attempts)
+
+    async def heartbeat(self, job_id: int, attempts: int) -> bool:
+        """Refresh locked_at of a running job, False when this claim no longer owns it"""
+        result = await self.db.execute(
+            update(DocumentJobModel).where(self._owned(job_id, attempts)).values(locked_at=datetime.now(timezone.utc))
+        )
+        await self.db.commit()
+        return result.rowcount > 0
+
+    async def mark_done(self, job: DocumentJobModel) -> bool:
+        """Mark the claimed job done, False (and nothing written) when another worker took it over"""
+        result = await self.db.execute(
+            update(DocumentJobModel).where(self._owned(job.id, job.attempts)).values(status="done", last_error=None, locked_at=None)
+        )
+        await self.db.commit()
+        return result.rowcount > 0
+
+    async def mark_failed(self, job_id: int, attempts: int, error: str) -> bool:
+        """Record a failure and requeue with exponential backoff until attempts run out.
+
+        Takes the id and re-selects the row, so it works whatever state the
+        session that claimed the job was left in. Returns False without
+        writing when the claim (``attempts``) no longer owns the job.
+        """
+        await self.db.rollback()
+        job = (await self.db.execute(
+            select(DocumentJobModel).filter(self._owned(job_id, attempts)).with_for_update().execution_options(populate_existing=True)
+        )).scalars().first()
+        if job is None:
+            await self.db.rollback()
+            return False
+        job.last_error = error
+        job.locked_at = None
+        if job.attempts >= settings.SYNC_JOB_MAX_ATTEMPTS:
+            job.status = "failed"
+        else:
+            job.status = "queued"
+            job.run_after = datetime.now(timezone.utc) + timedelta(seconds=30 * (2 ** (job.attempts - 1)))
+        await self.db.commit()
+        return True
@@ -1,8 +1,10 @@
-from sqlalchemy.orm import Session
+import asyncio
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi import Depends, HTTPException, status
 from app.core.security import get_password_hash
 from app.models.users import User, UserRegisterModel, UserLoginModel
-from app.core.db import get_db
+from app.core.db import get_async_db
 from app.migrations.users import User as UserModel
 from app.core.security import verify_password
 from datetime import timedelta
@@ -10,30 +12,34 @@ from app.core.config import settings
 from app.core.security import create_access_token
 
 class UserService:
-    def __init__(self, db: Session = Depends(get_db)):
+    def __init__(self, db: AsyncSession = Depends(get_async_db)):
         self.db = db
     
-    def get_users(self, limit: int = 100, offset: int = 0) -> list[User]:
-        return self.db.query(UserModel).limit(limit).offset(offset).all()
+    async def get_users(self, limit: int = 100, offset: int = 0) -> list[User]:
+        return (await self.db.execute(select(UserModel).limit(limit).offset(offset))).scalars().all()
 
-    def register(self, user_in: UserRegisterModel):
-        user_exists = self.db.query(UserModel).filter(UserModel.email == user_in.email).first()
+    async def get_user_by_email(self, email: str) -> UserModel | None:
+        return (await self.db.execute(select(UserModel).filter(UserModel.email == email))).scalars().first()
+
+    async def register(self, user_in: UserRegisterModel):
+        user_exists = await self.get_user_by_email(user_in.email)
         if user_exists:
             raise HTTPException(status_code=409, detail="User already exists")
         
         try:
-            hashed_pw = get_password_hash(user_in.password)
+            # Password hashing is CPU bound, keep it off the event loop
+            hashed_pw = await asyncio.to_thread(get_password_hash, user_in.password)
             db_user = UserModel(email=user_in.email, hashed_password=hashed_pw)
             self.db.add(db_user)
-            self.db.commit()
-            self.db.refresh(db_user)
+            await self.db.commit()
+            await self.db.refresh(db_user)
         except Exception as e:
             raise HTTPException(status_code=500, detail=str(e))
         return "success"
 
-    def login(self, user_in: UserLoginModel):
-        user = self.db.query(UserModel).filter(UserModel.email == user_in.email).first()
-        if not user or not verify_password(user_in.password, user.hashed_password):
+    async def login(self, user_in: UserLoginModel):
+        user = await self.get_user_by_email(user_in.email)
+        if not user or not await asyncio.to_thread(verify_password, user_in.password, user.hashed_password):
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Incorrect email or password",
@@ -42,6 +48,6 @@ class UserService:
         
         access_token_expires = timedelta(minutes=settings.EXPIRE_JWT_KEY)
         access_token = create_access_token(
-            data={"sub": str(user.id)}, expires_delta=access_token_expires
+            data={"sub": str(user.id), "email": user.email}, expires_delta=access_token_expires
         )
-        return {"access_token": access_token}
\ No newline at end of file
+        return {"access_token": access_token}
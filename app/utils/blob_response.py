@@ -0,0 +1,83 @@
+import asyncio
+import re
+from email.utils import format_datetime
+from urllib.parse import quote
+
+from fastapi import HTTPException, Request
+from fastapi.responses import Response, StreamingResponse
+
+from app.core.storage_base import BlobStorage
+
+
+def parse_range(header: str | None, size: int) -> tuple[int, int] | None:
+    """Single 'bytes=' range as inclusive (start, end), None to serve the whole file.
+
+    Malformed and multi-range headers are ignored, which RFC 9110 allows;
+    a range starting past the end is a 416.
+    """
+    if not header:
+        return None
+    match = re.fullmatch(r"\s*bytes=(\d*)-(\d*)\s*", header)
+    if not match or match.group(1) == match.group(2) == "":
+        return None
+    first, last = match.groups()
+    if first == "":
+        # Suffix range: the last N bytes
+        length = int(last)
+        if length == 0 or size == 0:
+            raise HTTPException(status_code=416, headers={"Content-Range": f"bytes */{size}"})
+        return max(0, size - length), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        raise HTTPException(status_code=416, headers={"Content-Range": f"bytes */{size}"})
+    return start, end
+
+
+def _etag_matches(header: str, etag: str) -> bool:
+    # Weak comparison, as If-None-Match requires
+    tags = [tag.strip().removeprefix("W/") for tag in header.split(",")]
+    return "*" in tags or etag.removeprefix("W/") in tags
+
+
+async def blob_response(request: Request, storage: BlobStorage, key: str, filename: str, media_type: str) -> Response:
+    """Serve a stored file with ETag revalidation (304) and single byte ranges (206).
+
+    PDF viewers fetch pages with Range requests and revalidate with
+    If-None-Match, so neither pulls the whole file again. Works the same on
+    every storage backend.
+    """
+    info = await asyncio.to_thread(storage.stat, key)
+    if info is None:
+        raise HTTPException(status_code=404, detail="File not found")
+
+    quoted = quote(filename)
+    disposition = f'attachment; filename="{filename}"' if quoted == filename else f"attachment; filename*=utf-8''{quoted}"
+    headers = {
+        "ETag": info.etag,
+        "Accept-Ranges": "bytes",
+        # Private documents, always revalidated, a matching ETag makes that a 304
+        "Cache-Control": "private, no-cache",
+        "Content-Disposition": disposition,
+    }
+    if info.last_modified is not None:
+        headers["Last-Modified"] = format_datetime(info.last_modified, usegmt=True)
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and _etag_matches(if_none_match, info.etag):
+        return Response(status_code=304, headers={k: v for k, v in headers.items() if k != "Content-Disposition"})
+
+    byte_range = parse_range(request.headers.get("range"), info.size)
+    if_range = request.headers.get("if-range")
+    if byte_range is not None and if_range and if_range.strip() not in (info.etag, headers.get("Last-Modified")):
+        # The client's partial copy is outdated, it needs the whole file
+        byte_range = None
+
+    if byte_range is None:
+        headers["Content-Length"] = str(info.size)
+        return StreamingResponse(storage.iter_range(key), media_type=media_type, headers=headers)
+
+    start, end = byte_range
+    headers["Content-Range"] = f"bytes {start}-{end}/{info.size}"
+    headers["Content-Length"] = str(end - start + 1)
+    return StreamingResponse(storage.iter_range(key, start, end), status_code=206, media_type=media_type, headers=headers)
@@ -1,14 +1,53 @@
+import string
+
+from app.core.cache import LRUCache
 from app.models.ai_analysis import AIAnalysisDTO
 
 
-def get_document_prompt(context: str, question: str):
-    return """
+class PromptTemplate:
+    """A prompt template parsed once into literal segments and field names.
+
+    ``key`` (name@version) identifies the wording in errors, bump the version
+    whenever the text changes. Cached Gemini results are keyed by the rendered
+    prompt's hash, so a changed wording never serves an old result.
+    """
+
+    def __init__(self, name: str, version: int, text: str):
+        self.name = name
+        self.version = version
+        self.text = text
+        self._parts = []
+        for literal, field, format_spec, conversion in string.Formatter().parse(text):
+            if format_spec or conversion:
+                raise ValueError(f"Prompt {name} uses format specs, only plain {{field}} is supported")
+            self._parts.append((literal, field))
+        self.fields = {field for _, field in self._parts if field}
+
+    @property
+    def key(self) -> str:
+        return f"{self.name}@{self.version}"
+
+    def render(self, **values) -> str:
+        missing = self.fields - values.keys()
+        if missing:
+            raise KeyError(f"Prompt {self.key} is missing {sorted(missing)}")
+        return "".join(
+            literal + (str(values[field]) if field else "")
+            for literal, field in self._parts
+        )
+
+
+def register_prompt(name: str, version: int, text: str) -> PromptTemplate:
+    return PromptTemplate(name, version, text)
+
+
+_DOCUMENT_CHAT_INSTRUCTIONS = """
         You are Kontrakwise AI. Use the provided context to answer the question.
 
         REASONING INSTRUCTIONS:
-        1. If the user asks about something NOT mentioned (like gym memberships or lunch money), 
+        1. If the user asks about something NOT mentioned (like gym memberships or lunch money),
         explicitly state: "The contract is silent on this matter." in their language
-        2. If the user asks for a calculation (like a notice period), find the relevant 
+        2. If the user asks for a calculation (like a notice period), find the relevant
         clause and apply it to their situation.
         3. If the user asks for legal advice, clarify that you are an AI assistant to help analyze the document, not a lawyer.
 
@@ -21,7 +60,7 @@ def get_document_prompt(context: str, question: str):
 
         RESPONSE FORMAT:
         If citations are needed:
-        
+
         ANSWER: [Your professional legal answer here]
         ---
         EVIDENCE:
@@ -29,26 +68,84 @@ def get_document_prompt(context: str, question: str):
         - Page [Number]: "[Exact sentence from text]"
 
         If no citations are needed:
-        
+
         ANSWER: [Your professional legal answer here]
 
+"""
+
+DOCUMENT_PROMPT = register_prompt("document_chat", 1, _DOCUMENT_CHAT_INSTRUCTIONS + """        CONTEXT:
+        {context}
+
+        QUESTION:
+        {question}
+        """)
+
+# Same instructions with the session's running summary and recent turns
+DOCUMENT_SESSION_PROMPT = register_prompt("document_chat_session", 1, _DOCUMENT_CHAT_INSTRUCTIONS + """        CONVERSATION SO FAR (use it to understand follow-up questions, the answer must still come from the CONTEXT):
+        {conversation}
+
         CONTEXT:
         {context}
 
-        QUESTION: 
+        QUESTION:
         {question}
-        """.format(context=context, question=question)
+        """)
 
-def get_summarization_prompt(document_type_name: str, document_type_description: str, list_of_rules: list[dict]):
-    # 1. Format the rules list
-    formatted_rules_list = "\n".join([
-        f"- Rule: {r['clause']} - {r['criteria']} (Severity: {r['severity']})"
-        for r in list_of_rules
-    ])
+# Questions across several documents, every source is tagged with its document id
+MULTI_DOCUMENT_PROMPT = register_prompt("multi_document_chat", 1, """
+        You are Kontrakwise AI. The context below contains excerpts from SEVERAL of the user's documents,
+        each source is labelled with its document id, filename and page. Use it to answer the question.
+
+        REASONING INSTRUCTIONS:
+        1. When the question is about the documents as a group (e.g. "which contracts auto-renew?"), go through
+        every document in the context and name each relevant one by its filename.
+        2. If none of the excerpts mention what is asked, explicitly state: "None of the documents address this matter." in their language
+        3. Never attribute a clause from one document to another.
+        4. If the user asks for legal advice, clarify that you are an AI assistant to help analyze the documents, not a lawyer.
+
+        STRICT RULES:
+        1. Base your answer ONLY on the context.
+        2. If the question cannot be answered using the provided CONTEXT (e.g., general knowledge or politics), politely decline to answer.
+        3. For every source used, identify the EXACT sentence or short paragraph that contains the evidence, with its document id and page.
+        4. Citations are OPTIONAL - omit the EVIDENCE section entirely if the question doesn't need specific evidence.
+
+        RESPONSE FORMAT:
+        If citations are needed:
+
+        ANSWER: [Your professional legal answer here]
+        ---
+        EVIDENCE:
+        - Document [Id], Page [Number]: "[Exact sentence from text]"
+        - Document [Id], Page [Number]: "[Exact sentence from text]"
+
+        If no citations are needed:
+
+        ANSWER: [Your professional legal answer here]
+
+        CONVERSATION SO FAR:
+        {conversation}
+
+        CONTEXT:
+        {context}
+
+        QUESTION:
+        {question}
+        """)
+
+CHAT_SUMMARY_PROMPT = register_prompt("chat_history_summary", 1, """
+    You maintain a running summary of a conversation between a user and Kontrakwise AI about a legal document.
+    Update the summary with the new messages below. Keep the facts, figures, clause and page references and
+    open questions the user may follow up on; drop pleasantries. Write at most 150 words, plain text only.
 
-    # 2. Use a raw string or clean indentation
-    # Use double {{ }} for the JSON structure so .format() ignores them
-    prompt_template = """
+    CURRENT SUMMARY:
+    {summary}
+
+    NEW MESSAGES:
+    {messages}
+    """)
+
+# Use double {{ }} for JSON structures so they stay literal
+SUMMARIZATION_PROMPT = register_prompt("document_summarization", 1, """
         Act as a Senior Legal Auditor and Risk Management Expert. Your task is to analyze the provided legal document based on a set of predefined rules and determine the overall risk profile.
 
         ### DOCUMENT CONTEXT:
@@ -70,62 +167,99 @@ def get_summarization_prompt(document_type_name: str, document_type_description:
         - LOW: Assigned if the document follows all rules with no significant impact.
 
         ### DOCUMENT TEXT TO ANALYZE:
-        """
-
-    # 3. Format the prompt
-    final_prompt = prompt_template.format(
-        doc_type=document_type_name,
-        doc_desc=document_type_description,
-        rules_list=formatted_rules_list
-    )
-    
-    return final_prompt
-
-def get_analysis_prompt(analysis_dto: AIAnalysisDTO):
-    # 1. Format Rules dengan lebih ketat
-    formatted_rules = "\n".join([
-        f"- [RULE: {r.rules}]: {r.description}" 
-        for r in analysis_dto.ai_rules
-    ])
+        """)
 
-    # 2. Gunakan Persona agar tidak kena "Legal Advice Filter"
-    # Kita sebut AI sebagai "Document Auditor" bukan "Legal Advisor"
-    base_prompt = f"""
+# Persona "Document Auditor" instead of "Legal Advisor" to avoid the legal advice filter,
+# and strict JSON output (no markdown) for the frontend
+ANALYSIS_PROMPT = register_prompt("document_analysis", 1, """
     Role: You are a Professional Document Auditor (Kontrakwise AI).
     Task: Extract data and identify inconsistencies based on specific rules.
-    Document Type Context: {analysis_dto.analysis_type}
+    Document Type Context: {analysis_type}
 
     ## Operational Rules:
-    {formatted_rules}
-    
+    {rules_list}
+
     ## User Instructions:
-    {analysis_dto.custom_prompt or "Perform a standard audit."}
+    {custom_prompt}
 
     ## Critical Instructions:
     1. Base your analysis ONLY on the provided text.
     2. If a rule is violated or a risk is found, quote the specific sentence/section.
     3. Categorize severity as High (Financial loss/Legal void), Medium (Operational burden), or Low (Info).
-    """
 
-    # 3. Paksa Output JSON Murni (Tanpa Markdown)
-    # Ini sangat penting untuk integrasi Frontend/React Flow
-    base_prompt += """
     ## Output Format (Strict JSON):
     Return ONLY a JSON object with this structure:
-    {
+    {{
       "executive_summary": "string",
       "findings": [
-        {
+        {{
           "rule_name": "string",
           "evidence": "quote from document",
           "risk_level": "High/Medium/Low",
           "explanation": "string",
           "mitigation": "string"
-        }
+        }}
       ],
       "overall_risk_score": 1-10
-    }
+    }}
+    """)
+
+
+# document type id -> (risk_rules as stored, rendered rule block)
+rules_block_cache = LRUCache(maxsize=1024)
+
+
+def format_risk_rules(list_of_rules: list[dict]) -> str:
+    return "\n".join([
+        f"- Rule: {r['clause']} - {r['criteria']} (Severity: {r['severity']})"
+        for r in list_of_rules
+    ])
+
+
+def get_rules_block(document_type) -> str:
+    """Rendered rule list for a DocumentType, formatted once per rule set.
+
+    The stored rules are kept next to the block, so a type edited by another
+    process is re-rendered here too instead of serving a stale block.
     """
-    
-    return base_prompt.strip()
-    
\ No newline at end of file
+    cached = rules_block_cache.get(document_type.id)
+    if cached is not None and cached[0] == document_type.risk_rules:
+        return cached[1]
+    block = format_risk_rules(document_type.risk_rules or [])
+    rules_block_cache.set(document_type.id, (document_type.risk_rules, block))
+    return block
+
+
+def invalidate_rules_block(document_type_id: int):
+    rules_block_cache.delete(document_type_id)
+
+
+def get_document_prompt(context: str, question: str, conversation: str | None = None):
+    if conversation:
+        return DOCUMENT_SESSION_PROMPT.render(context=context, question=question, conversation=conversation)
+    return DOCUMENT_PROMPT.render(context=context, question=question)
+
+def get_multi_document_prompt(context: str, question: str, conversation: str | None = None):
+    return MULTI_DOCUMENT_PROMPT.render(context=context, question=question, conversation=conversation or "(new conversation)")
+
+def get_chat_summary_prompt(summary: str, messages: str):
+    return CHAT_SUMMARY_PROMPT.render(summary=summary or "(none yet)", messages=messages)
+
+def get_document_type_summarization_prompt(document_type):
+    """Summarization prompt for a DocumentType using the cached rule block"""
+    return SUMMARIZATION_PROMPT.render(
+        doc_type=document_type.name,
+        doc_desc=document_type.description or "",
+        rules_list=get_rules_block(document_type)
+    )
+
+def get_analysis_prompt(analysis_dto: AIAnalysisDTO):
+    formatted_rules = "\n".join([
+        f"- [RULE: {r.rules}]: {r.description}"
+        for r in analysis_dto.ai_rules
+    ])
+    return ANALYSIS_PROMPT.render(
+        analysis_type=analysis_dto.analysis_type,
+        rules_list=formatted_rules,
+        custom_prompt=analysis_dto.custom_prompt or "Perform a standard audit."
+    ).strip()
@@ -0,0 +1,179 @@
+import math
+import re
+
+from app.core.config import settings
+from app.core.vector_store_base import QueryMatch
+
+
+def reciprocal_rank_fusion(result_lists: list[list[QueryMatch]], k: int = 60, top_k: int = 5) -> list[QueryMatch]:
+    """Merge ranked lists by summing 1 / (k + rank) per id.
+
+    Only ranks are used, so BM25 scores and cosine similarities don't need to
+    be on the same scale. The fused score replaces the original one.
+    """
+    scores: dict[str, float] = {}
+    matches: dict[str, QueryMatch] = {}
+    for results in result_lists:
+        for rank, match in enumerate(results, start=1):
+            scores[match.id] = scores.get(match.id, 0.0) + 1.0 / (k + rank)
+            # Keep the first copy seen, earlier lists win on metadata
+            matches.setdefault(match.id, match)
+    ranked = sorted(scores, key=scores.get, reverse=True)[:top_k]
+    return [QueryMatch(id=match_id, score=scores[match_id], metadata=matches[match_id].metadata) for match_id in ranked]
+
+
+def estimate_tokens(text: str) -> int:
+    # Roughly 4 characters per token for English/Indonesian legal text, avoids a count_tokens round trip
+    return max(1, len(text) // 4)
+
+
+def _overlap_length(left: str, right: str, max_overlap: int = 300, min_overlap: int = 20) -> int:
+    """Length of the longest suffix of ``left`` that is also a prefix of ``right``"""
+    for size in range(min(len(left), len(right), max_overlap), min_overlap - 1, -1):
+        if left.endswith(right[:size]):
+            return size
+    return 0
+
+
+def dedupe_overlapping(matches: list[QueryMatch], similarity: float = 0.8) -> list[QueryMatch]:
+    """Drop near-duplicate chunks and trim the text shared with neighbouring chunks.
+
+    The splitter repeats up to ``chunk_overlap`` characters between
+    consecutive chunks; when both neighbours are kept that text would be sent
+    twice. Matches are processed in rank order so the better one keeps its text.
+    """
+    kept: list[QueryMatch] = []
+    kept_terms: list[set[str]] = []
+    for match in matches:
+        text = match.metadata.get("text", "")
+        terms = set(re.findall(r"\w+", text.lower()))
+        if any(terms and len(terms & other) / min(len(terms), len(other) or 1) >= similarity for other in kept_terms):
+            continue
+        chunk_index = match.metadata.get("chunk_index")
+        for other in kept:
+            if other.metadata.get("document_id") != match.metadata.get("document_id") or chunk_index is None:
+                continue
+            other_text = other.metadata.get("text", "")
+            if other.metadata.get("chunk_index") == chunk_index - 1:
+                text = text[_overlap_length(other_text, text):]
+            elif other.metadata.get("chunk_index") == chunk_index + 1:
+                overlap = _overlap_length(text, other_text)
+                text = text[:len(text) - overlap]
+        if not text.strip():
+            continue
+        kept.append(QueryMatch(id=match.id, score=match.score, metadata={**match.metadata, "text": text}))
+        kept_terms.append(terms)
+    return kept
+
+
+class LexicalOverlapScorer:
+    """Scores chunks by the IDF-weighted share of query terms they contain, no model needed"""
+
+    def score(self, query: str, texts: list[str]) -> list[float]:
+        query_terms = set(re.findall(r"\w+", query.lower()))
+        if not query_terms or not texts:
+            return [0.0] * len(texts)
+        text_terms = [set(re.findall(r"\w+", text.lower())) for text in texts]
+        # IDF over the candidate pool, so terms present in every candidate count for little
+        weights = {
+            term: math.log(1 + len(texts) / (1 + sum(term in terms for terms in text_terms)))
+            for term in query_terms
+        }
+        total = sum(weights.values()) or 1.0
+        return [sum(weight for term, weight in weights.items() if term in terms) / total for terms in text_terms]
+
+
+class CrossEncoderScorer:
+    """Scores (query, chunk) pairs with a local sentence-transformers cross-encoder"""
+
+    def __init__(self, model_name: str):
+        try:
+            from sentence_transformers import CrossEncoder
+        except ImportError as e:
+            raise Exception("RERANKER=cross-encoder requires sentence-transformers: pip install sentence-transformers") from e
+        self.model = CrossEncoder(model_name)
+
+    def score(self, query: str, texts: list[str]) -> list[float]:
+        if not texts:
+            return []
+        return [float(score) for score in self.model.predict([(query, text) for text in texts])]
+
+
+_scorer = None
+
+
+def get_scorer():
+    """Reranker selected by settings.RERANKER, built once per process; None disables reranking"""
+    global _scorer
+    if settings.RERANKER == "none":
+        return None
+    if _scorer is None:
+        if settings.RERANKER == "cross-encoder":
+            _scorer = CrossEncoderScorer(settings.RERANKER_MODEL)
+        else:
+            _scorer = LexicalOverlapScorer()
+    return _scorer
+
+
+def rerank(query: str, matches: list[QueryMatch], scorer=None) -> list[QueryMatch]:
+    """Order matches by the scorer, falling back to retrieval order on ties"""
+    if scorer is None or not matches:
+        return matches
+    scores = scorer.score(query, [match.metadata.get("text", "") for match in matches])
+    order = sorted(range(len(matches)), key=lambda i: (-scores[i], i))
+    return [QueryMatch(id=matches[i].id, score=scores[i], metadata=matches[i].metadata) for i in order]
+
+
+def pack_context(matches: list[QueryMatch], token_budget: int, max_chunks: int) -> list[QueryMatch]:
+    """Take the best matches until the token budget or ``max_chunks`` is reached.
+
+    A chunk that doesn't fit is skipped so a smaller one further down can
+    still use the remaining budget; the top match is always kept.
+    """
+    packed = []
+    used = 0
+    for match in matches:
+        if len(packed) >= max_chunks:
+            break
+        tokens = estimate_tokens(match.metadata.get("text", ""))
+        if packed and used + tokens > token_budget:
+            continue
+        packed.append(match)
+        used += tokens
+    return packed
+
+
+def select_context(query: str, candidates: list[QueryMatch]) -> list[QueryMatch]:
+    """Candidate pool -> dedupe -> rerank -> pack, as configured in settings"""
+    deduped = dedupe_overlapping(candidates)
+    reranked = rerank(query, deduped, get_scorer())
+    return pack_context(reranked, settings.CONTEXT_TOKEN_BUDGET, settings.RETRIEVAL_TOP_K)
+
+
+def select_multi_document_context(
+    query: str,
+    candidates_by_document: dict[int, list[QueryMatch]],
+    per_document_k: int,
+    token_budget: int,
+    max_chunks: int
+) -> list[QueryMatch]:
+    """Per-document quotas, then one shared budget.
+
+    Each document's pool is deduped and reranked on its own and cut to
+    ``per_document_k``. The survivors are taken round-robin (documents with
+    the strongest top chunk first) so every document gets its best chunk in
+    before any gets a second, and the result is grouped back per document.
+    """
+    scorer = get_scorer()
+    selected = []
+    for candidates in candidates_by_document.values():
+        ranked = rerank(query, dedupe_overlapping(candidates), scorer)[:per_document_k]
+        if ranked:
+            selected.append(ranked)
+    selected.sort(key=lambda ranked: -ranked[0].score)
+
+    interleaved = [ranked[i] for i in range(per_document_k) for ranked in selected if i < len(ranked)]
+    packed = pack_context(interleaved, token_budget, max_chunks)
+
+    order = {ranked[0].metadata.get("document_id"): position for position, ranked in enumerate(selected)}
+    return sorted(packed, key=lambda match: order.get(match.metadata.get("document_id"), len(order)))
@@ -0,0 +1,113 @@
+"""Background worker pool for the document sync state machine.
+
+Run with ``python -m app.worker``. Each worker process polls the
+``document_jobs`` table and drives ``DocumentService.sync_document`` through
+the ``pending -> extracted -> summarized`` transitions.
+"""
+import asyncio
+import multiprocessing
+import signal
+
+from fastapi import HTTPException
+from app.core.config import settings
+from app.core.db import AsyncSessionLocal
+from app.services.documents_service import DocumentService
+from app.services.job_service import JobService
+
+
+async def run_job(user_id: int, document_id: int):
+    async with AsyncSessionLocal() as db:
+        await DocumentService(db).sync_document(user_id, document_id)
+
+
+async def keep_alive(worker_id: int, job_id: int, attempts: int):
+    """Refresh the job's lock while it runs so it isn't reclaimed as stale, returns once the claim is lost"""
+    while True:
+        await asyncio.sleep(settings.SYNC_JOB_HEARTBEAT_INTERVAL)
+        try:
+            async with AsyncSessionLocal() as db:
+                if not await JobService(db).heartbeat(job_id, attempts):
+                    return
+        except Exception as e:
+            # Retried on the next beat, the lock only expires after SYNC_JOB_LOCK_TIMEOUT
+            print(f"Worker {worker_id} heartbeat for job {job_id} failed: {e}")
+
+
+async def worker_loop(worker_id: int, stopping: asyncio.Event):
+    print(f"Worker {worker_id} started")
+
+    while not stopping.is_set():
+        try:
+            async with AsyncSessionLocal() as db:
+                job_service = JobService(db)
+                job = await job_service.claim_next()
+                if not job:
+                    try:
+                        await asyncio.wait_for(stopping.wait(), timeout=settings.SYNC_WORKER_POLL_INTERVAL)
+                    except asyncio.TimeoutError:
+                        pass
+                    continue
+
+                job_id, attempts = job.id, job.attempts
+                print(f"Worker {worker_id} picked job {job_id} for document {job.document_id} (attempt {attempts})")
+                job_task = asyncio.ensure_future(run_job(job.user_id, job.document_id))
+                heartbeat = asyncio.ensure_future(keep_alive(worker_id, job_id, attempts))
+                try:
+                    await asyncio.wait({job_task, heartbeat}, return_when=asyncio.FIRST_COMPLETED)
+                finally:
+                    heartbeat.cancel()
+                if not job_task.done():
+                    # The heartbeat found another worker reclaimed the job, that one owns the sync now
+                    job_task.cancel()
+                    await asyncio.gather(job_task, return_exceptions=True)
+                    print(f"Worker {worker_id} lost job {job_id}, stopped it")
+                    continue
+                try:
+                    job_task.result()
+                    if await job_service.mark_done(job):
+                        print(f"Worker {worker_id} finished job {job_id}")
+                    else:
+                        print(f"Worker {worker_id} finished job {job_id} after losing it, result not recorded")
+                except Exception as e:
+                    error = e.detail if isinstance(e, HTTPException) else str(e)
+                    print(f"Worker {worker_id} job {job_id} failed: {error}")
+                    await job_service.mark_failed(job_id, attempts, str(error))
+        except Exception as e:
+            print(f"Worker {worker_id} error: {e}")
+            await asyncio.sleep(settings.SYNC_WORKER_POLL_INTERVAL)
+
+    print(f"Worker {worker_id} stopped")
+
+
+def run_worker(worker_id: int):
+    async def run():
+        stopping = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        # Finish the current job, then exit
+        for signum in (signal.SIGTERM, signal.SIGINT):
+            loop.add_signal_handler(signum, stopping.set)
+        await worker_loop(worker_id, stopping)
+
+    asyncio.run(run())
+
+
+def main():
+    # spawn so each worker builds its own engine and connection pool
+    context = multiprocessing.get_context("spawn")
+    processes = [
+        context.Process(target=run_worker, args=(worker_id,), name=f"sync-worker-{worker_id}")
+        for worker_id in range(settings.SYNC_WORKER_PROCESSES)
+    ]
+    for process in processes:
+        process.start()
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        # Workers received the signal too and stop after their current job
+        for process in processes:
+            process.join()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,11 @@
+import os
+import tempfile
+
+# Settings are read at import time, point everything at throwaway local backends
+_root = tempfile.mkdtemp(prefix="kontrakwise-tests-")
+os.environ.setdefault("GEMINI_API_KEY", "test")
+os.environ.setdefault("SECRET_JWT_KEY", "test-secret-key-that-is-long-enough-for-hs256")
+os.environ.setdefault("VECTOR_STORE_BACKEND", "local")
+os.environ.setdefault("LOCAL_VECTOR_STORE_PATH", os.path.join(_root, "vector_store"))
+os.environ.setdefault("LEXICAL_INDEX_PATH", os.path.join(_root, "lexical_index"))
+os.environ.setdefault("UPLOAD_PATH", os.path.join(_root, "storage"))
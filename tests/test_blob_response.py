@@ -0,0 +1,83 @@
+import os
+
+import pytest
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.testclient import TestClient
+
+from app.core.local_storage import LocalStorage
+from app.core.storage_base import blob_key
+from app.utils.blob_response import blob_response, parse_range
+
+CONTENT = bytes(range(256)) * 4
+KEY = blob_key("ab" * 32, ".pdf")
+
+
+@pytest.fixture
+def storage(tmp_path):
+    storage = LocalStorage(str(tmp_path))
+    _store(storage)
+    return storage
+
+
+@pytest.fixture
+def client(storage):
+    app = FastAPI()
+
+    @app.get("/file")
+    async def download(request: Request):
+        return await blob_response(request, storage, KEY, "contract.pdf", "application/pdf")
+
+    return TestClient(app)
+
+
+def _store(storage: LocalStorage):
+    staged = storage.staging_dir / "upload"
+    staged.write_bytes(CONTENT)
+    storage.put_file(KEY, str(staged))
+
+
+def test_parse_range():
+    assert parse_range(None, 100) is None
+    assert parse_range("bytes=0-9", 100) == (0, 9)
+    assert parse_range("bytes=90-", 100) == (90, 99)
+    assert parse_range("bytes=-10", 100) == (90, 99)
+    assert parse_range("bytes=50-500", 100) == (50, 99)
+    # Malformed and multi-range headers serve the whole file
+    assert parse_range("bytes=0-1,5-6", 100) is None
+    assert parse_range("items=0-1", 100) is None
+    with pytest.raises(HTTPException) as error:
+        parse_range("bytes=100-", 100)
+    assert error.value.status_code == 416
+
+
+def test_full_and_partial_downloads(client):
+    response = client.get("/file")
+    assert response.status_code == 200
+    assert response.content == CONTENT
+    assert response.headers["accept-ranges"] == "bytes"
+
+    response = client.get("/file", headers={"Range": "bytes=10-19"})
+    assert response.status_code == 206
+    assert response.content == CONTENT[10:20]
+    assert response.headers["content-range"] == f"bytes 10-19/{len(CONTENT)}"
+
+    assert client.get("/file", headers={"Range": f"bytes={len(CONTENT)}-"}).status_code == 416
+
+
+def test_etag_revalidation(client, storage):
+    etag = client.get("/file").headers["etag"]
+    assert client.get("/file", headers={"If-None-Match": etag}).status_code == 304
+    assert client.get("/file", headers={"If-None-Match": '"other"'}).status_code == 200
+
+    # An outdated If-Range gets the whole file instead of a range of the new one
+    response = client.get("/file", headers={"Range": "bytes=0-9", "If-Range": '"other"'})
+    assert response.status_code == 200 and response.content == CONTENT
+    assert client.get("/file", headers={"Range": "bytes=0-9", "If-Range": etag}).status_code == 206
+
+
+def test_storing_the_same_content_keeps_the_etag(client, storage):
+    etag = client.get("/file").headers["etag"]
+    os.utime(storage.local_path(KEY), ns=(0, 0))
+    _store(storage)
+    assert client.get("/file").headers["etag"] == etag
+    assert client.get("/file", headers={"If-None-Match": etag}).status_code == 304
@@ -0,0 +1,53 @@
+import asyncio
+from datetime import datetime
+
+from app.core.answer_cache import answer_cache
+from app.services.chat_service import ChatService
+from app.core.vector_store_base import QueryMatch
+
+
+class _CountingEmbedder:
+    def __init__(self):
+        self.calls = 0
+
+    async def create_query_embedding(self, query: str) -> list[float]:
+        self.calls += 1
+        return [1.0, 0.0]
+
+
+def _service(monkeypatch, shortcut):
+    service = ChatService(db=None)
+    service.asyncGemAI = _CountingEmbedder()
+
+    async def lexical_shortcut(user_id, document_id, query, top_k):
+        return shortcut
+
+    monkeypatch.setattr(service, "_lexical_shortcut", lexical_shortcut)
+    return service
+
+
+def test_shortcut_query_is_not_embedded(monkeypatch):
+    hit = QueryMatch(id="1-0", score=1.0, metadata={"text": "clause 4.2"})
+    service = _service(monkeypatch, [hit])
+    version = datetime(2026, 1, 1)
+    answer_cache.invalidate(101)
+
+    cached, query_vector, candidates = asyncio.run(service.get_cached_answer(1, 101, version, "What does clause 4.2 say?"))
+    assert (cached, query_vector, candidates) == (None, None, [hit])
+    assert service.asyncGemAI.calls == 0
+
+    service.cache_answer(101, version, "What does clause 4.2 say?", query_vector, {"response": "cached"})
+    cached, _, _ = asyncio.run(service.get_cached_answer(1, 101, version, "what does clause 4.2 say"))
+    assert cached == {"response": "cached"}
+    assert service.asyncGemAI.calls == 0
+
+
+def test_embedding_is_reused_when_retrieval_needs_it(monkeypatch):
+    service = _service(monkeypatch, None)
+    version = datetime(2026, 1, 1)
+    answer_cache.invalidate(102)
+
+    cached, query_vector, candidates = asyncio.run(service.get_cached_answer(1, 102, version, "Who are the parties?"))
+    assert cached is None and candidates is None
+    assert query_vector == [1.0, 0.0]
+    assert service.asyncGemAI.calls == 1
@@ -0,0 +1,89 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+
+from app.core.config import settings
+from app.services import chat_session_service
+from app.services.chat_session_service import ChatSessionService
+from app.migrations.chat import ChatSession, ChatMessage
+
+
+async def _fold_concurrently(tmp_path, monkeypatch, stale: bool) -> tuple[int, str | None]:
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'chat.db'}")
+    session_factory = async_sessionmaker(bind=engine, expire_on_commit=False)
+    async with engine.begin() as conn:
+        await conn.run_sync(ChatSession.__table__.create)
+        await conn.run_sync(ChatMessage.__table__.create)
+
+    start = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    async with session_factory() as db:
+        db.add(ChatSession(id="s1", user_id=1, title="t"))
+        db.add_all([
+            ChatMessage(id=f"m{i}", session_id="s1", role="user", message=f"q{i}", created_at=start + timedelta(seconds=i))
+            for i in range(settings.CHAT_HISTORY_WINDOW + settings.CHAT_SUMMARY_BATCH)
+        ])
+        await db.commit()
+
+    calls = []
+
+    async def generate_content(prompt):
+        calls.append(prompt)
+        await asyncio.sleep(0.05)
+        if stale:
+            # Another process folded while this summary was being generated
+            async with session_factory() as db:
+                session = await db.get(ChatSession, "s1")
+                session.summary, session.summary_until = "theirs", start
+                await db.commit()
+        return "ours"
+
+    monkeypatch.setattr(chat_session_service, "AsyncSessionLocal", session_factory)
+    monkeypatch.setattr(chat_session_service.asyncGemAI, "generate_content", generate_content)
+    await asyncio.gather(ChatSessionService.fold_history("s1"), ChatSessionService.fold_history("s1"))
+
+    async with session_factory() as db:
+        summary = (await db.get(ChatSession, "s1")).summary
+    await engine.dispose()
+    return len(calls), summary
+
+
+def test_concurrent_folds_run_once(tmp_path, monkeypatch):
+    assert asyncio.run(_fold_concurrently(tmp_path, monkeypatch, stale=False)) == (1, "ours")
+
+
+def test_fold_on_stale_history_is_dropped(tmp_path, monkeypatch):
+    assert asyncio.run(_fold_concurrently(tmp_path, monkeypatch, stale=True)) == (1, "theirs")
+
+
+async def _first_turn(tmp_path, monkeypatch, fail: bool) -> tuple[int, int]:
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'chat.db'}")
+    session_factory = async_sessionmaker(bind=engine, expire_on_commit=False)
+    async with engine.begin() as conn:
+        await conn.run_sync(ChatSession.__table__.create)
+        await conn.run_sync(ChatMessage.__table__.create)
+    monkeypatch.setattr(chat_session_service, "AsyncSessionLocal", session_factory)
+
+    async with session_factory() as db:
+        session, conversation = await ChatSessionService(db).open_session(1, None, None, "What is the notice period?")
+        assert conversation == ""
+        if not fail:
+            result = {"answer": "Thirty days.", "citations": []}
+            await ChatSessionService.record_turn(db, session.id, "What is the notice period?", datetime.now(timezone.utc), result, session)
+            await asyncio.sleep(0)  # let the background fold check finish
+
+    async with session_factory() as db:
+        sessions = len((await db.execute(select(ChatSession))).scalars().all())
+        messages = len((await db.execute(select(ChatMessage))).scalars().all())
+    await engine.dispose()
+    return sessions, messages
+
+
+def test_new_session_is_written_with_its_first_turn(tmp_path, monkeypatch):
+    assert asyncio.run(_first_turn(tmp_path, monkeypatch, fail=False)) == (1, 2)
+
+
+def test_failed_first_turn_leaves_no_session(tmp_path, monkeypatch):
+    # Generation raised before record_turn, the request's session is closed without a commit
+    assert asyncio.run(_first_turn(tmp_path, monkeypatch, fail=True)) == (0, 0)
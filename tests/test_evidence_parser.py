@@ -0,0 +1,32 @@
+from app.services import chat_service
+from app.services.chat_service import EvidenceParser
+
+
+def test_citations_arrive_as_lines_complete():
+    parser = EvidenceParser({3: "lease.pdf"})
+    # The separator is split across chunks
+    assert parser.feed('ANSWER: The fee is due.\n--') == []
+    assert parser.feed('-\nEVIDENCE:\n- Document 3, Page 1: "fee') == []
+    assert parser.feed(' is due"\n- Page 2: "b"') == [{"page": "1", "text": "fee is due", "document_id": 3, "filename": "lease.pdf"}]
+    assert parser.close() == [{"page": "2", "text": "b"}]
+    assert parser.result()["answer"] == "The fee is due."
+    assert len(parser.result()["citations"]) == 2
+
+
+def test_evidence_stops_at_a_second_separator():
+    parser = EvidenceParser()
+    parser.feed('ANSWER: x\n---\n- Page 1: "a"\n---\n- Page 9: "z"')
+    parser.close()
+    assert parser.citations == [{"page": "1", "text": "a"}]
+
+
+def test_each_line_is_parsed_once(monkeypatch):
+    parsed = []
+    monkeypatch.setattr(chat_service, "parse_citation_line", lambda line: parsed.append(line))
+    parser = EvidenceParser()
+    parser.feed("ANSWER: x\n---\n")
+    for page in range(200):
+        for part in ("- Page ", str(page), ': "q"\n'):
+            parser.feed(part)
+    parser.close()
+    assert len(parsed) == 202
@@ -0,0 +1,36 @@
+import asyncio
+
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+
+from app.api.guards import user_cache
+from app.migrations.users import User
+from app.models.users import AuthUser
+
+
+async def _change_and_delete(tmp_path) -> list[bool]:
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'users.db'}")
+    session_factory = async_sessionmaker(bind=engine, expire_on_commit=False)
+    async with engine.begin() as conn:
+        await conn.run_sync(User.__table__.create)
+
+    cached = []
+    async with session_factory() as db:
+        user = User(id=1, email="old@example.com")
+        db.add(user)
+        await db.commit()
+
+        user_cache.set(1, AuthUser(id=1, email="old@example.com"))
+        user.email = "new@example.com"
+        await db.commit()
+        cached.append(user_cache.get(1) is not None)
+
+        user_cache.set(1, AuthUser(id=1, email="new@example.com"))
+        await db.delete(user)
+        await db.commit()
+        cached.append(user_cache.get(1) is not None)
+    await engine.dispose()
+    return cached
+
+
+def test_changed_or_deleted_user_leaves_auth_cache(tmp_path):
+    assert asyncio.run(_change_and_delete(tmp_path)) == [False, False]
@@ -0,0 +1,56 @@
+from app.core.lexical_index import LexicalIndex, exact_terms
+from app.core.vector_store_base import QueryMatch
+from app.utils.retrieval import reciprocal_rank_fusion
+
+CHUNKS = [
+    {"vector_id": "d1-0", "text": "The supplier delivers the goods within thirty days.", "page": 1, "chunk_index": 0},
+    {"vector_id": "d1-1", "text": "Clause 12.3 sets the termination fee at ten percent.", "page": 2, "chunk_index": 1},
+    {"vector_id": "d1-2", "text": "Termination needs written notice. Termination fees are due at once.", "page": 3, "chunk_index": 2},
+]
+
+
+def _index(tmp_path) -> LexicalIndex:
+    index = LexicalIndex(str(tmp_path))
+    index.add_chunks(1, 1, CHUNKS)
+    index.add_chunks(1, 2, [{"vector_id": "d2-0", "text": "Termination of the lease.", "page": 1, "chunk_index": 0}])
+    return index
+
+
+def test_bm25_search_ranks_within_the_document(tmp_path):
+    index = _index(tmp_path)
+    matches = index.search(1, 1, "termination notice", top_k=5)
+    assert [match.id for match in matches] == ["d1-2", "d1-1"]
+    assert matches[0].score > matches[1].score
+    assert matches[0].metadata == {"document_id": 1, "text": CHUNKS[2]["text"], "page": 3, "chunk_index": 2}
+    assert index.search(2, 1, "termination") == []
+
+
+def test_exact_terms_and_phrase_search(tmp_path):
+    index = _index(tmp_path)
+    assert exact_terms('What does clause 12.3 say about "termination fee"?') == ["termination fee", "12.3"]
+    assert [match.id for match in index.search_exact(1, 1, ["12.3"])] == ["d1-1"]
+    assert [match.id for match in index.search_exact(1, 1, ["termination fee"])] == ["d1-1"]
+
+
+def test_replace_and_delete(tmp_path):
+    index = _index(tmp_path)
+    index.add_chunks(1, 1, [{**CHUNKS[0], "text": "The buyer pays on delivery."}])
+    assert index.search(1, 1, "supplier") == []
+    assert [match.id for match in index.search(1, 1, "buyer")] == ["d1-0"]
+
+    index.delete_chunks(1, ["d1-1"])
+    assert [match.id for match in index.search(1, 1, "termination")] == ["d1-2"]
+    index.delete_document(1, 1)
+    assert not index.has_document(1, 1)
+    assert index.has_document(1, 2)
+
+
+def test_reciprocal_rank_fusion():
+    dense = [QueryMatch(id="a", score=0.9, metadata={"source": "dense"}), QueryMatch(id="b", score=0.8)]
+    keyword = [QueryMatch(id="b", score=12.0, metadata={"source": "keyword"}), QueryMatch(id="c", score=3.0)]
+    fused = reciprocal_rank_fusion([dense, keyword], k=60, top_k=3)
+    # b is in both lists, so it beats a despite a's better dense rank
+    assert [match.id for match in fused] == ["b", "a", "c"]
+    assert fused[0].score == 1 / 62 + 1 / 61
+    assert fused[1].metadata == {"source": "dense"}
+    assert len(reciprocal_rank_fusion([dense, keyword], top_k=1)) == 1
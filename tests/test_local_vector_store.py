@@ -0,0 +1,40 @@
+from app.core.local_vector_store import LocalVectorStore
+
+
+def _vector(vector_id: str, values: list[float], document_id: int = 1) -> dict:
+    return {"id": vector_id, "values": values, "metadata": {"document_id": document_id, "text": vector_id}}
+
+
+def test_upsert_query_delete_and_reload(tmp_path):
+    store = LocalVectorStore(str(tmp_path))
+    store.upsert_vectors([_vector("a", [1, 0, 0]), _vector("b", [0, 1, 0]), _vector("c", [0, 0, 1], document_id=2)], namespace="user_1")
+
+    matches = store.query_vectors([1, 0.1, 0], top_k=2, namespace="user_1").matches
+    assert [match.id for match in matches] == ["a", "b"]
+    assert matches[0].metadata == {"document_id": 1, "text": "a"}
+    filtered = store.query_vectors([1, 0, 0], top_k=5, filter_dict={"document_id": 2}, namespace="user_1").matches
+    assert [match.id for match in filtered] == ["c"]
+
+    assert store.delete_vectors("user_1", filter_dict={"document_id": 1}) == {"deleted_count": 2}
+    reloaded = LocalVectorStore(str(tmp_path))
+    assert [match.id for match in reloaded.query_vectors([0, 0, 1], top_k=5, namespace="user_1").matches] == ["c"]
+    assert reloaded.query_vectors([0, 0, 1], namespace="user_2").matches == []
+
+
+def test_two_stores_on_one_directory_see_each_others_writes(tmp_path):
+    first = LocalVectorStore(str(tmp_path))
+    second = LocalVectorStore(str(tmp_path))
+    # Loads (empty) state into the second store before the first one writes
+    assert second.query_vectors([1, 0], namespace="user_1").matches == []
+
+    first.upsert_vectors([_vector("a1", [1, 0])], namespace="user_1")
+    assert [match.id for match in second.query_vectors([1, 0], namespace="user_1").matches] == ["a1"]
+
+    # Growing past the initial capacity replaces vectors.npy under the other store
+    second.upsert_vectors([_vector(f"b{i}", [0, 1]) for i in range(1100)], namespace="user_1")
+    assert first.query_vectors([1, 0], top_k=1, namespace="user_1").matches[0].id == "a1"
+    first.delete_vectors("user_1", ids=["b0"])
+
+    fresh = LocalVectorStore(str(tmp_path))
+    ids = {match.id for match in fresh.query_vectors([1, 1], top_k=2000, namespace="user_1").matches}
+    assert "a1" in ids and "b0" not in ids and len(ids) == 1100
@@ -0,0 +1,51 @@
+from app.core.vector_store_base import QueryMatch
+from app.utils.retrieval import dedupe_overlapping, pack_context
+
+SHARED = "the lessee shall keep the premises insured "
+
+
+def _match(id: str, text: str, document_id: int = 1, chunk_index: int | None = None, score: float = 1.0) -> QueryMatch:
+    return QueryMatch(id=id, score=score, metadata={"document_id": document_id, "chunk_index": chunk_index, "text": text})
+
+
+def test_dedupe_drops_near_duplicates():
+    matches = [
+        _match("a", "Payment is due within thirty days of invoice.", chunk_index=0),
+        _match("b", "Payment is due within thirty days of the invoice.", document_id=2, chunk_index=4),
+        _match("c", "The governing law is Indonesian law.", chunk_index=9),
+    ]
+    assert [match.id for match in dedupe_overlapping(matches)] == ["a", "c"]
+
+
+def test_dedupe_trims_overlap_with_neighbours():
+    previous = _match("prev", "Rent is paid monthly and " + SHARED, chunk_index=3)
+    current = _match("cur", SHARED + "against fire and flood.", chunk_index=4)
+    next_chunk = _match("next", "Notices go to the registered address.", chunk_index=2)
+    kept = dedupe_overlapping([previous, current])
+    assert kept[0].metadata["text"] == previous.metadata["text"]
+    assert kept[1].metadata["text"] == "against fire and flood."
+
+    # The lower-ranked previous chunk loses the shared tail instead
+    kept = dedupe_overlapping([current, previous, next_chunk])
+    assert kept[1].metadata["text"] == "Rent is paid monthly and "
+    assert kept[2].metadata["text"] == next_chunk.metadata["text"]
+
+
+def test_dedupe_does_not_trim_across_documents():
+    previous = _match("prev", "Rent is paid monthly and " + SHARED, document_id=1, chunk_index=3)
+    current = _match("cur", SHARED + "against fire and flood.", document_id=2, chunk_index=4)
+    kept = dedupe_overlapping([previous, current])
+    assert kept[1].metadata["text"] == current.metadata["text"]
+
+
+def test_pack_context_respects_budget_and_max_chunks():
+    matches = [_match(str(i), "x" * 40) for i in range(5)]  # 10 tokens each
+    assert len(pack_context(matches, token_budget=30, max_chunks=10)) == 3
+    assert len(pack_context(matches, token_budget=1000, max_chunks=2)) == 2
+
+
+def test_pack_context_keeps_top_match_and_skips_what_does_not_fit():
+    matches = [_match("big", "x" * 400), _match("medium", "x" * 80), _match("small", "x" * 20)]
+    assert [match.id for match in pack_context(matches, token_budget=10, max_chunks=5)] == ["big"]
+    matches = [_match("top", "x" * 40), _match("medium", "x" * 80), _match("small", "x" * 20)]
+    assert [match.id for match in pack_context(matches, token_budget=20, max_chunks=5)] == ["top", "small"]
@@ -0,0 +1,51 @@
+import asyncio
+
+import app.core.vector_upload as vector_upload
+from app.core.vector_upload import pack_vector_batches, upsert_vectors_pipelined, vector_payload_size
+
+
+def _vectors(count: int, text_chars: int = 100) -> list[dict]:
+    return [
+        {"id": f"v{i}", "values": [0.5] * 8, "metadata": {"text": "x" * text_chars, "page": 1}}
+        for i in range(count)
+    ]
+
+
+def test_batches_stay_under_the_size_limit():
+    vectors = _vectors(50, text_chars=1000)
+    max_bytes = 5000
+    batches = pack_vector_batches(vectors, max_bytes=max_bytes, max_count=1000)
+    assert [vector for batch in batches for vector in batch] == vectors
+    assert len(batches) > 1
+    for batch in batches:
+        assert 256 + sum(vector_payload_size(vector) for vector in batch) <= max_bytes
+
+
+def test_batches_respect_the_count_limit():
+    batches = pack_vector_batches(_vectors(25), max_bytes=10 ** 9, max_count=10)
+    assert [len(batch) for batch in batches] == [10, 10, 5]
+
+
+def test_oversized_vector_gets_its_own_batch():
+    vectors = _vectors(3)
+    vectors[1]["metadata"]["text"] = "y" * 10000
+    assert [len(batch) for batch in pack_vector_batches(vectors, max_bytes=2000, max_count=1000)] == [1, 1, 1]
+
+
+class _Store:
+    def __init__(self, max_batch: int):
+        self.max_batch = max_batch
+        self.upserted = []
+
+    def upsert_vectors(self, vectors, namespace="default"):
+        if len(vectors) > self.max_batch:
+            raise Exception("Request payload too large")
+        self.upserted.extend(vector["id"] for vector in vectors)
+
+
+def test_rejected_batches_are_split(monkeypatch):
+    store = _Store(max_batch=3)
+    monkeypatch.setattr(vector_upload, "vector_store", store)
+    vectors = _vectors(10)
+    assert asyncio.run(upsert_vectors_pipelined(vectors, namespace="user_1", max_in_flight=2, max_retries=0)) == 10
+    assert sorted(store.upserted) == sorted(vector["id"] for vector in vectors)
@@ -0,0 +1,95 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+
+import app.worker as worker
+from app.core.config import settings
+from app.migrations.jobs import DocumentJob
+
+
+async def _run_job(tmp_path, monkeypatch, attempts: int, body) -> DocumentJob:
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'jobs.db'}")
+    session_factory = async_sessionmaker(bind=engine, autoflush=False, expire_on_commit=False)
+    async with engine.begin() as conn:
+        await conn.run_sync(DocumentJob.__table__.create)
+    async with session_factory() as db:
+        db.add(DocumentJob(
+            id=1, user_id=1, document_id=1, status="queued", attempts=attempts,
+            run_after=datetime.now(timezone.utc) - timedelta(minutes=1)
+        ))
+        await db.commit()
+
+    stopping = asyncio.Event()
+
+    async def run_job(user_id: int, document_id: int):
+        stopping.set()
+        await body(session_factory)
+
+    monkeypatch.setattr(worker, "AsyncSessionLocal", session_factory)
+    monkeypatch.setattr(worker, "run_job", run_job)
+    await asyncio.wait_for(worker.worker_loop(0, stopping), timeout=10)
+
+    async with session_factory() as db:
+        job = (await db.execute(select(DocumentJob))).scalars().one()
+    await engine.dispose()
+    return job
+
+
+async def _fail(session_factory):
+    raise RuntimeError("boom")
+
+
+def _run_failing_job(tmp_path, monkeypatch, attempts: int) -> DocumentJob:
+    return asyncio.run(_run_job(tmp_path, monkeypatch, attempts, _fail))
+
+
+def test_failed_job_is_requeued_with_backoff(tmp_path, monkeypatch):
+    job = _run_failing_job(tmp_path, monkeypatch, attempts=0)
+    assert job.status == "queued"
+    assert job.attempts == 1
+    assert job.last_error == "boom"
+    assert job.locked_at is None
+    assert job.run_after.replace(tzinfo=timezone.utc) > datetime.now(timezone.utc)
+
+
+def test_failed_job_gives_up_after_max_attempts(tmp_path, monkeypatch):
+    job = _run_failing_job(tmp_path, monkeypatch, attempts=settings.SYNC_JOB_MAX_ATTEMPTS - 1)
+    assert job.status == "failed"
+    assert job.attempts == settings.SYNC_JOB_MAX_ATTEMPTS
+    assert job.last_error == "boom"
+
+
+def test_long_job_keeps_its_lock(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "SYNC_JOB_HEARTBEAT_INTERVAL", 0.05)
+    locks = []
+
+    async def slow_job(session_factory):
+        for _ in range(3):
+            await asyncio.sleep(0.2)
+            async with session_factory() as db:
+                locks.append((await db.execute(select(DocumentJob.locked_at))).scalar_one())
+
+    job = asyncio.run(_run_job(tmp_path, monkeypatch, 0, slow_job))
+    assert job.status == "done"
+    assert len(set(locks)) == 3
+
+
+def test_reclaimed_job_is_stopped_and_not_marked_done(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "SYNC_JOB_HEARTBEAT_INTERVAL", 0.05)
+    finished = []
+
+    async def reclaimed_job(session_factory):
+        # Another worker takes the job over as if the lock had expired
+        async with session_factory() as db:
+            job = (await db.execute(select(DocumentJob))).scalars().one()
+            job.attempts += 1
+            await db.commit()
+        await asyncio.sleep(1)
+        finished.append(True)
+
+    job = asyncio.run(_run_job(tmp_path, monkeypatch, 0, reclaimed_job))
+    assert finished == []
+    assert job.status == "running"
+    assert job.attempts == 2